@@ -0,0 +1,103 @@
+"""Offline fixtures shared by the benchmarks and the tests: SVG flags and a page in the format of Wikipedia
+gallery of flags, served over HTTP by GalleryServer.
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import os
+
+FIXTURE_COLORS = ['#ffffff', '#dc143c', '#0038a8', '#ffd100', '#009b3a', '#000000', '#ff7f00', '#7f00ff']
+
+
+def make_stripes_svg(colors: list[str], vertical: bool = False) -> bytes:
+    """Creates SVG of a flag made of equal stripes of the given colors."""
+    n = len(colors)
+    if vertical:
+        stripes = [f'<rect x="{i * 900 / n:.2f}" y="0" width="{900 / n:.2f}" height="600" fill="{color}"/>'
+                   for i, color in enumerate(colors)]
+    else:
+        stripes = [f'<rect x="0" y="{i * 600 / n:.2f}" width="900" height="{600 / n:.2f}" fill="{color}"/>'
+                   for i, color in enumerate(colors)]
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" width="900" height="600" viewBox="0 0 900 600">'
+            + ''.join(stripes) + '</svg>').encode()
+
+
+def make_gallery_page(entries: list[tuple[str, str]]) -> bytes:
+    """Creates page in the format of Wikipedia gallery of flags.
+    entries are pairs (country name, path of the SVG relative to the start of image url)."""
+    items = [f'<li class="gallerybox"><a href="/wiki/File:{os.path.basename(path)}" class="mw-file-description" '
+             f'title="{name}"><img src="//upload.example/thumb/{path}/120px-{os.path.basename(path)}.png"></a></li>'
+             for name, path in entries]
+    return ('<html><body><ul class="gallery">' + ''.join(items) + '</ul></body></html>').encode()
+
+
+def make_fixture_gallery(n_countries: int) -> tuple[dict[str, bytes], list[str]]:
+    """Creates gallery of n_countries distinct striped flags.
+    Returns files to be served (path -> content, with the gallery page at /gallery.html) and countries names."""
+    files = {}
+    entries = []
+    names = []
+    for i in range(n_countries):
+        n_stripes = 2 + i % 2
+        colors = [FIXTURE_COLORS[(i + 3 * k) % len(FIXTURE_COLORS)] for k in range(n_stripes)]
+        path = f'{i % 10}/{i}/Flag_of_Country_{i}.svg'
+        files['/' + path] = make_stripes_svg(colors, vertical=(i // len(FIXTURE_COLORS)) % 2 == 1)
+        names.append(f'Country {i}')
+        entries.append((names[-1], path))
+    files['/gallery.html'] = make_gallery_page(entries)
+    return files, names
+
+
+class GalleryServer:
+    """Local HTTP server standing in for Wikipedia gallery and image hosting in tests and benchmarks.
+    files maps request paths to served contents; other paths give 404.
+    transient_failures maps request paths to the number of the first requests that are answered with 503."""
+    def __init__(self, files: dict[str, bytes], transient_failures: dict[str, int] = None) -> None:
+        self.files = files
+        self.transient_failures = dict(transient_failures or {})
+        self.requests_count = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Url of the server ending with '/'."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def _make_handler(self) -> type:
+        gallery_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                with gallery_server._lock:
+                    count = gallery_server.requests_count.get(self.path, 0)
+                    gallery_server.requests_count[self.path] = count + 1
+                if count < gallery_server.transient_failures.get(self.path, 0):
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                elif self.path in gallery_server.files:
+                    content = gallery_server.files[self.path]
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                else:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def __enter__(self) -> 'GalleryServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
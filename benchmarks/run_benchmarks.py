@@ -0,0 +1,127 @@
+"""Benchmark suite of dataset creation, training and inference, run offline against local fixtures:
+
+    python -m benchmarks.run_benchmarks [--output results.json] [--save-baseline] [--stages download preprocess ...]
+
+Each stage is run in a fresh process (see stages.py), so that its peak RSS is measured separately. Time of each
+stage is the median of --repeats runs. The results are written as JSON and compared with the stored baseline
+(benchmarks/baseline.json); the exit status is 1 if any stage is slower or uses more memory than the baseline
+by more than the thresholds.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from benchmarks.fixtures import GalleryServer, make_fixture_gallery
+from benchmarks.stages import STAGES
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(DIRNAME)
+BASELINE_PATH = os.path.join(DIRNAME, 'baseline.json')
+
+
+def run_benchmarks(stages: list[str], config: dict, repeats: int = 3) -> dict:
+    """Runs stages (in the given order) repeats times, each in a fresh process and a fresh data directory (setup of
+    each stage creates its own inputs, see stages.py). Returns results with the environment, config and for each
+    stage median time and maximal peak RSS."""
+    results = {'environment': get_environment(), 'config': config, 'stages': {}}
+    n_countries = config['n_countries']
+    with GalleryServer(make_fixture_gallery(n_countries)[0]) as server:
+        runs = {name: [] for name in stages}
+        for _ in range(repeats):
+            for name in stages:
+                with tempfile.TemporaryDirectory() as path_data:
+                    stage_config = {**config, 'url': server.url, 'path_data': path_data}
+                    runs[name].append(run_stage_process(name, stage_config))
+        for name in stages:
+            results['stages'][name] = {**runs[name][-1],
+                                       'time_s': statistics.median(run['time_s'] for run in runs[name]),
+                                       'peak_rss_mb': max(run['peak_rss_mb'] for run in runs[name]),
+                                       'setup_peak_rss_mb': max(run['setup_peak_rss_mb'] for run in runs[name])}
+    return results
+
+
+def run_stage_process(name: str, config: dict) -> dict:
+    """Runs stage name in a fresh Python process and returns its measurements."""
+    process = subprocess.run([sys.executable, '-m', 'benchmarks.stages', name, json.dumps(config)],
+                             capture_output=True, text=True, cwd=ROOT_DIR)
+    if process.returncode != 0:
+        raise RuntimeError(f'Stage {name} failed:\n{process.stderr}')
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def get_environment() -> dict:
+    """Describes the machine and the versions the benchmarks were run with."""
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+
+def compare_with_baseline(results: dict, baseline: dict, time_threshold: float = 0.25, min_time_s: float = 0.05,
+                          rss_threshold: float = 0.2) -> list[str]:
+    """Compares results with baseline (both as returned by run_benchmarks). A stage regressed if its time is larger
+    than the baseline time by more than time_threshold (relative) and min_time_s (absolute, to ignore noise of very
+    short stages), or its peak RSS is larger by more than rss_threshold (relative).
+    Returns list of regressions (empty if there are none). Stages missing from baseline are skipped."""
+    regressions = []
+    for name, stage in results['stages'].items():
+        if name not in baseline['stages']:
+            continue
+        baseline_stage = baseline['stages'][name]
+        time_limit = max(baseline_stage['time_s'] * (1 + time_threshold), baseline_stage['time_s'] + min_time_s)
+        if stage['time_s'] > time_limit:
+            regressions.append(f'{name}: time {stage["time_s"]:.3f} s, baseline {baseline_stage["time_s"]:.3f} s')
+        if stage['peak_rss_mb'] > baseline_stage['peak_rss_mb'] * (1 + rss_threshold):
+            regressions.append(f'{name}: peak RSS {stage["peak_rss_mb"]:.1f} MB, '
+                               f'baseline {baseline_stage["peak_rss_mb"]:.1f} MB')
+    return regressions
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    """Prints time and peak RSS of each stage (with baseline values if given)."""
+    for name, stage in results['stages'].items():
+        line = f'{name:<28} {stage["time_s"]:9.3f} s {stage["peak_rss_mb"]:9.1f} MB'
+        if baseline is not None and name in baseline['stages']:
+            baseline_stage = baseline['stages'][name]
+            line += f'   (baseline {baseline_stage["time_s"]:.3f} s, {baseline_stage["peak_rss_mb"]:.1f} MB)'
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks stages of dataset creation, training and inference.')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--n-countries', type=int, default=20, help='number of flags in the fixture gallery')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='stores the results as the new baseline')
+    parser.add_argument('--time-threshold', type=float, default=0.25)
+    parser.add_argument('--rss-threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    config = {'n_countries': args.n_countries, 'workers': args.workers, 'n_splits': 4, 'batch_repeats': 50}
+    results = run_benchmarks(args.stages, config, repeats=args.repeats)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Baseline saved to {args.baseline}.')
+    elif baseline is not None:
+        if baseline['config'] != config:
+            print('Warning: baseline was made with different config.')
+        regressions = compare_with_baseline(results, baseline, args.time_threshold, rss_threshold=args.rss_threshold)
+        for regression in regressions:
+            print('Regression:', regression)
+        sys.exit(1 if regressions else 0)
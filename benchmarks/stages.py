@@ -0,0 +1,229 @@
+"""Stages of the benchmark suite. Each stage is run by run_benchmarks.py in a fresh process:
+
+    python -m benchmarks.stages <stage> <config as JSON>
+
+which prints JSON with the time of the stage and peak RSS of the process before (setup) and after the stage.
+"""
+import contextlib
+import glob
+import io
+import json
+import os
+import resource
+import sys
+import time
+import numpy as np
+from PIL import Image
+from sklearn.linear_model import LogisticRegression
+from src.flags.dataset_creator import DatasetCreator
+from src.flags.downloader import Downloader
+from src.flags.ml_operations import load_data_from_npz, simple_cross_validation
+from src.flags.recognizer import Recognizer
+from src.flags.batch_inference import recognize_files
+from src.flags.detection import FlagDetector
+from src.flags.startup_profile import measure_startup
+
+DATASET_DIRNAME = 'np_from_selected'
+DATASET_COMPRESSED_FILENAME = 'np_from_selected_compressed.npz'
+FIXTURES_DIR = os.path.join('tests', 'data_for_tests')
+
+
+def make_creator(config: dict, download: bool = True) -> DatasetCreator:
+    """Creates DatasetCreator working on the fixture gallery and, unless it is the measured stage, downloads the
+    fixture images (it is cheap and sets the countries that were downloaded)."""
+    set_creator = DatasetCreator(page_url=config['url'] + 'gallery.html', img_url_start=config['url'],
+                                 path_data=config['path_data'], workers=config['workers'],
+                                 downloader=Downloader(max_workers=8, backoff_factor=0))
+    if download:
+        set_creator.download_dataset()
+        require(count_files(config, '*.svg'), 'images were downloaded')
+    return set_creator
+
+
+def make_preprocessed_creator(config: dict) -> DatasetCreator:
+    """Creates DatasetCreator (see make_creator) whose downloaded images are already preprocessed."""
+    set_creator = make_creator(config)
+    set_creator.preprocess_initial_images()
+    require(count_files(config, '*_0.png'), 'images were preprocessed')
+    return set_creator
+
+
+def count_files(config: dict, pattern: str) -> int:
+    """Number of files matching pattern in the data directory of the stage."""
+    return len(glob.glob(os.path.join(config['path_data'], pattern)))
+
+
+def require(count: int, description: str) -> int:
+    """Returns count if it is positive, otherwise raises RuntimeError, so that a stage whose inputs could not be
+    created fails instead of timing empty work."""
+    if count <= 0:
+        raise RuntimeError(f'No {description}.')
+    return count
+
+
+def fixture_images() -> list[str]:
+    """Paths of fixture images used for inference."""
+    return sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.png')))
+
+
+def make_recognizer() -> Recognizer:
+    """Creates Recognizer with the trained model shipped with the repository."""
+    return Recognizer.from_files(os.path.join('src', 'models', 'clf.npz'), os.path.join(FIXTURES_DIR, 'countries.txt'))
+
+
+def setup_download(config: dict) -> DatasetCreator:
+    return make_creator(config, download=False)
+
+
+def run_download(set_creator: DatasetCreator, config: dict) -> dict:
+    set_creator.download_dataset()
+    return {'n_images': require(count_files(config, '*.svg'), 'images were downloaded')}
+
+
+def run_preprocess(set_creator: DatasetCreator, config: dict) -> dict:
+    set_creator.preprocess_initial_images()
+    return {'n_images': require(count_files(config, '*_0.png'), 'images were preprocessed')}
+
+
+def run_create_new_samples(set_creator: DatasetCreator, config: dict) -> dict:
+    set_creator.create_new_samples()
+    return {'n_countries': require(len(set_creator._samples), 'samples were created')}
+
+
+def run_create_np_dataset(set_creator: DatasetCreator, config: dict) -> dict:
+    set_creator.create_np_dataset_from_selected_pixels(dir_name=DATASET_DIRNAME)
+    return {'n_samples': require(len(set_creator._y), 'samples were written to the dataset')}
+
+
+def setup_save(config: dict) -> DatasetCreator:
+    set_creator = make_preprocessed_creator(config)
+    set_creator.create_np_dataset_from_selected_pixels(dir_name=DATASET_DIRNAME)
+    require(len(set_creator._y), 'samples were written to the dataset')
+    return set_creator
+
+
+def run_save_uncompressed_dataset(set_creator: DatasetCreator, config: dict) -> dict:
+    set_creator.save_uncompressed_dataset(DATASET_DIRNAME)
+    return {}
+
+
+def run_save_compressed_dataset(set_creator: DatasetCreator, config: dict) -> dict:
+    set_creator.save_compressed_dataset(DATASET_COMPRESSED_FILENAME)
+    return {}
+
+
+def setup_dataset_path(config: dict) -> str:
+    setup_save(config).save_compressed_dataset(DATASET_COMPRESSED_FILENAME)
+    file_path = os.path.join(config['path_data'], DATASET_COMPRESSED_FILENAME)
+    if not os.path.exists(file_path):
+        raise RuntimeError(f'Dataset {DATASET_COMPRESSED_FILENAME} was not saved.')
+    return file_path
+
+
+def run_load_data_from_npz(file_path: str, config: dict) -> dict:
+    X, y = load_data_from_npz(file_path)
+    return {'n_samples': require(len(y), 'samples were loaded')}
+
+
+def setup_cross_validation(config: dict) -> tuple:
+    X, y = load_data_from_npz(setup_dataset_path(config))
+    require(len(y), 'samples were loaded')
+    return X, y
+
+
+def run_simple_cross_validation(dataset: tuple, config: dict) -> dict:
+    X, y = dataset
+    clf = LogisticRegression(C=100, max_iter=500, random_state=0)
+    scores = simple_cross_validation(X, y, clf, n_splits=config['n_splits'])
+    return {'accuracy': float(scores.mean())}
+
+
+def setup_inference(config: dict) -> Recognizer:
+    return make_recognizer()
+
+
+def run_inference_single(recognizer: Recognizer, config: dict) -> dict:
+    paths = fixture_images()
+    for path in paths:
+        recognizer.recognize(path)
+    return {'n_images': len(paths)}
+
+
+def run_inference_batch(recognizer: Recognizer, config: dict) -> dict:
+    paths = fixture_images() * config['batch_repeats']
+    results = list(recognize_files(recognizer, paths, workers=config['workers'], batch_size=256))
+    return {'n_images': len(results)}
+
+
+def setup_detection(config: dict) -> tuple:
+    """Creates FlagDetector and a 4K photo of noise with a fixture flag pasted into it."""
+    rng = np.random.default_rng(0)
+    photo = Image.fromarray(rng.integers(0, 256, (2160, 3840, 3), dtype=np.uint8))
+    with Image.open(os.path.join(FIXTURES_DIR, '140_3.png')) as flag:
+        photo.paste(flag.convert('RGB').resize((960, 600)), (1500, 800))
+    detector = FlagDetector(make_recognizer())
+    detector.detect(photo)
+    return detector, photo
+
+
+def run_detection(state: tuple, config: dict) -> dict:
+    detector, photo = state
+    return {'n_detections': len(detector.detect(photo))}
+
+
+def setup_startup(config: dict) -> tuple:
+    return os.path.join('src', 'models', 'clf.npz'), os.path.join(FIXTURES_DIR, 'countries.txt'), fixture_images()[0]
+
+
+def run_startup(paths: tuple, config: dict) -> dict:
+    """Time to the first prediction in a fresh process (see measure_startup)."""
+    report = measure_startup(*paths, repeats=1)
+    if report['heavy_modules']:
+        raise RuntimeError(f'Heavy modules imported: {", ".join(report["heavy_modules"])}.')
+    return {'first_prediction_ms': report['first_prediction_ms']}
+
+
+# Stages as (setup, run): setup prepares the state of the stage (creating all its inputs in the data directory,
+# so that each stage can be run alone) and is not measured, run is the measured part.
+STAGES = {
+    'download': (setup_download, run_download),
+    'preprocess': (make_creator, run_preprocess),
+    'create_new_samples': (make_preprocessed_creator, run_create_new_samples),
+    'create_np_dataset': (make_preprocessed_creator, run_create_np_dataset),
+    'save_uncompressed_dataset': (setup_save, run_save_uncompressed_dataset),
+    'save_compressed_dataset': (setup_save, run_save_compressed_dataset),
+    'load_data_from_npz': (setup_dataset_path, run_load_data_from_npz),
+    'simple_cross_validation': (setup_cross_validation, run_simple_cross_validation),
+    'inference_single': (setup_inference, run_inference_single),
+    'inference_batch': (setup_inference, run_inference_batch),
+    'detection': (setup_detection, run_detection),
+    'startup': (setup_startup, run_startup),
+}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run_stage(name: str, config: dict) -> dict:
+    """Runs setup and then the measured part of stage name. Output printed by the stage is discarded,
+    unless the stage fails; then it is printed to stderr before the error is raised."""
+    setup, run = STAGES[name]
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            state = setup(config)
+            setup_peak_rss = peak_rss_mb()
+            start = time.perf_counter()
+            info = run(state, config)
+            elapsed = time.perf_counter() - start
+    except Exception:
+        print(output.getvalue(), file=sys.stderr)
+        raise
+    return {'time_s': elapsed, 'peak_rss_mb': peak_rss_mb(), 'setup_peak_rss_mb': setup_peak_rss, **info}
+
+
+if __name__ == '__main__':
+    print(json.dumps(run_stage(sys.argv[1], json.loads(sys.argv[2]))))
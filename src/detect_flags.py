@@ -0,0 +1,31 @@
+import argparse
+import json
+import os
+from flags.recognizer import Recognizer
+from flags.detection import FlagDetector
+
+
+if __name__ == '__main__':
+    WIDTH = 32
+    HEIGHT = 20
+    DIRNAME = os.path.dirname(__file__)
+    file_path_clf = os.path.join(DIRNAME, 'models', 'clf.npz')
+    file_path_countries_list = os.path.join(DIRNAME, 'data', 'countries.txt')
+
+    parser = argparse.ArgumentParser(description='Finds flags inside a larger image (e.g. a photo of a flag on '
+                                                 'a pole) and prints their boxes and countries as JSON.')
+    parser.add_argument('image', help='path to the image')
+    parser.add_argument('--min-score', type=float, default=0.5, help='minimal score of a reported flag')
+    parser.add_argument('--max-detections', type=int, default=5, help='maximal number of reported flags')
+    parser.add_argument('--iou-threshold', type=float, default=0.3,
+                        help='maximal intersection over union of boxes of two reported flags')
+    args = parser.parse_args()
+
+    try:
+        recognizer = Recognizer.from_files(file_path_clf, file_path_countries_list, WIDTH, HEIGHT)
+        detections = FlagDetector(recognizer).detect(args.image, min_score=args.min_score,
+                                                     iou_threshold=args.iou_threshold,
+                                                     max_detections=args.max_detections)
+        print(json.dumps(detections, indent=2))
+    except Exception as e:
+        print(f'Impossible to detect flags because of error. Error: {e}')
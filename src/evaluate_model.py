@@ -0,0 +1,42 @@
+import argparse
+import os
+import numpy as np
+from flags.evaluation import evaluate
+from flags.mapped_dataset import MappedDataset
+from flags.model_export import load_model
+from flags.utils import load_countries_names
+
+
+if __name__ == '__main__':
+    DIRNAME = os.path.dirname(__file__)
+    PATH_DATA = os.path.join(DIRNAME, 'data')
+    file_path_clf = os.path.join(DIRNAME, 'models', 'clf.npz')
+    file_path_countries_list = os.path.join(PATH_DATA, 'countries.txt')
+
+    parser = argparse.ArgumentParser(description='Evaluates trained model on uncompressed (memory-mapped) held-out '
+                                                 'dataset in chunks.')
+    parser.add_argument('dataset', help='directory of held-out dataset saved by save_uncompressed_dataset '
+                                        '(evaluating on the training dataset, e.g. data/np_from_selected, '
+                                        'gives training-set accuracy)')
+    parser.add_argument('--chunk-size', type=int, default=65536)
+    parser.add_argument('--top-k', type=int, nargs='*', default=[1, 3, 5], help='no values turn top-k accuracy off')
+    parser.add_argument('--confused-pairs', type=int, default=10, help='number of most confused pairs printed')
+    args = parser.parse_args()
+
+    clf = load_model(file_path_clf)
+    countries_names = load_countries_names(file_path_countries_list)
+    dataset = MappedDataset(args.dataset)
+    report = evaluate(clf, dataset.X, dataset.y, chunk_size=args.chunk_size, top_k=tuple(args.top_k),
+                      n_confused_pairs=args.confused_pairs)
+
+    print(f"Samples: {report['n_samples']}, accuracy: {report['accuracy']:.4f}")
+    for k, accuracy in report.get('top_k_accuracy', {}).items():
+        print(f'Top-{k} accuracy: {accuracy:.4f}')
+    imperfect = np.flatnonzero(report['tpr'] < 0.999)
+    print(f'Classes with TPR < 100%: {len(imperfect)} of {np.count_nonzero(report["support"])}')
+    for i in imperfect:
+        label = report['classes'][i]
+        print(f"{countries_names[label]}: TPR {report['tpr'][i]:.3f}, precision {report['precision'][i]:.3f}")
+    print('Most confused pairs:')
+    for pair in report['confused_pairs']:
+        print(f"{countries_names[pair['true']]} identified as {countries_names[pair['predicted']]}: {pair['count']}")
@@ -0,0 +1,22 @@
+import os
+import pickle
+from flags.model_export import export_model
+from flags.pixels_layout import load_pixels_layout, get_model_layout_path
+
+
+if __name__ == '__main__':
+    WIDTH = 32
+    HEIGHT = 20
+    DIRNAME = os.path.dirname(__file__)
+    PATH_MODEL = os.path.join(DIRNAME, 'models')
+
+    print("Exporting the trained classifier...")
+    file_path_clf = os.path.join(PATH_MODEL, 'clf.pkl')
+    clf = pickle.load(open(file_path_clf, 'rb'))
+    # the layout saved next to the classifier (if it was trained on a custom one) is exported with it
+    pixels_positions = None
+    if os.path.exists(get_model_layout_path(file_path_clf)):
+        layout = load_pixels_layout(get_model_layout_path(file_path_clf))
+        WIDTH, HEIGHT, pixels_positions = layout['width'], layout['height'], layout['pixels_positions']
+    export_model(clf, os.path.join(PATH_MODEL, 'clf.npz'), width=WIDTH, height=HEIGHT,
+                 pixels_positions=pixels_positions)
@@ -0,0 +1,147 @@
+import numpy as np
+from numpy.typing import NDArray
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+from typing import Callable, Optional, Iterable
+from .image_preprocessor import ImageSource
+from .metrics import get_metrics
+from .recognizer import Recognizer
+
+
+class AsyncBatcher:
+    """asyncio counterpart of MicroBatcher: groups data samples awaited concurrently in one event loop into batches
+    processed by a single call of predict_batch (which takes np.array of shape (n_samples, n_features) and returns
+    list of results). predict_batch is run in executor, so the event loop is not blocked by the classifier.
+    A batch is processed when it has max_batch_size samples or max_wait seconds passed since its first sample
+    was submitted. Samples whose callers were cancelled before their batch is processed are left out of it."""
+    def __init__(self, predict_batch: Callable[[NDArray], list], executor: ThreadPoolExecutor,
+                 max_batch_size: int = 64, max_wait: float = 0.005) -> None:
+        self._predict_batch = predict_batch
+        self._executor = executor
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, img_sample: NDArray):
+        """Submits data sample of shape (n_features, ) and returns its result when its batch is processed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((img_sample, future))
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Starts processing of the pending samples as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(img_sample, future) for img_sample, future in self._pending if not future.done()]
+        self._pending = []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._process(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, batch: list) -> None:
+        """Processes one batch in the executor and sets results (or the error) of its futures."""
+        img_samples = np.stack([img_sample for img_sample, _ in batch])
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self._predict_batch,
+                                                                       img_samples)
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class AsyncRecognizer:
+    """Recognizes flags with recognizer from coroutines, without blocking the event loop.
+    Reading, decoding and rasterizing images (and the cache lookups of recognizer) run in a pool of max_workers
+    threads (by default the number of CPUs), and data samples of concurrent calls are classified together
+    in batches (see AsyncBatcher) in a separate thread. At most max_pending images are preprocessed or queued for
+    the pool at once; other calls wait in the event loop, so thousands of concurrent calls only cost coroutines.
+    It should be used by one event loop; close it (or use it as async context manager) to stop its threads."""
+    def __init__(self, recognizer: Recognizer, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 max_batch_size: int = 64, max_wait: float = 0.005) -> None:
+        self._recognizer = recognizer
+        max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='flags-preprocess')
+        # the classifier has its own thread: preprocessing threads wait for it, so they must not be needed to run it
+        self._model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='flags-predict')
+        self._batcher = AsyncBatcher(recognizer.predict, self._model_executor, max_batch_size, max_wait)
+        self._max_pending = max_pending or 4 * max_workers
+        self._semaphore = None
+
+    @property
+    def recognizer(self) -> Recognizer:
+        """Recognizer used to preprocess images and classify them."""
+        return self._recognizer
+
+    async def recognize(self, source: ImageSource, timeout: Optional[float] = None) -> dict:
+        """Recognizes flag in a single image (given as file path, raw bytes or PIL image).
+        Returns dict with class label, country name and probability, as Recognizer.recognize does.
+        If the result is not ready within timeout seconds, TimeoutError is raised. If the calling task is
+        cancelled (or timed out), the image is not classified, unless its batch is already being processed.
+        Errors of reading the image are raised."""
+        if timeout is None:
+            return await self._recognize(source)
+        try:
+            return await asyncio.wait_for(self._recognize(source), timeout)
+        except asyncio.TimeoutError as e:
+            get_metrics().increment('async_recognizer.timeouts')
+            # asyncio.TimeoutError is the builtin TimeoutError only since Python 3.11
+            raise TimeoutError(f'Image was not recognized within {timeout} seconds') from e
+
+    async def recognize_many(self, sources: Iterable[ImageSource], timeout: Optional[float] = None) -> list:
+        """Recognizes flags in many images concurrently. Returns the results in the order of sources;
+        for images that could not be recognized (e.g. timed out), the exception is returned instead of the result."""
+        return await asyncio.gather(*(self.recognize(source, timeout) for source in sources), return_exceptions=True)
+
+    async def _recognize(self, source: ImageSource) -> dict:
+        """Recognizes image in the pool of threads, sending its data sample to the batcher in the event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_pending)
+        cancelled = threading.Event()
+        submitted = []
+
+        def predict_sample(img_sample: NDArray) -> dict:
+            if cancelled.is_set():
+                raise asyncio.CancelledError()
+            future = asyncio.run_coroutine_threadsafe(self._batcher.submit(img_sample), loop)
+            submitted.append(future)
+            return future.result()
+
+        async with self._semaphore:
+            with get_metrics().timer('async_recognizer.recognize.seconds'):
+                try:
+                    return await loop.run_in_executor(self._executor, self._recognizer.recognize_with, source,
+                                                      predict_sample)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    for future in list(submitted):
+                        future.cancel()
+                    raise
+
+    def close(self) -> None:
+        """Stops the threads after the already started work."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._model_executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> 'AsyncRecognizer':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
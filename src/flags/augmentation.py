@@ -0,0 +1,133 @@
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+import io
+import os
+from typing import Union, Sequence
+
+
+class AugmentationGrid:
+    """Describes which new samples are created from a single preprocessed image.
+    brightness_factors and contrast_factors are factors as in PIL.ImageEnhance (1.0 gives the original image),
+    hue_shifts are angles in degrees by which hue is rotated,
+    blur_sigmas are standard deviations (in pixels) of Gaussian blur,
+    jpeg_qualities are qualities used to add JPEG compression noise.
+    By default, 20 samples with modified brightness and 20 with modified contrast are created."""
+    def __init__(self, brightness_factors: Sequence[float] = tuple(np.arange(0.8, 1.2, 0.02)),
+                 contrast_factors: Sequence[float] = tuple(np.arange(0.8, 1.2, 0.02)),
+                 hue_shifts: Sequence[float] = (), blur_sigmas: Sequence[float] = (),
+                 jpeg_qualities: Sequence[int] = ()) -> None:
+        self.brightness_factors = tuple(float(factor) for factor in brightness_factors)
+        self.contrast_factors = tuple(float(factor) for factor in contrast_factors)
+        self.hue_shifts = tuple(float(angle) for angle in hue_shifts)
+        self.blur_sigmas = tuple(float(sigma) for sigma in blur_sigmas)
+        self.jpeg_qualities = tuple(int(quality) for quality in jpeg_qualities)
+
+    @property
+    def n_variants(self) -> int:
+        """Number of new samples created from each image."""
+        return (len(self.brightness_factors) + len(self.contrast_factors) + len(self.hue_shifts)
+                + len(self.blur_sigmas) + len(self.jpeg_qualities))
+
+    def to_dict(self) -> dict:
+        """Returns parameters of the grid, e.g. to be saved or used as a key."""
+        return {'brightness_factors': self.brightness_factors, 'contrast_factors': self.contrast_factors,
+                'hue_shifts': self.hue_shifts, 'blur_sigmas': self.blur_sigmas,
+                'jpeg_qualities': self.jpeg_qualities}
+
+    def apply(self, img: NDArray) -> NDArray:
+        """Creates all the new samples from image img of shape (height, width, 3) and dtype uint8.
+        Returns np.array of shape (self.n_variants, height, width, 3): first the samples with modified brightness,
+        then contrast, hue, blur and JPEG noise, each in the order of the corresponding factors."""
+        variants = [brightness_variants(img, self.brightness_factors),
+                    contrast_variants(img, self.contrast_factors),
+                    hue_shift_variants(img, self.hue_shifts),
+                    blur_variants(img, self.blur_sigmas),
+                    jpeg_noise_variants(img, self.jpeg_qualities)]
+        return np.concatenate(variants, axis=0)
+
+
+def brightness_variants(img: NDArray, factors: Sequence[float]) -> NDArray:
+    """Changes brightness of image img by each of the factors at once.
+    The result is the same as of PIL.ImageEnhance.Brightness, i.e. the image is blended with black image.
+    Returns np.array of shape (len(factors), height, width, 3)."""
+    return _blend(np.zeros((1, 1, 1), dtype=np.float32), img, factors)
+
+
+def contrast_variants(img: NDArray, factors: Sequence[float]) -> NDArray:
+    """Changes contrast of image img by each of the factors at once.
+    The result is the same as of PIL.ImageEnhance.Contrast, i.e. the image is blended with solid gray image
+    of its mean luminance.
+    Returns np.array of shape (len(factors), height, width, 3)."""
+    return _blend(np.full((1, 1, 1), _mean_luminance(img), dtype=np.float32), img, factors)
+
+
+def hue_shift_variants(img: NDArray, angles: Sequence[float]) -> NDArray:
+    """Rotates hue of image img by each of the angles (in degrees) at once.
+    The colors are rotated around the gray axis of RGB space, which keeps their luminance approximately unchanged.
+    Returns np.array of shape (len(angles), height, width, 3)."""
+    theta = np.deg2rad(np.asarray(angles, dtype=np.float32)).reshape(-1, 1, 1)
+    identity = np.eye(3, dtype=np.float32)
+    gray = np.full((3, 3), 1 / 3, dtype=np.float32)
+    cross = np.array([[0, -1, 1], [1, 0, -1], [-1, 1, 0]], dtype=np.float32) / np.sqrt(3)
+    rotations = np.cos(theta) * (identity - gray) + gray + np.sin(theta) * cross
+    shifted = np.einsum('nij,hwj->nhwi', rotations, img.astype(np.float32))
+    return np.clip(np.rint(shifted), 0, 255).astype(np.uint8)
+
+
+def blur_variants(img: NDArray, sigmas: Sequence[float]) -> NDArray:
+    """Blurs image img with Gaussian blur of each of the standard deviations sigmas (in pixels) at once.
+    The edges are extended by repeating the border pixels.
+    Returns np.array of shape (len(sigmas), height, width, 3)."""
+    sigmas = np.asarray(sigmas, dtype=np.float32).reshape(-1, 1)
+    if sigmas.size == 0:
+        return np.empty((0, ) + img.shape, dtype=np.uint8)
+    radius = max(1, int(np.ceil(3 * sigmas.max())))
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+    kernels = np.exp(-0.5 * (offsets / np.maximum(sigmas, 1e-6)) ** 2)
+    kernels /= kernels.sum(axis=1, keepdims=True)
+
+    padded = np.pad(img.astype(np.float32), ((radius, radius), (radius, radius), (0, 0)), mode='edge')
+    windows_rows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1, axis=0)
+    blurred = np.einsum('hwck,nk->nhwc', windows_rows, kernels)
+    windows_cols = np.lib.stride_tricks.sliding_window_view(blurred, 2 * radius + 1, axis=2)
+    blurred = np.einsum('nhwck,nk->nhwc', windows_cols, kernels)
+    return np.clip(np.rint(blurred), 0, 255).astype(np.uint8)
+
+
+def jpeg_noise_variants(img: NDArray, qualities: Sequence[int]) -> NDArray:
+    """Adds JPEG compression noise to image img by encoding and decoding it in memory with each of the qualities.
+    Returns np.array of shape (len(qualities), height, width, 3)."""
+    variants = np.empty((len(qualities), ) + img.shape, dtype=np.uint8)
+    pil_img = Image.fromarray(img)
+    for i, quality in enumerate(qualities):
+        buffer = io.BytesIO()
+        pil_img.save(buffer, format='JPEG', quality=quality)
+        buffer.seek(0)
+        with Image.open(buffer) as jpeg_img:
+            variants[i] = np.asarray(jpeg_img.convert('RGB'))
+    return variants
+
+
+def save_variants_as_png(variants: NDArray, path_data: Union[str, os.PathLike], country_number: int,
+                         first_counter: int = 1) -> None:
+    """Saves samples variants of country identified by country_number as <country_number>_<counter>.png in path_data,
+    where <counter> starts from first_counter. It is meant for debugging, as the samples are not read back."""
+    for counter, variant in enumerate(variants, start=first_counter):
+        Image.fromarray(variant).save(os.path.join(path_data, f'{country_number}_{counter}.png'))
+
+
+def _blend(degenerate: NDArray, img: NDArray, factors: Sequence[float]) -> NDArray:
+    """Blends degenerate and img images for each of the factors the same way as PIL.Image.blend does
+    (computing in float32 and truncating)."""
+    factors = np.asarray(factors, dtype=np.float32).reshape(-1, 1, 1, 1)
+    blended = degenerate + factors * (img.astype(np.float32) - degenerate)
+    return np.clip(blended, 0, 255).astype(np.uint8)
+
+
+def _mean_luminance(img: NDArray) -> int:
+    """Returns mean luminance of the image rounded the same way as in PIL.ImageEnhance.Contrast.
+    The luminance of pixel is computed as in PIL's conversion from RGB to L."""
+    rgb = img.astype(np.int64)
+    luminance = (rgb[..., 0] * 19595 + rgb[..., 1] * 38470 + rgb[..., 2] * 7471 + 0x8000) >> 16
+    return int(luminance.mean() + 0.5)
@@ -0,0 +1,101 @@
+import numpy as np
+from numpy.typing import NDArray
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import glob
+import os
+import time
+from typing import Iterable, Iterator, Optional, TextIO
+from .image_preprocessor import preprocess_image_to_array, create_data_sample_from_array
+from .recognizer import Recognizer
+
+
+def collect_paths(inputs: Iterable[str], stdin: Optional[TextIO] = None) -> Iterator[str]:
+    """Yields paths of images given by inputs, each being a directory (all files in it and its subdirectories
+    are taken, in sorted order), a glob pattern or a path of a file.
+    Input '-' means newline-separated paths read from stdin."""
+    for path_in in inputs:
+        if path_in == '-':
+            for line in stdin:
+                if line.strip():
+                    yield line.strip()
+        elif os.path.isdir(path_in):
+            for dir_path, dir_names, file_names in os.walk(path_in):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    yield os.path.join(dir_path, file_name)
+        elif glob.has_magic(path_in):
+            yield from sorted(glob.glob(path_in, recursive=True))
+        else:
+            yield path_in
+
+
+def recognize_files(recognizer: Recognizer, paths: Iterable[str], workers: int = 1, batch_size: int = 256,
+                    top_k: int = 1) -> Iterator[dict]:
+    """Recognizes flags in images from paths and yields the result for each of them, in the order of paths.
+    The images are read and preprocessed in a pool of workers processes and classified in batches of batch_size
+    images with a single call of the classifier.
+    The result is dict with path, class label, country name, probability, top_k most probable results and timing
+    (preprocessing time of the image and classification time of its batch divided by the batch size, in ms).
+    If the image cannot be recognized, the result is dict with path and error instead."""
+    create_sample = partial(_create_data_sample, width=recognizer.width, height=recognizer.height,
+                            pixels_indices=recognizer.pixels_indices)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for batch_paths in _iter_batches(paths, batch_size):
+            if executor is None:
+                samples = [create_sample(path) for path in batch_paths]
+            else:
+                samples = list(executor.map(create_sample, batch_paths, chunksize=max(1, batch_size // workers)))
+            yield from _recognize_batch(recognizer, batch_paths, samples, top_k)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _iter_batches(paths: Iterable[str], batch_size: int) -> Iterator[list[str]]:
+    """Yields lists of batch_size consecutive paths (the last one may be shorter)."""
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _create_data_sample(path: str, width: int, height: int,
+                        pixels_indices: tuple) -> tuple[Optional[NDArray], Optional[str], float]:
+    """Reads and preprocesses image from path and creates data sample from it.
+    Returns the sample (None if it failed), the error message (None if it succeeded) and time in ms.
+    It is a module-level function so that it can be run in a pool of processes."""
+    start = time.perf_counter()
+    try:
+        img = preprocess_image_to_array(path, width, height)
+        img_sample = create_data_sample_from_array(img, pixels_indices)
+        error = None
+    except FileNotFoundError:
+        img_sample, error = None, f'Missing file {path}'
+    except Exception as e:
+        img_sample, error = None, f'Unexpected error: {e}'
+    return img_sample, error, 1000 * (time.perf_counter() - start)
+
+
+def _recognize_batch(recognizer: Recognizer, paths: list[str], samples: list[tuple], top_k: int) -> Iterator[dict]:
+    """Classifies correctly preprocessed samples of one batch together and yields results for all the paths."""
+    valid = [i for i, (img_sample, _, _) in enumerate(samples) if img_sample is not None]
+    predictions = {}
+    predict_time = 0.0
+    if valid:
+        start = time.perf_counter()
+        top_results = recognizer.predict_top_k(np.stack([samples[i][0] for i in valid]), top_k)
+        predict_time = 1000 * (time.perf_counter() - start) / len(valid)
+        predictions = dict(zip(valid, top_results))
+
+    for i, (path, (_, error, preprocess_time)) in enumerate(zip(paths, samples)):
+        if i not in predictions:
+            yield {'path': path, 'error': error}
+            continue
+        yield {'path': path, **predictions[i][0], 'top_k': predictions[i],
+               'timing': {'preprocess_ms': round(preprocess_time, 3), 'predict_ms': round(predict_time, 3)}}
@@ -1,10 +1,19 @@
 import numpy as np
-import requests
+from numpy.typing import NDArray
 from bs4 import BeautifulSoup, element
 import os
-from typing import Union
-from .image_preprocessor import (get_pixels_positions, preprocess_image, create_data_sample_from_image,
-                                 change_brightness, change_contrast)
+import time
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Union, Optional, Callable, Iterator
+from .image_preprocessor import (get_pixels_positions, get_pixels_indices, preprocess_image_to_array,
+                                 create_data_samples_from_images, SVG_SUPERSAMPLING)
+from .augmentation import AugmentationGrid, save_variants_as_png
+from .downloader import Downloader
+from .stage_cache import StageCache
+from .mapped_dataset import save_mapped_dataset
+from .metrics import Metrics, get_metrics, call_with_metrics, timed
 
 
 class DatasetCreator:
@@ -12,10 +21,23 @@ class DatasetCreator:
     page_url is expected to be url of Wikipedia gallery of flags,
     img_url_start is expected to be the beginning of the url where the image of flag is located,
     path_data is a path where to save the images of flags,
-    width and height are the desired dimensions of the images.
+    width and height are the desired dimensions of the images,
+    augmentation describes how new samples are created from each image (see AugmentationGrid for the default),
+    workers is the number of processes used to preprocess images and create new samples (countries are processed
+    independently; the results are the same and in the same order as with a single process),
+    downloader is used to download the gallery and the images (by default Downloader with its default settings),
+    cache_dir is a directory of StageCache; if it is given, outputs of stages (downloaded images, preprocessed images,
+    new samples and features) are cached under keys made from their inputs and parameters, so that rebuilding
+    the dataset reruns only the stages of countries whose inputs changed,
+    download_max_age is the time (in seconds) after which cached downloaded images are downloaded again,
+    pixels_positions are positions [row, column] of pixels used as features (by default given by
+    get_pixels_positions), e.g. a layout chosen by select_pixels.
     """
     def __init__(self, page_url: str, img_url_start: str, path_data: Union[str, os.PathLike],
-                 width: int = 32, height: int = 20) -> None:
+                 width: int = 32, height: int = 20, augmentation: Optional[AugmentationGrid] = None,
+                 workers: int = 1, downloader: Optional[Downloader] = None,
+                 cache_dir: Optional[Union[str, os.PathLike]] = None, download_max_age: float = 24 * 3600,
+                 pixels_positions: Optional[tuple] = None) -> None:
         self._page_url = page_url
         self._img_url_start = img_url_start
         self._path_data = path_data
@@ -25,38 +47,80 @@ class DatasetCreator:
         self._height = height
         self._X = []
         self._y = []
+        self._augmentation = augmentation if augmentation is not None else AugmentationGrid()
+        self._samples = {}
         self._files_per_country = 0
+        self._workers = workers
+        self._downloader = downloader if downloader is not None else Downloader()
+        self._cache = StageCache(cache_dir) if cache_dir is not None else None
+        self._download_max_age = download_max_age
+        if pixels_positions is None:
+            pixels_positions, _, _ = get_pixels_positions(width=width, height=height)
+        self._pixels_positions = tuple([int(row), int(col)] for row, col in pixels_positions)
+        self._samples_keys = {}
+        self._created_at = time.time()
 
+    @timed('download.seconds')
     def download_dataset(self) -> None:
-        """Downloads images of flags and saves the list of the countries into text file."""
+        """Downloads images of flags and saves the list of the countries into text file.
+        The images are downloaded concurrently by self._downloader.
+        Line i of countries.txt is the name of the country with class label i, for every country in the gallery.
+        Countries whose image could not be downloaded keep their line (so that the labels of the other countries
+        do not change) but are left out of self._countries_numbers and are listed (with the errors returned
+        by the downloader) at the end."""
         if not self._get_page_content():
             return
         soup = BeautifulSoup(self._page_content, 'html.parser')
         elements = soup.find_all(class_='mw-file-description')
+        countries_names = [elem['title'] for elem in elements]
+        img_urls = [self._get_image_url(elem) for elem in elements]
+
+        print('Downloading data...')
+        results = self._download_images(img_urls)
 
         self._countries_numbers = []
-        counter = 0
+        failed = []
+        for counter, (country_name, (img_data, error)) in enumerate(zip(countries_names, results)):
+            if img_data is None:
+                get_metrics().increment('download.failures')
+                failed.append(f'image {counter} ({country_name}): {error}')
+                continue
+            self._save_image(img_data, counter)
+
         with open(os.path.join(self._path_data, 'countries.txt'), 'w') as txt_file_handler:
-            print('Downloading data...')
-            for elem in elements:
-                country_name = elem['title']
+            for country_name in countries_names:
                 txt_file_handler.write(country_name + '\n')
-
-                img_url = self._get_image_url(elem)
-                self._download_image(img_url, counter, country_name)
-
-                counter += 1
         print('Finished downloading data.')
+        if failed:
+            print(f'Failed to download {len(failed)} of {len(countries_names)} images:')
+            for failure in failed:
+                print(f'  {failure}')
+
+    def _download_images(self, img_urls: list[str]) -> list[tuple[Optional[bytes], Optional[str]]]:
+        """Downloads images from img_urls and returns their contents and errors (see Downloader.fetch_many).
+        If cache is used, images downloaded less than self._download_max_age seconds ago are taken from it."""
+        if self._cache is None:
+            return self._downloader.fetch_many(img_urls)
+        keys = [StageCache.make_key('download', img_url) for img_url in img_urls]
+        results = [(self._cache.get_bytes('download', key, max_age=self._download_max_age), None) for key in keys]
+        missing = [i for i, (img_data, _) in enumerate(results) if img_data is None]
+        print(f'{len(img_urls) - len(missing)} images taken from cache.')
+        for i, (img_data, error) in zip(missing, self._downloader.fetch_many([img_urls[i] for i in missing])):
+            results[i] = (img_data, error)
+            if img_data is not None:
+                self._cache.put_bytes('download', keys[i], img_data)
+        return results
 
     def _get_page_content(self) -> bool:
         """Saves the content of self._page_url into self._page_content"""
-        response = requests.get(self._page_url)
+        page_content, error = self._downloader.fetch(self._page_url)
 
-        if not response.ok:
-            print(f"No connection to {self._page_url}. Check your Internet connection.")
+        if page_content is None:
+            print(f"No connection to {self._page_url} ({error}). Check your Internet connection.")
+            get_metrics().increment('download.failures')
             return False
 
-        self._page_content = response.content
+        self._page_content = page_content
         return True
 
     def _get_image_url(self, elem: element.Tag) -> str:
@@ -69,111 +133,317 @@ class DatasetCreator:
         img_url = self._img_url_start + img_name
         return img_url
 
-    def _download_image(self, img_url: str, counter: int, country_name: str) -> None:
-        """Downloads image from url and saves as <counter>.svg (the original files from Wikipedia are SVG)
-        in the self._path_data.
+    def _save_image(self, img_data: bytes, counter: int) -> None:
+        """Saves downloaded image as <counter>.svg (the original files from Wikipedia are SVG) in the self._path_data.
         It also adds counter to self._countries_numbers as class label for this sample."""
-        response = requests.get(img_url)
-
-        if not response.ok:
-            print(f'Failed to connect to image {counter} ({country_name})')
-            return
-
-        img_data = response.content
         with open(os.path.join(self._path_data, f'{counter}.svg'), 'wb') as img_file_handler:
             img_file_handler.write(img_data)
             self._countries_numbers.append(counter)
+        get_metrics().increment('download.bytes_written', len(img_data))
 
+    @timed('preprocess.seconds')
     def preprocess_initial_images(self) -> None:
         """Preprocesses all the downloaded images by converting them to PNG (the images downloaded from Wikipedia are
         in SVG), resizing to (self._width, self._height) and converting to RGB (this ensures each image has 3 channels
         and not 4 (RGBA)).
-        Each converted image is saved as <country_number>_0.png in self._path_data."""
+        The conversion is made in memory and each converted image is saved once as <country_number>_0.png
+        in self._path_data."""
         print("Preprocessing images...")
-        for country_number in self._countries_numbers:
-            img_path_in = os.path.join(self._path_data, f'{country_number}.svg')
-            img_path_out = os.path.join(self._path_data, f'{country_number}_0.png')
-            preprocess_image(img_path_in, img_path_out, width=self._width, height=self._height)
-
-    def create_new_samples(self) -> None:
-        """Creates new samples by modifying brightness and contrast of each downloaded and preprocessed image.
-        New samples for country identified by country_number are saved as <country_number>_<counter>.png in
-        self._path_data."""
+        from_cache = self._map(partial(_preprocess_country_image, path_data=self._path_data, width=self._width,
+                                       height=self._height, cache=self._cache), self._countries_numbers)
+        if self._cache is not None:
+            print(f'{sum(from_cache)} preprocessed images taken from cache.')
+
+    @timed('create_new_samples.seconds')
+    def create_new_samples(self, save_png: bool = False) -> None:
+        """Creates new samples by modifying brightness and contrast (and other transformations given
+        in self._augmentation) of each downloaded and preprocessed image.
+        The preprocessed image <country_number>_0.png is read once and all its new samples are created at once
+        in memory. They are kept in self._samples together with the preprocessed image as the first sample.
+        If save_png is True, new samples for country identified by country_number are also saved
+        as <country_number>_<counter>.png in self._path_data (e.g. for debugging)."""
         print("Creating new samples...")
-        for country_number in self._countries_numbers:
-            img_path_in = os.path.join(self._path_data, f'{country_number}_0.png')
-            counter = 1
-            counter = self._create_by_modified_brightness(img_path_in, country_number, counter)
-            counter = self._create_by_modified_contrast(img_path_in, country_number, counter)
-        self._files_per_country = counter
-
-    def _create_by_modified_brightness(self, img_path_in: Union[str, os.PathLike],
-                                       country_number: int, counter: int) -> int:
-        """Creates new samples by modifying brightness of each downloaded and preprocessed image.
-        For each image there are plenty of new samples because the brightness is modified by different factors.
-        New samples for country identified by country_number are saved as <country_number>_<counter>.png in
-        self._path_data, where <counter> starts from the 'counter' argument.
-        Returns counter for naming the next sample to be created.
-        """
-        min_factor, max_factor, factor_step = 0.8, 1.2, 0.02
-        for factor in np.arange(min_factor, max_factor, factor_step):
-            img_path_out = os.path.join(self._path_data, f'{country_number}_{counter}.png')
-            change_brightness(img_path_in, img_path_out, factor)
-            counter += 1
-        return counter
-
-    def _create_by_modified_contrast(self, img_path_in: Union[str, os.PathLike],
-                                     country_number: int, counter: int) -> int:
-        """Creates new samples by modifying contrast of each downloaded and preprocessed image.
-        For each image there are plenty of new samples because the contrast is modified by different factors.
-        New samples for country identified by country_number are saved as <country_number>_<counter>.png in
-        self._path_data, where <counter> starts from the 'counter' argument.
-        Returns counter for naming the next sample to be created.
-        """
-        min_factor, max_factor, factor_step = 0.8, 1.2, 0.02
-        for factor in np.arange(min_factor, max_factor, factor_step):
-            img_path_out = os.path.join(self._path_data, f'{country_number}_{counter}.png')
-            change_contrast(img_path_in, img_path_out, factor)
-            counter += 1
-        return counter
-
-    def create_np_dataset_from_selected_pixels(self) -> None:
-        """Creates dataset in the form of numpy arrays from the images.
-        From each image it gets (R,G,B) of specific pixels that are determined by get_pixels_positions.
+        results = self._map(partial(_create_country_samples, path_data=self._path_data,
+                                    augmentation=self._augmentation, save_png=save_png, cache=self._cache),
+                            self._countries_numbers)
+        self._samples = {}
+        self._samples_keys = {}
+        for country_number, (samples, samples_key, _) in zip(self._countries_numbers, results):
+            if samples is not None:
+                self._samples[country_number] = samples
+                self._samples_keys[country_number] = samples_key
+        if self._cache is not None:
+            print(f'Samples of {sum(result[2] for result in results)} countries taken from cache.')
+        self._files_per_country = 1 + self._augmentation.n_variants
+
+    def _map(self, func: Callable, items: list) -> list:
+        """Applies func to each of items and returns the list of results in the order of items.
+        If self._workers > 1, the items are processed in a pool of self._workers processes,
+        otherwise one by one in the current process."""
+        return list(self._imap(func, items))
+
+    def _imap(self, func: Callable, items: list) -> Iterator:
+        """The same as _map, but yields the results one by one as soon as they are ready (in the order of items)."""
+        if self._workers <= 1 or len(items) <= 1:
+            for item in items:
+                yield func(item)
+            return
+        chunk_size = max(1, len(items) // (4 * self._workers))
+        metrics = get_metrics()
+        with ProcessPoolExecutor(max_workers=self._workers) as executor:
+            if not metrics.enabled:
+                yield from executor.map(func, items, chunksize=chunk_size)
+                return
+            # metrics recorded in the worker processes are sent back with the results
+            for result, metrics_state in executor.map(partial(call_with_metrics, func), items, chunksize=chunk_size):
+                metrics.merge(metrics_state)
+                yield result
+
+    @timed('create_np_dataset.seconds')
+    def create_np_dataset_from_selected_pixels(self, dir_name: Optional[str] = None) -> None:
+        """Creates dataset in the form of numpy arrays from the samples created by create_new_samples.
+        From each image it gets (R,G,B) of specific pixels that are determined by get_pixels_positions
+        (or pixels_positions given to the constructor).
         It writes R, G, B of each of these pixels as features in self._X and country numbers as class labels in self._y.
+        The number of samples is known in advance, so self._X and self._y are allocated once and filled
+        country by country.
+        If create_new_samples was not called, samples of each country are created on the fly and released once their
+        features are written, so samples of all countries are never held in memory at once.
+        If dir_name is given, self._X and self._y are memory-mapped files X.npy and y.npy in the directory dir_name
+        in self._path_data, so the dataset is streamed to disk instead of being held in memory.
         """
         print('Creating np dataset from selected pixels...')
-        pixels_positions, _, _ = get_pixels_positions(width=self._width, height=self._height)
-        img_samples = tuple()
-        y = []
-        for file_name in self._get_file_list():
-            try:
-                img_sample = create_data_sample_from_image(os.path.join(self._path_data, file_name), pixels_positions)
-                img_samples += (img_sample, )
-                y.append(self._get_country_number_from_file_name(file_name))
-            except FileNotFoundError:
-                print(f'Missing file {file_name}.')
-            except Exception as e:
-                print(f'Unexpected error: {e}')
-        self._X = np.stack(img_samples, axis=0)
-        self._y = np.array(y)
-
-    def _get_file_list(self) -> list[str]:
-        """Returns list of image files that are used as data samples."""
-        return [f'{country_number}_{i}.png' for country_number in self._countries_numbers
-                for i in range(self._files_per_country)]
+        pixels_positions = self._pixels_positions
+        pixels_indices = get_pixels_indices(pixels_positions)
+        countries_numbers = self._get_countries_with_samples()
+        files_per_country = 1 + self._augmentation.n_variants
+        n_rows = len(countries_numbers) * files_per_country
+        dir_path = os.path.join(self._path_data, dir_name) if dir_name is not None else None
+        X, y = self._allocate_dataset(n_rows, 3 * len(pixels_positions), dir_path)
+
+        row = 0
+        for country_number, features in zip(countries_numbers,
+                                             self._iter_countries_features(countries_numbers, pixels_positions,
+                                                                           pixels_indices)):
+            if features is None:
+                continue
+            X[row:row + len(features)] = features
+            y[row:row + len(features)] = country_number
+            row += len(features)
+
+        if row < n_rows:
+            X, y = self._truncate_dataset(X, y, row, dir_path)
+        elif dir_path is not None:
+            X.flush()
+            y.flush()
+        if dir_path is not None:
+            get_metrics().increment('create_np_dataset.bytes_written', X.nbytes + y.nbytes)
+        self._X, self._y = X, y
+        self._files_per_country = files_per_country
+
+    def _get_countries_with_samples(self) -> list[int]:
+        """Returns numbers of countries for which samples were created by create_new_samples or, if it was not
+        called, for which preprocessed image exists (so that samples can be created on the fly)."""
+        if self._samples:
+            available = self._samples.keys()
+        else:
+            available = [country_number for country_number in self._countries_numbers
+                         if os.path.exists(os.path.join(self._path_data, f'{country_number}_0.png'))]
+        countries_numbers = []
+        for country_number in self._countries_numbers:
+            if country_number in available:
+                countries_numbers.append(country_number)
+            else:
+                print(f'Missing samples for country {country_number}.')
+        return countries_numbers
+
+    def _iter_countries_features(self, countries_numbers: list[int], pixels_positions: tuple,
+                                 pixels_indices: tuple) -> Iterator[Optional[NDArray]]:
+        """Yields features of samples of each country from countries_numbers (None if its samples could not be
+        created)."""
+        if self._samples:
+            for country_number in countries_numbers:
+                yield self._get_country_features(self._samples[country_number], self._samples_keys[country_number],
+                                                 pixels_positions, pixels_indices)
+            return
+        create_samples = partial(_create_country_samples, path_data=self._path_data,
+                                 augmentation=self._augmentation, save_png=False, cache=self._cache)
+        for samples, samples_key, _ in self._imap(create_samples, countries_numbers):
+            if samples is None:
+                yield None
+            else:
+                yield self._get_country_features(samples, samples_key, pixels_positions, pixels_indices)
+
+    def _get_country_features(self, samples: NDArray, samples_key: Optional[str], pixels_positions: tuple,
+                              pixels_indices: tuple) -> NDArray:
+        """Returns features of samples of a country, taking them from cache if it is used and they were already
+        computed for the same samples and pixels positions."""
+        if self._cache is None:
+            return create_data_samples_from_images(samples, pixels_indices)
+        key = StageCache.make_key('features', samples_key, pixels_positions)
+        features = self._cache.get_array('features', key)
+        if features is not None:
+            get_metrics().increment('features.cache_hits')
+        else:
+            features = create_data_samples_from_images(samples, pixels_indices)
+            self._cache.put_array('features', key, features)
+        return features
+
+    @staticmethod
+    def _allocate_dataset(n_rows: int, n_features: int,
+                          dir_path: Optional[Union[str, os.PathLike]]) -> tuple[NDArray, NDArray]:
+        """Allocates features matrix X and class labels vector y for n_rows samples,
+        in memory or (if dir_path is given) as memory-mapped files X.npy and y.npy in dir_path."""
+        if dir_path is None:
+            return np.empty((n_rows, n_features), dtype=np.float32), np.empty(n_rows, dtype=np.int64)
+        os.makedirs(dir_path, exist_ok=True)
+        X = np.lib.format.open_memmap(os.path.join(dir_path, 'X.npy'), mode='w+', dtype=np.float32,
+                                      shape=(n_rows, n_features))
+        y = np.lib.format.open_memmap(os.path.join(dir_path, 'y.npy'), mode='w+', dtype=np.int64, shape=(n_rows, ))
+        return X, y
 
     @staticmethod
-    def _get_country_number_from_file_name(file_name: str) -> int:
-        """It extracts country number from file name."""
-        return int(file_name[:file_name.find('_')])
+    def _truncate_dataset(X: NDArray, y: NDArray, n_rows: int,
+                          dir_path: Optional[Union[str, os.PathLike]]) -> tuple[NDArray, NDArray]:
+        """Keeps only first n_rows samples of X and y (used when samples of some countries could not be created).
+        Memory-mapped files are rewritten with the kept samples."""
+        if dir_path is None:
+            return X[:n_rows], y[:n_rows]
+        truncated = []
+        for name, array in (('X', X), ('y', y)):
+            file_path = os.path.join(dir_path, f'{name}.npy')
+            np.save(file_path + '.tmp.npy', array[:n_rows])
+            array.flush()
+            os.replace(file_path + '.tmp.npy', file_path)
+            truncated.append(np.load(file_path, mmap_mode='r'))
+        return truncated[0], truncated[1]
+
+    def evict_stale_cache(self, max_bytes: Optional[int] = None) -> None:
+        """Removes cached entries that were not used since this DatasetCreator was created (so it should be called
+        after all the stages were run) and then the least recently used ones above max_bytes."""
+        if self._cache is None:
+            return
+        removed = self._cache.evict(unused_since=self._created_at, max_bytes=max_bytes)
+        print(f'Removed {removed} stale cache entries.')
+
+    @timed('save_uncompressed_dataset.seconds')
+    def save_uncompressed_dataset(self, dir_name: str) -> None:
+        """Saves dataset self._X, self._y in directory <dir_name> in self._path_data as uncompressed .npy files
+        with manifest (see save_mapped_dataset), so that it can be memory-mapped by MappedDataset.
+        If the dataset was created with the same dir_name, its files are already there and only the manifest
+        is written."""
+        print("Saving uncompressed dataset...")
+        metadata = {'width': self._width, 'height': self._height,
+                    'pixels_positions': [list(position) for position in self._pixels_positions]}
+        try:
+            save_mapped_dataset(os.path.join(self._path_data, dir_name), self._X, self._y, metadata)
+            print(f"Dataset saved to {dir_name}.")
+        except Exception as e:
+            print(f'Unexpected error: {e}')
+            get_metrics().error('save_uncompressed_dataset', e)
 
+    @timed('save_compressed_dataset.seconds')
     def save_compressed_dataset(self, file_name: str) -> None:
         """Saves dataset self._X, self._y as <file_name>, where file_name will be .npz"""
         print("Saving compressed dataset...")
         try:
-            np.savez_compressed(os.path.join(self._path_data, file_name),
-                                X=self._X, y=self._y)
+            file_path = os.path.join(self._path_data, file_name)
+            np.savez_compressed(file_path, X=self._X, y=self._y)
             print(f"Dataset saved to {file_name}.")
+            if get_metrics().enabled:
+                file_path = file_path if file_path.endswith('.npz') else file_path + '.npz'
+                get_metrics().increment('save_compressed_dataset.bytes_written', os.path.getsize(file_path))
         except Exception as e:
             print(f'Unexpected error: {e}')
+            get_metrics().error('save_compressed_dataset', e)
+
+
+def _preprocess_country_image(country_number: int, path_data: Union[str, os.PathLike], width: int, height: int,
+                              cache: Optional[StageCache] = None) -> bool:
+    """Preprocesses downloaded image <country_number>.svg from path_data and saves it as <country_number>_0.png
+    (see DatasetCreator.preprocess_initial_images).
+    If cache is given, the preprocessed image is taken from it if the same file was already preprocessed
+    to the same size. Returns True if the preprocessed image was taken from cache.
+    It is a module-level function so that it can be run in a pool of processes."""
+    img_path_in = os.path.join(path_data, f'{country_number}.svg')
+    img_path_out = os.path.join(path_data, f'{country_number}_0.png')
+    metrics = get_metrics()
+    try:
+        with metrics.timer('preprocess.image.seconds'):
+            return _preprocess_image_with_cache(img_path_in, img_path_out, width, height, cache, metrics)
+    except FileNotFoundError as e:
+        print(f'Missing file {img_path_in}')
+        metrics.error('preprocess', e)
+    except Exception as e:
+        print(f'Unexpected error: {e}')
+        metrics.error('preprocess', e)
+    return False
+
+
+def _preprocess_image_with_cache(img_path_in: str, img_path_out: str, width: int, height: int,
+                                 cache: Optional[StageCache], metrics: Metrics) -> bool:
+    """Preprocesses image img_path_in, saves it as img_path_out and returns whether it was taken from cache
+    (see _preprocess_country_image). Errors are raised."""
+    img, key = None, None
+    if cache is not None:
+        with open(img_path_in, 'rb') as file:
+            key = StageCache.make_key('rasterize', file.read(), width, height, SVG_SUPERSAMPLING)
+        img = cache.get_array('rasterize', key)
+    from_cache = img is not None
+    if from_cache:
+        metrics.increment('preprocess.cache_hits')
+    else:
+        if metrics.enabled:
+            metrics.increment('preprocess.bytes_read', os.path.getsize(img_path_in))
+        img = preprocess_image_to_array(img_path_in, width=width, height=height)
+        if cache is not None:
+            cache.put_array('rasterize', key, img)
+    Image.fromarray(img).save(img_path_out)
+    if metrics.enabled:
+        metrics.increment('preprocess.bytes_written', os.path.getsize(img_path_out))
+    return from_cache
+
+
+def _create_country_samples(country_number: int, path_data: Union[str, os.PathLike], augmentation: AugmentationGrid,
+                            save_png: bool, cache: Optional[StageCache] = None
+                            ) -> tuple[Optional[NDArray], Optional[str], bool]:
+    """Creates samples of country identified by country_number from its preprocessed image
+    (see DatasetCreator.create_new_samples).
+    Returns the preprocessed image followed by its new samples (or None if the preprocessed image could not be read),
+    the key of the samples (None if cache is not used) and whether the samples were taken from cache.
+    It is a module-level function so that it can be run in a pool of processes."""
+    img_path_in = os.path.join(path_data, f'{country_number}_0.png')
+    metrics = get_metrics()
+    try:
+        with Image.open(img_path_in) as img_pil:
+            img = np.asarray(img_pil.convert('RGB'))
+    except FileNotFoundError as e:
+        print(f'Missing file {img_path_in}.')
+        metrics.error('augment', e)
+        return None, None, False
+    except Exception as e:
+        print(f'Unexpected error: {e}')
+        metrics.error('augment', e)
+        return None, None, False
+    with metrics.timer('augment.country.seconds'):
+        return _augment_with_cache(img, country_number, path_data, augmentation, save_png, cache, metrics)
+
+
+def _augment_with_cache(img: NDArray, country_number: int, path_data: Union[str, os.PathLike],
+                        augmentation: AugmentationGrid, save_png: bool, cache: Optional[StageCache],
+                        metrics: Metrics) -> tuple[NDArray, Optional[str], bool]:
+    """Creates samples of country from its preprocessed image img (see _create_country_samples)."""
+    samples, key = None, None
+    if cache is not None:
+        key = StageCache.make_key('augment', img, augmentation.to_dict())
+        samples = cache.get_array('augment', key)
+    from_cache = samples is not None
+    if from_cache:
+        metrics.increment('augment.cache_hits')
+    else:
+        samples = np.concatenate((img[np.newaxis], augmentation.apply(img)), axis=0)
+        if cache is not None:
+            cache.put_array('augment', key, samples)
+    if save_png:
+        save_variants_as_png(samples[1:], path_data, country_number, first_counter=1)
+    return samples, key, from_cache
@@ -0,0 +1,203 @@
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+from typing import Iterator, Optional
+from .image_preprocessor import ImageSource, PixelsIndices, load_image, scale_to_unit_interval
+from .metrics import get_metrics
+from .recognizer import Recognizer
+
+# heights of windows as fractions of the height of the image, each 10% smaller than the previous one, down to 0.2
+DEFAULT_SCALES = tuple(float(scale) for scale in 0.9 ** np.arange(16))
+
+
+def image_pyramid(img: Image.Image, width: int, height: int, scales: tuple[float, ...],
+                  aspect_ratios: tuple[float, ...]) -> Iterator[tuple[NDArray, float, float]]:
+    """Yields levels of pyramid of image img: first img resized to (width, height), i.e. the whole image as
+    a single window (as assumed by Recognizer), and then, for each window of height scale * height of img and width
+    aspect_ratio * its height (windows wider than img are left out), img resized so that the window becomes
+    (width, height) pixels, as np.array of shape (resized height, resized width, 3) and dtype uint8,
+    together with its horizontal and vertical scaling factors (resized / original).
+    Large images are first reduced once by an integer factor to at least the size of the largest level,
+    so the cost of the levels does not depend on the resolution of img."""
+    img_width, img_height = img.size
+    largest_level_height = height / min(scales)
+    largest_level_width = width * img_width / (min(aspect_ratios) * min(scales) * img_height)
+    reduction = int(min(img_width / largest_level_width, img_height / largest_level_height))
+    base = img.reduce(reduction) if reduction >= 2 else img
+    yield np.asarray(base.resize((width, height))), width / img_width, height / img_height
+    for scale in scales:
+        window_height = scale * img_height
+        for aspect_ratio in aspect_ratios:
+            window_width = aspect_ratio * window_height
+            if window_width > img_width:
+                continue
+            size = (max(width, round(img_width * width / window_width)),
+                    max(height, round(img_height * height / window_height)))
+            yield np.asarray(base.resize(size)), size[0] / img_width, size[1] / img_height
+
+
+def window_features(level: NDArray, width: int, height: int, pixels_indices: PixelsIndices,
+                    stride: int = 1) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Creates data samples of all windows of size (width, height) of pyramid level, every stride pixels.
+    Returns samples of shape (n_windows, 3 * number of pixels) (see window_samples) followed by positions,
+    non-uniformity and edge contrasts of the windows (see window_measures)."""
+    positions, non_uniformity, edge_contrasts = window_measures(level, width, height, pixels_indices, stride)
+    return window_samples(level, positions, pixels_indices), positions, non_uniformity, edge_contrasts
+
+
+def window_measures(level: NDArray, width: int, height: int, pixels_indices: PixelsIndices,
+                    stride: int = 1) -> tuple[NDArray, NDArray, NDArray]:
+    """Returns positions (x, y) of all windows of size (width, height) of pyramid level, every stride pixels,
+    and two measures (from [0, 1]) of how well each window fits a flag:
+    non-uniformity - mean absolute difference between the selected pixels pixels_indices and their 4 neighbours
+    (pixels of a flag lie inside its uniformly colored regions, so it is close to 0 for windows fitting a flag),
+    edge contrasts of shape (n_windows, 4) - mean absolute difference between pixels just inside and just outside
+    of the top, bottom, left and right side of the window (a flag differs from its surroundings, while a part of
+    a flag continues beyond some of the sides). Sides lying on the border of level are nan.
+    Differences of neighbouring pixels are computed once for the whole level and, for each selected pixel or point
+    of a side, summed for all the windows at once from a strided slice of them."""
+    level = level[:, :, :3]
+    n_y = (level.shape[0] - height) // stride + 1
+    n_x = (level.shape[1] - width) // stride + 1
+    ys, xs = np.meshgrid(np.arange(n_y) * stride, np.arange(n_x) * stride, indexing='ij')
+
+    # differences (mean over channels) of vertically and horizontally neighbouring pixels of level padded by 1 pixel
+    padded = np.pad(level, ((1, 1), (1, 1), (0, 0))).astype(np.float32) / 255
+    vertical = np.abs(np.diff(padded, axis=0)).mean(axis=2)
+    horizontal = np.abs(np.diff(padded, axis=1)).mean(axis=2)
+    pixels_non_uniformity = (vertical[:-1, 1:-1] + vertical[1:, 1:-1] + horizontal[1:-1, :-1]
+                             + horizontal[1:-1, 1:]) / 4
+
+    def windows_mean(values: NDArray, offsets: list[tuple[int, int]]) -> NDArray:
+        """Mean of values at offsets (row, column) from the top left corner of each window."""
+        total = np.zeros((n_y, n_x), dtype=np.float32)
+        for row, col in offsets:
+            total += values[row:row + n_y * stride:stride, col:col + n_x * stride:stride]
+        return total / len(offsets)
+
+    rows, cols = pixels_indices
+    non_uniformity = windows_mean(pixels_non_uniformity, list(zip(rows.tolist(), cols.tolist())))
+    along_width = (1 + np.linspace(width / 8, 7 * width / 8, 5).astype(np.intp)).tolist()
+    along_height = (1 + np.linspace(height / 8, 7 * height / 8, 5).astype(np.intp)).tolist()
+    edge_contrasts = np.stack([windows_mean(vertical, [(0, col) for col in along_width]),
+                               windows_mean(vertical, [(height, col) for col in along_width]),
+                               windows_mean(horizontal, [(row, 0) for row in along_height]),
+                               windows_mean(horizontal, [(row, width) for row in along_height])], axis=2)
+    edge_contrasts[0, :, 0] = np.nan
+    edge_contrasts[ys[:, 0] + height == level.shape[0], :, 1] = np.nan
+    edge_contrasts[:, 0, 2] = np.nan
+    edge_contrasts[:, xs[0] + width == level.shape[1], 3] = np.nan
+    return (np.stack([xs.reshape(-1), ys.reshape(-1)], axis=1), non_uniformity.reshape(-1),
+            edge_contrasts.reshape(-1, 4))
+
+
+def window_samples(level: NDArray, positions: NDArray, pixels_indices: PixelsIndices) -> NDArray:
+    """Creates data samples of windows of pyramid level at positions (x, y) of their top left corners:
+    (R,G,B) of pixels pixels_indices of all of them are gathered with a single fancy-indexing operation, so the
+    samples are the same as created from each window by create_data_sample_from_array."""
+    rows, cols = pixels_indices
+    samples = level[positions[:, 1:2] + rows, positions[:, 0:1] + cols, :3]
+    return scale_to_unit_interval(samples.reshape(len(positions), 3 * len(rows)))
+
+
+def non_max_suppression(boxes: NDArray, scores: NDArray, iou_threshold: float = 0.3,
+                        max_boxes: Optional[int] = None) -> NDArray:
+    """Greedy non-maximum suppression: returns indices of boxes (x0, y0, x1, y1) from the best scored one, leaving
+    out boxes whose intersection over union with an already chosen box exceeds iou_threshold."""
+    order = np.argsort(-scores, kind='stable')
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    chosen = []
+    while len(order) and (max_boxes is None or len(chosen) < max_boxes):
+        best, order = order[0], order[1:]
+        chosen.append(best)
+        x0 = np.maximum(boxes[best, 0], boxes[order, 0])
+        y0 = np.maximum(boxes[best, 1], boxes[order, 1])
+        x1 = np.minimum(boxes[best, 2], boxes[order, 2])
+        y1 = np.minimum(boxes[best, 3], boxes[order, 3])
+        intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        iou = intersection / (areas[best] + areas[order] - intersection)
+        order = order[iou <= iou_threshold]
+    return np.array(chosen, dtype=np.intp)
+
+
+class FlagDetector:
+    """Finds flags inside larger images (e.g. photos of a flag on a pole) with recognizer.
+    The image is scanned by windows of heights scales (fractions of the height of the image) and aspect_ratios
+    (width / height), shifted by stride pixels of the window resized to the size of images of recognizer
+    (i.e. by stride / 32 of the window width for the default 32x20). Windows of each level of image_pyramid are
+    measured by window_measures, and only those that can reach min_score get data samples (window_samples),
+    which are classified in batches of batch_size windows.
+    The classifier has no class for background, so it can be confident about any window, also a part of a flag or
+    of the sky. Therefore, each window is scored by the probability of its class multiplied by
+    exp(-non-uniformity / uniformity_scale) and by the geometric mean of 1 - exp(-edge contrast / edge_scale)
+    of its sides that do not lie on the border of the image (see window_measures). They favour windows whose
+    selected pixels lie inside uniformly colored regions and whose every side separates the window from its
+    surroundings, so a window covering the whole flag is preferred to a part of it."""
+    def __init__(self, recognizer: Recognizer, scales: tuple[float, ...] = DEFAULT_SCALES,
+                 aspect_ratios: tuple[float, ...] = (1.5, 2.0, 1.0), stride: int = 1, uniformity_scale: float = 0.1,
+                 edge_scale: float = 0.05, batch_size: int = 65536) -> None:
+        self._recognizer = recognizer
+        self._scales = scales
+        self._aspect_ratios = aspect_ratios
+        self._stride = stride
+        self._uniformity_scale = uniformity_scale
+        self._edge_scale = edge_scale
+        self._batch_size = batch_size
+
+    def score_windows(self, img: Image.Image, min_score: float = 0.0) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+        """Classifies windows of img. Since probability is at most 1, only windows whose uniformity and edges alone
+        give score at least min_score are classified. Returns boxes (x0, y0, x1, y1) of the classified windows
+        in pixels of img, class labels and probabilities of the most probable class of each of them, and their
+        scores."""
+        width, height = self._recognizer.width, self._recognizer.height
+        samples, boxes, priors = [], [], []
+        for level, factor_x, factor_y in image_pyramid(img, width, height, self._scales, self._aspect_ratios):
+            positions, non_uniformity, edge_contrasts = window_measures(level, width, height,
+                                                                        self._recognizer.pixels_indices, self._stride)
+            level_priors = self._get_priors(non_uniformity, edge_contrasts)
+            candidates = level_priors >= min_score
+            positions = positions[candidates]
+            samples.append(window_samples(level, positions, self._recognizer.pixels_indices))
+            priors.append(level_priors[candidates])
+            corners = np.concatenate([positions, positions + [width, height]], axis=1)
+            boxes.append(corners / [factor_x, factor_y, factor_x, factor_y])
+        samples, boxes, priors = np.concatenate(samples), np.concatenate(boxes), np.concatenate(priors)
+
+        best = np.empty(len(samples), dtype=np.intp)
+        probabilities = np.empty(len(samples))
+        for start in range(0, len(samples), self._batch_size):
+            batch_probabilities = self._recognizer.predict_proba(samples[start:start + self._batch_size])
+            best[start:start + self._batch_size] = np.argmax(batch_probabilities, axis=1)
+            probabilities[start:start + self._batch_size] = batch_probabilities.max(axis=1)
+        get_metrics().increment('detector.windows', len(samples))
+        return boxes, self._recognizer.classes[best], probabilities, probabilities * priors
+
+    def _get_priors(self, non_uniformity: NDArray, edge_contrasts: NDArray) -> NDArray:
+        """Returns the part of scores of windows that does not depend on the classifier (see FlagDetector)."""
+        with np.errstate(divide='ignore'):
+            log_edges = np.log(1 - np.exp(-edge_contrasts / self._edge_scale))
+        inner_sides = ~np.isnan(log_edges)
+        edges = np.exp(np.where(inner_sides, log_edges, 0).sum(axis=1) / np.maximum(inner_sides.sum(axis=1), 1))
+        return np.exp(-non_uniformity / self._uniformity_scale) * edges
+
+    def detect(self, source: ImageSource, min_score: float = 0.5, iou_threshold: float = 0.3,
+               max_detections: int = 5) -> list[dict]:
+        """Finds flags in image given as file path, raw bytes or PIL image. Returns at most max_detections
+        detections (after non_max_suppression with iou_threshold) with score at least min_score, from the best
+        scored one: dicts with box [x0, y0, x1, y1] in pixels, class label, country name, probability and score.
+        Errors of reading the image are raised."""
+        with get_metrics().timer('detector.detect.seconds'):
+            img = load_image(source)
+            try:
+                boxes, labels, probabilities, scores = self.score_windows(img.convert('RGB'), min_score)
+            finally:
+                if img is not source:
+                    img.close()
+            candidates = np.flatnonzero(scores >= min_score)
+            chosen = candidates[non_max_suppression(boxes[candidates], scores[candidates], iou_threshold,
+                                                    max_detections)]
+            countries_names = self._recognizer.countries_names
+            return [{'box': [int(round(value)) for value in boxes[index]], 'label': int(labels[index]),
+                     'country': countries_names[labels[index]] if labels[index] < len(countries_names)
+                     else str(labels[index]),
+                     'probability': float(probabilities[index]), 'score': float(scores[index])} for index in chosen]
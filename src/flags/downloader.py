@@ -0,0 +1,69 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from .metrics import get_metrics
+
+
+class Downloader:
+    """Downloads files over HTTP reusing connections of a single session.
+    max_workers is the maximal number of concurrent downloads (and of pooled connections per host),
+    retries is the number of retries of a download that failed because of connection error or transient server
+    error (e.g. 503), with waiting time growing as backoff_factor * 2 ** (retry number - 1) seconds,
+    timeout is the timeout of a single request in seconds.
+    Failed downloads are not printed; fetch and fetch_many return their errors, so that the caller reports them
+    once."""
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_workers: int = 8, retries: int = 3, backoff_factor: float = 0.5,
+                 timeout: float = 30) -> None:
+        self._max_workers = max_workers
+        self._timeout = timeout
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=self.RETRY_STATUSES,
+                      allowed_methods=('GET', ), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def fetch(self, url: str) -> tuple[Optional[bytes], Optional[str]]:
+        """Downloads url. Returns its content and None, or None and description of the error if the download
+        failed."""
+        metrics = get_metrics()
+        try:
+            with metrics.timer('download.request.seconds'):
+                response = self._session.get(url, timeout=self._timeout)
+        except requests.RequestException as e:
+            metrics.error('download', e)
+            return None, f'connection error: {e}'
+        if not response.ok:
+            metrics.increment(f'download.errors.status_{response.status_code}')
+            return None, f'status {response.status_code}'
+        metrics.increment('download.bytes_read', len(response.content))
+        return response.content, None
+
+    def fetch_many(self, urls: list[str]) -> list[tuple[Optional[bytes], Optional[str]]]:
+        """Downloads all urls concurrently (using at most self._max_workers threads).
+        Returns (content, error) of each of them (see fetch) in the order of urls."""
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            return list(executor.map(self.fetch, urls))
+
+    def get(self, url: str) -> Optional[bytes]:
+        """Downloads url and returns its content or None if the download failed."""
+        return self.fetch(url)[0]
+
+    def get_many(self, urls: list[str]) -> list[Optional[bytes]]:
+        """Downloads all urls concurrently (using at most self._max_workers threads).
+        Returns their contents in the order of urls, with None for each download that failed."""
+        return [content for content, _ in self.fetch_many(urls)]
+
+    def close(self) -> None:
+        """Closes all the pooled connections."""
+        self._session.close()
+
+    def __enter__(self) -> 'Downloader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
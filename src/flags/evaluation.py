@@ -0,0 +1,120 @@
+import numpy as np
+from numpy.typing import NDArray
+from typing import Optional
+
+
+class EvaluationAccumulator:
+    """Accumulates evaluation of a classifier over chunks of a test set, so that the test set (e.g. memory-mapped)
+    never has to be predicted or held in memory at once.
+    classes are all class labels that can occur (true or predicted), top_k are the values of k for which
+    top-k accuracy is computed (it needs top_k_labels passed to update).
+    The confusion matrix is updated with a single np.bincount per chunk."""
+    def __init__(self, classes: NDArray, top_k: tuple[int, ...] = (1, 5)) -> None:
+        self._classes = np.unique(classes)
+        self._top_k = tuple(sorted(top_k))
+        n_classes = len(self._classes)
+        self._confusion = np.zeros((n_classes, n_classes), dtype=np.int64)
+        self._top_k_hits = {k: 0 for k in self._top_k}
+        self._top_k_samples = 0
+
+    @property
+    def classes(self) -> NDArray:
+        """Sorted class labels, in the order of rows and columns of the confusion matrix."""
+        return self._classes
+
+    @property
+    def confusion_matrix(self) -> NDArray:
+        """Confusion matrix: element [i, j] is the number of samples of class classes[i] predicted as classes[j]."""
+        return self._confusion
+
+    def update(self, y_true: NDArray, y_pred: NDArray, top_k_labels: Optional[NDArray] = None) -> None:
+        """Adds a chunk of true labels y_true and predicted labels y_pred.
+        top_k_labels of shape (n_samples, max(top_k)) are the most probable labels of each sample, starting from
+        the most probable one."""
+        true_idx = self._to_indices(y_true)
+        pred_idx = self._to_indices(y_pred)
+        n_classes = len(self._classes)
+        self._confusion += np.bincount(true_idx * n_classes + pred_idx,
+                                       minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+        if top_k_labels is not None:
+            hits = np.asarray(top_k_labels) == np.asarray(y_true)[:, np.newaxis]
+            for k in self._top_k:
+                self._top_k_hits[k] += int(hits[:, :k].any(axis=1).sum())
+            self._top_k_samples += len(true_idx)
+
+    def report(self, n_confused_pairs: int = 10) -> dict:
+        """Returns structured report:
+        n_samples, accuracy, top_k_accuracy (dict k -> accuracy, only if top_k_labels were given),
+        classes, support, tpr (true positive rate, recall) and precision of each class (nan if undefined),
+        confused_pairs - list of at most n_confused_pairs dicts with true label, predicted label and count,
+        for the most frequent misclassifications, and confusion_matrix."""
+        confusion = self._confusion
+        correct = np.diag(confusion)
+        support = confusion.sum(axis=1)
+        predicted = confusion.sum(axis=0)
+        n_samples = int(support.sum())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tpr = np.where(support > 0, correct / support, np.nan)
+            precision = np.where(predicted > 0, correct / predicted, np.nan)
+
+        report = {'n_samples': n_samples,
+                  'accuracy': float(correct.sum() / n_samples) if n_samples else float('nan'),
+                  'classes': self._classes, 'support': support, 'tpr': tpr, 'precision': precision,
+                  'confused_pairs': self._get_confused_pairs(n_confused_pairs), 'confusion_matrix': confusion}
+        if self._top_k_samples:
+            report['top_k_accuracy'] = {k: hits / self._top_k_samples for k, hits in self._top_k_hits.items()}
+        return report
+
+    def _get_confused_pairs(self, n: int) -> list[dict]:
+        """Returns at most n most frequent misclassifications."""
+        errors = self._confusion.copy()
+        np.fill_diagonal(errors, 0)
+        flat = errors.ravel()
+        n = min(n, int(np.count_nonzero(flat)))
+        if n == 0:
+            return []
+        top = np.argpartition(-flat, n - 1)[:n]
+        top = top[np.argsort(-flat[top], kind='stable')]
+        true_idx, pred_idx = np.divmod(top, len(self._classes))
+        return [{'true': self._classes[i].item(), 'predicted': self._classes[j].item(), 'count': int(flat[index])}
+                for i, j, index in zip(true_idx, pred_idx, top)]
+
+    def _to_indices(self, labels: NDArray) -> NDArray:
+        """Returns indices of labels in self._classes."""
+        labels = np.asarray(labels)
+        indices = np.searchsorted(self._classes, labels)
+        indices = np.minimum(indices, len(self._classes) - 1)
+        unknown = self._classes[indices] != labels
+        if unknown.any():
+            raise ValueError(f'Unknown class labels: {np.unique(labels[unknown])}.')
+        return indices
+
+
+def evaluate(clf, X: NDArray, y: NDArray, chunk_size: int = 65536, top_k: tuple[int, ...] = (1, 5),
+             classes: Optional[NDArray] = None, n_confused_pairs: int = 10) -> dict:
+    """Evaluates trained classifier clf on test set X, y (which can be memory-mapped) in chunks of chunk_size
+    samples and returns the report of EvaluationAccumulator. If clf has predict_proba and top_k is not empty, top-k
+    accuracy is computed from the probabilities (empty top_k turns it off and only clf.predict is used).
+    classes are all the class labels (by default classes of clf and labels in y)."""
+    if classes is None:
+        classes = np.union1d(clf.classes_, np.unique(y))
+    accumulator = EvaluationAccumulator(classes, top_k)
+    for start in range(0, len(y), chunk_size):
+        X_chunk, y_chunk = X[start:start + chunk_size], np.asarray(y[start:start + chunk_size])
+        if top_k and hasattr(clf, 'predict_proba'):
+            y_pred, top_k_labels = predict_top_k_labels(clf, X_chunk, max(top_k))
+            accumulator.update(y_chunk, y_pred, top_k_labels)
+        else:
+            accumulator.update(y_chunk, clf.predict(X_chunk))
+    return accumulator.report(n_confused_pairs)
+
+
+def predict_top_k_labels(clf, X: NDArray, k: int) -> tuple[NDArray, NDArray]:
+    """Returns predicted labels and k most probable labels (starting from the most probable one) of each sample
+    of X according to probabilities given by clf.predict_proba."""
+    probabilities = clf.predict_proba(X)
+    k = min(k, probabilities.shape[1])
+    best = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(probabilities, best, axis=1), axis=1, kind='stable')
+    top_k_labels = clf.classes_[np.take_along_axis(best, order, axis=1)]
+    return clf.classes_[np.argmax(probabilities, axis=1)], top_k_labels
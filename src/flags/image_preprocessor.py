@@ -1,20 +1,126 @@
 import numpy as np
 from numpy.typing import NDArray
-import cairosvg
 from PIL import Image, ImageEnhance
-from matplotlib.image import imread
+import io
 import math
 import os
-from typing import Union
+from typing import Union, Optional, NamedTuple
+from .metrics import get_metrics
+
+ImageSource = Union[str, os.PathLike, bytes, Image.Image]
+# SVG is rendered at SVG_SUPERSAMPLING times the target size and then resized, which antialiases edges of the shapes
+SVG_SUPERSAMPLING = 4
 
 
 def preprocess_image(file_path_in: Union[str, os.PathLike], file_path_out: Union[str, os.PathLike],
                      width: int, height: int) -> None:
     """Preprocess image file_path_in provided by user and saves it to file_path_out.
-    Namely, it converts it to PNG file, then resizes to (width, height) dimensions (in pixels) and converts to RGB."""
-    convert_to_png(file_path_in, file_path_out)
-    resize(file_path_out, file_path_out, width, height)
-    convert_to_rgb(file_path_out, file_path_out)
+    Namely, it converts it to PNG file, then resizes to (width, height) dimensions (in pixels) and converts to RGB.
+    All the steps are made in memory (see preprocess_image_to_array), only the final image is written."""
+    try:
+        img = preprocess_image_to_array(file_path_in, width, height)
+        Image.fromarray(img).save(file_path_out)
+    except FileNotFoundError as e:
+        print(f'Missing file {file_path_in}')
+        get_metrics().error('preprocess_image', e)
+    except Exception as e:
+        print(f'Unexpected error: {e}')
+        get_metrics().error('preprocess_image', e)
+
+
+def preprocess_image_to_array(source: ImageSource, width: int, height: int) -> NDArray:
+    """Preprocess image given as file path, raw bytes of the file or PIL image without writing any file.
+    It rasterizes SVG, resizes to (width, height) dimensions (in pixels) and converts to RGB.
+    SVG is rendered directly at SVG_SUPERSAMPLING times (width, height) instead of its own (often large) size.
+    Returns np.array of shape (height, width, 3) and dtype uint8.
+    Errors (e.g. missing file or file that is not an image) are raised."""
+    return preprocess_image_to_arrays(source, [(width, height)])[0]
+
+
+def preprocess_image_to_arrays(source: ImageSource, sizes: list[tuple[int, int]]) -> list[NDArray]:
+    """Preprocess image as preprocess_image_to_array to each of sizes (list of (width, height)).
+    The image is read (and SVG is parsed) only once, e.g. to compare datasets of images of different sizes.
+    Returns list of np.arrays of shapes (height, width, 3) and dtype uint8, in the order of sizes."""
+    with get_metrics().timer('preprocess_image.seconds'):
+        imgs = load_images(source, sizes)
+        try:
+            return [np.asarray(img.resize(size).convert('RGB')) for img, size in zip(imgs, sizes)]
+        finally:
+            for img in {id(img): img for img in imgs if img is not source}.values():
+                img.close()
+
+
+def load_image(source: ImageSource, size: Optional[tuple[int, int]] = None) -> Image.Image:
+    """Opens image given as file path, raw bytes of the file or PIL image (which is returned as it is).
+    SVG images are rasterized in memory: at SVG_SUPERSAMPLING times size (width, height), if it is given,
+    otherwise at their own size."""
+    return load_images(source, [size])[0]
+
+
+def load_images(source: ImageSource, sizes: list[Optional[tuple[int, int]]]) -> list[Image.Image]:
+    """Opens image as load_image once for each of sizes. SVG is parsed once and rendered at each size
+    (see rasterize_svg), other images are read once and the same PIL image is returned for each size."""
+    if isinstance(source, Image.Image):
+        return [source] * len(sizes)
+    metrics = get_metrics()
+    if metrics.enabled:
+        metrics.increment('load_image.bytes_read',
+                          len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source))
+    if isinstance(source, (bytes, bytearray)):
+        if is_svg_bytes(source):
+            return rasterize_svg(bytes(source), sizes)
+        img = Image.open(io.BytesIO(source))
+    elif is_svg_file(source):
+        return rasterize_svg(source, sizes)
+    else:
+        img = Image.open(source)
+    return [img] * len(sizes)
+
+
+def rasterize_svg(source: Union[str, os.PathLike, bytes], sizes: list[Optional[tuple[int, int]]],
+                  supersampling: int = SVG_SUPERSAMPLING) -> list[Image.Image]:
+    """Parses SVG given as file path or raw bytes once and renders it at supersampling times each of sizes
+    (list of (width, height)); None renders it at its own size. The drawing is stretched to the size, as resizing
+    of the image rendered at its own size does, so it is not letterboxed even if aspect ratios differ.
+    cairosvg is imported here, so that the cairo library is loaded only when SVG is actually converted."""
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PNGSurface
+    with get_metrics().timer('rasterize_svg.seconds'):
+        if isinstance(source, bytes):
+            tree = Tree(bytestring=source)
+        else:
+            tree = Tree(url=os.fspath(source))
+        preserve_aspect_ratio = tree.get('preserveAspectRatio')
+        imgs = []
+        for size in sizes:
+            output = io.BytesIO()
+            if size is None:
+                tree.pop('preserveAspectRatio', None)
+                if preserve_aspect_ratio is not None:
+                    tree['preserveAspectRatio'] = preserve_aspect_ratio
+                surface = PNGSurface(tree, output, 96)
+            else:
+                tree['preserveAspectRatio'] = 'none'
+                surface = PNGSurface(tree, output, 96, output_width=size[0] * supersampling,
+                                     output_height=size[1] * supersampling)
+            surface.finish()
+            output.seek(0)
+            imgs.append(Image.open(output))
+        return imgs
+
+
+def _svg_to_png(**kwargs) -> Optional[bytes]:
+    """Rasterizes SVG by cairosvg.svg2png called with kwargs.
+    cairosvg is imported here, so that the cairo library is loaded only when SVG is actually converted."""
+    import cairosvg
+    with get_metrics().timer('rasterize_svg.seconds'):
+        return cairosvg.svg2png(**kwargs)
+
+
+def _imread(file_path: Union[str, os.PathLike]) -> NDArray:
+    """Reads image file_path by matplotlib's imread, which is imported only when it is needed."""
+    from matplotlib.image import imread
+    return imread(file_path)
 
 
 def convert_to_png(img_path_in: Union[str, os.PathLike], img_path_out: Union[str, os.PathLike]) -> None:
@@ -22,14 +128,16 @@ def convert_to_png(img_path_in: Union[str, os.PathLike], img_path_out: Union[str
      If it is already converted to PNG it just saves it as img_path_out."""
     try:
         if is_svg_file(img_path_in):
-            cairosvg.svg2png(url=img_path_in, write_to=img_path_out)
+            _svg_to_png(url=img_path_in, write_to=img_path_out)
         else:
             with Image.open(img_path_in) as img:
                 img.save(img_path_out)
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         print(f'Missing file {img_path_in}')
+        get_metrics().error('convert_to_png', e)
     except Exception as e:
         print(f'Unexpected error: {e}')
+        get_metrics().error('convert_to_png', e)
 
 
 def resize(img_path_in: Union[str, os.PathLike], img_path_out: Union[str, os.PathLike], width: int, height: int) -> None:
@@ -38,10 +146,12 @@ def resize(img_path_in: Union[str, os.PathLike], img_path_out: Union[str, os.Pat
         with Image.open(img_path_in) as img:
             resized_img = img.resize((width, height))
             resized_img.save(img_path_out)
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         print(f'Missing file {img_path_in}')
+        get_metrics().error('resize', e)
     except Exception as e:
         print(f'Unexpected error: {e}')
+        get_metrics().error('resize', e)
 
 
 def convert_to_rgb(img_path_in: Union[str, os.PathLike], img_path_out: Union[str, os.PathLike]) -> None:
@@ -53,10 +163,12 @@ def convert_to_rgb(img_path_in: Union[str, os.PathLike], img_path_out: Union[str
         with Image.open(img_path_in) as img_pil:
             img_out = img_pil.convert('RGB')
             img_out.save(img_path_out)
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         print(f'Missing file {img_path_in}')
+        get_metrics().error('convert_to_rgb', e)
     except Exception as e:
         print(f'Unexpected error: {e}')
+        get_metrics().error('convert_to_rgb', e)
 
 
 def change_brightness(img_path_in: Union[str, os.PathLike], img_path_out: Union[str, os.PathLike], factor: float) -> None:
@@ -66,10 +178,12 @@ def change_brightness(img_path_in: Union[str, os.PathLike], img_path_out: Union[
             enhancer = ImageEnhance.Brightness(img)
             enhanced_img = enhancer.enhance(factor)
             enhanced_img.save(img_path_out)
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         print(f'Missing file {img_path_in}')
+        get_metrics().error('change_brightness', e)
     except Exception as e:
         print(f'Unexpected error: {e}')
+        get_metrics().error('change_brightness', e)
 
 
 def change_contrast(img_path_in: Union[str, os.PathLike], img_path_out: Union[str, os.PathLike], factor: float) -> None:
@@ -79,30 +193,84 @@ def change_contrast(img_path_in: Union[str, os.PathLike], img_path_out: Union[st
             enhancer = ImageEnhance.Contrast(img)
             enhanced_img = enhancer.enhance(factor)
             enhanced_img.save(img_path_out)
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         print(f'Missing file {img_path_in}')
+        get_metrics().error('change_contrast', e)
     except Exception as e:
         print(f'Unexpected error: {e}')
+        get_metrics().error('change_contrast', e)
 
 
 def create_data_sample_from_image(img_path_in: Union[str, os.PathLike], pixels_positions: tuple) -> NDArray:
     """Creates data sample in the form of np.array by selecting (R,G,B) from pixels determined by pixels_positions
-    from image img_path_in."""
-    img = imread(img_path_in)
-    img_sample = img[pixels_positions[0][0], pixels_positions[0][1]]
-    for i in range(1, len(pixels_positions)):
-        img_sample = np.concatenate((img_sample, img[pixels_positions[i][0], pixels_positions[i][1]]))
-    return img_sample
+    from image img_path_in.
+    pixels_positions can also be already computed PixelsIndices (see get_pixels_indices)."""
+    img = _imread(img_path_in)
+    return create_data_sample_from_array(img, pixels_positions)
 
 
-def create_data_sample_as_single(img_path_in: Union[str, os.PathLike], pixels_positions: tuple) -> NDArray:
+def create_data_sample_from_array(img: NDArray, pixels_positions: tuple) -> NDArray:
     """Creates data sample in the form of np.array by selecting (R,G,B) from pixels determined by pixels_positions
-    from image img_path_in.
+    from image img of shape (height, width, 3), e.g. returned by preprocess_image_to_array.
+    pixels_positions can also be already computed PixelsIndices (see get_pixels_indices).
+    Integer images are scaled to [0, 1] the same way as imread scales PNG files, so the sample is the same as the one
+    created from the saved image by create_data_sample_from_image."""
+    rows, cols = as_pixels_indices(pixels_positions)
+    return scale_to_unit_interval(img[rows, cols, :3].reshape(-1))
+
+
+def create_data_samples_from_images(imgs: NDArray, pixels_positions: tuple) -> NDArray:
+    """Creates data samples for a stack of images imgs of shape (N, height, width, 3) with a single
+    fancy-indexing operation.
+    pixels_positions can also be already computed PixelsIndices (see get_pixels_indices), which is preferred when
+    the function is called many times.
+    Returns np.array of shape (N, 3 * number of pixels); the i-th row is the same as the sample created from imgs[i]
+    by create_data_sample_from_array."""
+    rows, cols = as_pixels_indices(pixels_positions)
+    img_samples = imgs[:, rows, cols, :3]
+    return scale_to_unit_interval(img_samples.reshape(len(imgs), -1))
+
+
+def scale_to_unit_interval(values: NDArray) -> NDArray:
+    """Scales 8-bit color values to float32 from [0, 1]. Values that are already float are returned unchanged."""
+    if np.issubdtype(values.dtype, np.integer):
+        return np.divide(values, 255, dtype=np.float32)
+    return values
+
+
+def create_data_sample_as_single(img_in: Union[str, os.PathLike, NDArray], pixels_positions: tuple) -> NDArray:
+    """Creates data sample in the form of np.array by selecting (R,G,B) from pixels determined by pixels_positions
+    from image img_in, which is a path to the image file or already preprocessed image as np.array
+    (the latter skips reading the file).
     Then it reshapes it so that it can be input to predict() of machine learning model."""
-    img_sample = create_data_sample_from_image(img_path_in, pixels_positions)
+    if isinstance(img_in, np.ndarray):
+        img_sample = create_data_sample_from_array(img_in, pixels_positions)
+    else:
+        img_sample = create_data_sample_from_image(img_in, pixels_positions)
     return img_sample.reshape(1, -1)
 
 
+class PixelsIndices(NamedTuple):
+    """Rows and columns of pixels as np.arrays (see get_pixels_indices). Having its own type, it is never mistaken
+    for pixels positions, even for a layout of two pixels given as np.array."""
+    rows: NDArray
+    cols: NDArray
+
+
+def get_pixels_indices(pixels_positions: tuple) -> PixelsIndices:
+    """Converts pixels_positions (as returned by get_pixels_positions) into two np.arrays: rows and columns
+    of the pixels. They can be computed once and used to select all the pixels of many images at once."""
+    positions = np.asarray(pixels_positions, dtype=np.intp).reshape(-1, 2)
+    return PixelsIndices(positions[:, 0], positions[:, 1])
+
+
+def as_pixels_indices(pixels: Union[tuple, NDArray, PixelsIndices]) -> PixelsIndices:
+    """Returns PixelsIndices for pixels given either as pixels positions or as already computed PixelsIndices."""
+    if isinstance(pixels, PixelsIndices):
+        return pixels
+    return get_pixels_indices(pixels)
+
+
 def get_pixels_positions(width: int, height: int) -> tuple:
     """Returns positions of pixels that are selected to be used for creating a dataset.
     It also returns width_limits and height_limits that are typical lines where rectangles on flags have their borders."""
@@ -133,13 +301,19 @@ def get_pixels_positions(width: int, height: int) -> tuple:
 
 def is_svg_file(file_path: Union[str, os.PathLike]) -> bool:
     """Checks if a file is SVG."""
-    return file_path.lower().endswith('.svg')
+    return os.fspath(file_path).lower().endswith('.svg')
+
+
+def is_svg_bytes(data: bytes) -> bool:
+    """Checks if raw bytes of a file are SVG document."""
+    head = bytes(data[:4096]).lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    return head.startswith(b'<') and b'<svg' in head
 
 
 def is_rgba(file_path: Union[str, os.PathLike]) -> bool:
     """Checks if a file is RGBA image."""
     try:
-        img = imread(file_path)
+        img = _imread(file_path)
         return img.shape[2] > 3
     except FileNotFoundError:
         print(f'Missing file {file_path}')
@@ -0,0 +1,150 @@
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+from sklearn.linear_model import SGDClassifier
+import os
+import pickle
+from typing import Union, Optional, Callable, Iterable, Iterator
+from .augmentation import AugmentationGrid
+from .image_preprocessor import as_pixels_indices, create_data_samples_from_images
+from .mapped_dataset import MappedDataset
+from .metrics import get_metrics
+
+Batches = Iterable[tuple[NDArray, NDArray]]
+
+
+def iterate_dataset_batches(dataset: MappedDataset, batch_size: int = 1024,
+                            rng: Optional[np.random.Generator] = None) -> Iterator[tuple[NDArray, NDArray]]:
+    """Yields batches (X_batch, y_batch) of at most batch_size consecutive rows of memory-mapped dataset,
+    so only one batch at a time is read from disk. If rng is given, batches are yielded in random order
+    (rows inside of a batch stay in order, see shuffle_batches)."""
+    starts = np.arange(0, dataset.shape[0], batch_size)
+    if rng is not None:
+        starts = rng.permutation(starts)
+    for start in starts:
+        X_batch, y_batch = dataset.rows(int(start), int(start) + batch_size)
+        yield np.asarray(X_batch), np.asarray(y_batch)
+
+
+def load_base_images(path_data: Union[str, os.PathLike], countries_numbers: Iterable[int]) -> dict[int, NDArray]:
+    """Reads preprocessed images <country_number>_0.png (see DatasetCreator.preprocess_initial_images) from path_data.
+    Returns {country number: image of shape (height, width, 3)}; missing images are left out."""
+    images = {}
+    for country_number in countries_numbers:
+        file_path = os.path.join(path_data, f'{country_number}_0.png')
+        if os.path.exists(file_path):
+            with Image.open(file_path) as img:
+                images[country_number] = np.asarray(img.convert('RGB'))
+    return images
+
+
+def random_augmentation_grid(n_variants: int, rng: np.random.Generator) -> AugmentationGrid:
+    """Returns AugmentationGrid with n_variants factors of brightness and contrast drawn uniformly from the range
+    of the default grid [0.8, 1.2), half for brightness and half for contrast."""
+    n_brightness = n_variants // 2
+    return AugmentationGrid(brightness_factors=rng.uniform(0.8, 1.2, n_brightness),
+                            contrast_factors=rng.uniform(0.8, 1.2, n_variants - n_brightness))
+
+
+def iterate_augmented_batches(images: dict[int, NDArray], pixels_positions: tuple, n_variants: int = 40,
+                              rng: Optional[np.random.Generator] = None) -> Iterator[tuple[NDArray, NDArray]]:
+    """Yields one batch per country of images (as returned by load_base_images): features of its image and of
+    n_variants new samples created on the fly by random_augmentation_grid, so that new samples are never saved
+    and each call (e.g. each epoch) gives different ones.
+    Features are the same as created by DatasetCreator for pixels_positions (or already computed PixelsIndices)."""
+    rng = rng if rng is not None else np.random.default_rng()
+    pixels_indices = as_pixels_indices(pixels_positions)
+    countries_numbers = list(images)
+    for country_number in rng.permutation(countries_numbers):
+        img = images[country_number]
+        samples = np.concatenate((img[np.newaxis], random_augmentation_grid(n_variants, rng).apply(img)), axis=0)
+        yield (create_data_samples_from_images(samples, pixels_indices),
+               np.full(len(samples), country_number, dtype=np.int64))
+
+
+def shuffle_batches(batches: Batches, buffer_size: int, batch_size: int,
+                    rng: np.random.Generator) -> Iterator[tuple[NDArray, NDArray]]:
+    """Mixes rows of batches in a buffer of at least buffer_size rows and yields batches of batch_size random rows
+    of it, so that batches of a single class (as created by iterate_augmented_batches or read from a dataset
+    sorted by class) do not reach the classifier one after another. When the buffer is full, half of it is yielded
+    and the other half is mixed with the following rows. Only the buffer is kept in memory."""
+    X_buffer, y_buffer = [], []
+    n_buffered = 0
+    for X_batch, y_batch in batches:
+        X_buffer.append(X_batch)
+        y_buffer.append(y_batch)
+        n_buffered += len(y_batch)
+        if n_buffered < buffer_size:
+            continue
+        X_rows, y_rows = _shuffle_rows(X_buffer, y_buffer, rng)
+        n_out = min(max(batch_size, (n_buffered - buffer_size // 2) // batch_size * batch_size), n_buffered)
+        for start in range(0, n_out, batch_size):
+            yield X_rows[start:start + batch_size], y_rows[start:start + batch_size]
+        X_buffer, y_buffer = [X_rows[n_out:]], [y_rows[n_out:]]
+        n_buffered -= n_out
+    if n_buffered:
+        X_rows, y_rows = _shuffle_rows(X_buffer, y_buffer, rng)
+        for start in range(0, n_buffered, batch_size):
+            yield X_rows[start:start + batch_size], y_rows[start:start + batch_size]
+
+
+def _shuffle_rows(X_buffer: list[NDArray], y_buffer: list[NDArray],
+                  rng: np.random.Generator) -> tuple[NDArray, NDArray]:
+    """Concatenates buffered batches and shuffles their rows."""
+    X_rows, y_rows = np.concatenate(X_buffer), np.concatenate(y_buffer)
+    order = rng.permutation(len(y_rows))
+    return X_rows[order], y_rows[order]
+
+
+def train_incremental(make_batches: Callable[[int], Batches], classes: NDArray, clf: Optional[SGDClassifier] = None,
+                      epochs: int = 5, batch_size: int = 1024, buffer_size: int = 16384, random_state: int = 0,
+                      checkpoint_path: Optional[Union[str, os.PathLike]] = None,
+                      validation: Optional[tuple[NDArray, NDArray]] = None) -> SGDClassifier:
+    """Trains classifier clf (by default SGDClassifier with log loss, which can be exported by export_model)
+    by partial_fit on batches, without holding the whole training set in memory.
+    make_batches(epoch) returns batches (X_batch, y_batch) of the epoch, e.g. by iterate_dataset_batches or
+    iterate_augmented_batches; they are mixed by shuffle_batches with buffer_size and batch_size.
+    classes are all the class labels (partial_fit needs them in the first call).
+    If checkpoint_path is given, the classifier and the number of finished epochs are saved there after each epoch
+    and training is resumed from it if it already exists.
+    If validation (X, y) is given, accuracy on it is printed after each epoch."""
+    metrics = get_metrics()
+    start_epoch = 0
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        clf, start_epoch = load_checkpoint(checkpoint_path)
+        print(f'Resuming training from epoch {start_epoch + 1}...')
+    if clf is None:
+        clf = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=random_state)
+    classes = np.unique(classes)
+
+    for epoch in range(start_epoch, epochs):
+        epoch_rng = np.random.default_rng([random_state, epoch])
+        n_samples = 0
+        with metrics.timer('train_incremental.epoch.seconds'):
+            for X_batch, y_batch in shuffle_batches(make_batches(epoch), buffer_size, batch_size, epoch_rng):
+                clf.partial_fit(X_batch, y_batch, classes=classes)
+                n_samples += len(y_batch)
+        metrics.increment('train_incremental.samples', n_samples)
+        message = f'Epoch {epoch + 1}/{epochs}: {n_samples} samples'
+        if validation is not None:
+            message += f', validation accuracy {clf.score(*validation):.3f}'
+        print(message)
+        if checkpoint_path is not None:
+            save_checkpoint(checkpoint_path, clf, epoch + 1)
+    return clf
+
+
+def save_checkpoint(file_path: Union[str, os.PathLike], clf: SGDClassifier, epoch: int) -> None:
+    """Saves classifier clf trained for epoch epochs, so that train_incremental can resume from it.
+    The file is replaced atomically, so an interrupted save leaves the previous checkpoint."""
+    tmp_path = f'{os.fspath(file_path)}.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump({'clf': clf, 'epoch': epoch}, file, protocol=4)
+    os.replace(tmp_path, file_path)
+
+
+def load_checkpoint(file_path: Union[str, os.PathLike]) -> tuple[SGDClassifier, int]:
+    """Loads checkpoint saved by save_checkpoint. Returns the classifier and the number of finished epochs."""
+    with open(file_path, 'rb') as file:
+        checkpoint = pickle.load(file)
+    return checkpoint['clf'], checkpoint['epoch']
@@ -0,0 +1,110 @@
+import numpy as np
+from numpy.typing import NDArray
+import json
+import os
+from typing import Union, Optional
+
+MANIFEST_FILE_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def save_mapped_dataset(dir_path: Union[str, os.PathLike], X: NDArray, y: NDArray,
+                        metadata: Optional[dict] = None) -> None:
+    """Saves dataset X, y in directory dir_path as uncompressed X.npy and y.npy with manifest.json describing them,
+    so that it can be opened by MappedDataset without loading it into memory.
+    If X and y are already memory-mapped from X.npy and y.npy in dir_path, only the manifest is written.
+    Rows of each class are expected to be contiguous (as created by DatasetCreator); their ranges are saved
+    in the manifest so that a class can be read without scanning y.
+    metadata (e.g. dimensions of images and pixels positions) is saved in the manifest as it is."""
+    os.makedirs(dir_path, exist_ok=True)
+    arrays = {}
+    for name, array in (('X', X), ('y', y)):
+        file_path = os.path.join(dir_path, f'{name}.npy')
+        if isinstance(array, np.memmap) and os.path.exists(file_path) and os.path.samefile(array.filename, file_path):
+            array.flush()
+        else:
+            np.save(file_path, array)
+        arrays[name] = {'file': f'{name}.npy', 'dtype': np.dtype(array.dtype).str, 'shape': list(array.shape)}
+
+    manifest = {'format_version': FORMAT_VERSION, 'arrays': arrays, 'classes': _get_classes_ranges(y),
+                'metadata': metadata or {}}
+    with open(os.path.join(dir_path, MANIFEST_FILE_NAME), 'w') as file:
+        json.dump(manifest, file, indent=1)
+
+
+def _get_classes_ranges(y: NDArray) -> Optional[dict]:
+    """Returns {class label: [first row, last row + 1]} if rows of each class in y are contiguous, otherwise None."""
+    if len(y) == 0:
+        return {}
+    starts = np.flatnonzero(np.concatenate(([True], y[1:] != y[:-1])))
+    labels = y[starts]
+    if len(np.unique(labels)) != len(labels):
+        return None
+    stops = np.append(starts[1:], len(y))
+    return {str(label): [int(start), int(stop)] for label, start, stop in zip(labels, starts, stops)}
+
+
+class MappedDataset:
+    """Dataset saved by save_mapped_dataset, opened lazily.
+    Shapes and dtypes are read from the manifest, and X and y are memory-mapped read-only only when accessed,
+    so that processes opening the same dataset share its pages through the OS cache."""
+    def __init__(self, dir_path: Union[str, os.PathLike]) -> None:
+        self._dir_path = dir_path
+        with open(os.path.join(dir_path, MANIFEST_FILE_NAME), 'r') as file:
+            self._manifest = json.load(file)
+        if self._manifest['format_version'] > FORMAT_VERSION:
+            raise ValueError(f'Unsupported dataset format version {self._manifest["format_version"]}.')
+        self._arrays = {}
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Shape of features matrix X."""
+        return tuple(self._manifest['arrays']['X']['shape'])
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Data type of features matrix X."""
+        return np.dtype(self._manifest['arrays']['X']['dtype'])
+
+    @property
+    def metadata(self) -> dict:
+        """Metadata saved together with the dataset."""
+        return self._manifest['metadata']
+
+    @property
+    def X(self) -> NDArray:
+        """Memory-mapped features matrix."""
+        return self._get_array('X')
+
+    @property
+    def y(self) -> NDArray:
+        """Memory-mapped class labels vector."""
+        return self._get_array('y')
+
+    @property
+    def classes(self) -> list[int]:
+        """Class labels present in the dataset."""
+        if self._manifest['classes'] is not None:
+            return [int(label) for label in self._manifest['classes']]
+        return [int(label) for label in np.unique(self.y)]
+
+    def rows(self, start: int, stop: int) -> tuple[NDArray, NDArray]:
+        """Returns rows from start to stop (exclusive) of X and y, as views of memory-mapped files."""
+        return self.X[start:stop], self.y[start:stop]
+
+    def class_rows(self, label: int) -> tuple[NDArray, NDArray]:
+        """Returns rows of X and y of class label. If rows of each class are contiguous, they are views of
+        memory-mapped files, otherwise they are copied."""
+        classes = self._manifest['classes']
+        if classes is not None:
+            start, stop = classes.get(str(label), (0, 0))
+            return self.rows(start, stop)
+        indices = np.flatnonzero(self.y == label)
+        return self.X[indices], self.y[indices]
+
+    def _get_array(self, name: str) -> NDArray:
+        """Memory-maps array name on first access."""
+        if name not in self._arrays:
+            description = self._manifest['arrays'][name]
+            self._arrays[name] = np.load(os.path.join(self._dir_path, description['file']), mmap_mode='r')
+        return self._arrays[name]
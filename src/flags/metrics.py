@@ -0,0 +1,229 @@
+import numpy as np
+from contextlib import contextmanager, nullcontext
+import functools
+import random
+import threading
+import time
+from typing import Callable, ContextManager, Iterator, Optional
+
+HISTOGRAM_PERCENTILES = (50, 90, 99)
+RESERVOIR_SIZE = 1024
+
+
+class Metrics:
+    """Instrumentation surface used by DatasetCreator, image_preprocessor, ml_operations and Recognizer.
+    Metrics are identified by names like '<stage>.seconds' (histograms of durations), '<stage>.bytes_read',
+    '<stage>.bytes_written' and '<stage>.errors.<exception type>' (counters).
+    This class ignores everything (it is the default, so instrumentation costs a method call when metrics are
+    not collected). MetricsRegistry collects them in memory; other backends can subclass Metrics."""
+    enabled = False
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increments counter name by value."""
+
+    def observe(self, name: str, value: float) -> None:
+        """Records value (e.g. latency of one item) in histogram name."""
+
+    def error(self, stage: str, exception: BaseException) -> None:
+        """Counts exception raised (and handled) in stage by its type."""
+        self.increment(f'{stage}.errors.{type(exception).__name__}')
+
+    def timer(self, name: str) -> ContextManager:
+        """Context manager recording its duration in seconds in histogram name."""
+        return _NULL_CONTEXT
+
+
+_NULL_CONTEXT = nullcontext()
+
+
+class Histogram:
+    """Summary of values recorded in one histogram in bounded memory: their exact number, sum, minimum and maximum,
+    and a uniform random sample (reservoir) of at most reservoir_size of them, from which percentiles are estimated
+    (they are exact until reservoir_size values are recorded). It is not thread-safe (see MetricsRegistry)."""
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE, rng: Optional[random.Random] = None) -> None:
+        self._reservoir_size = reservoir_size
+        self._rng = rng if rng is not None else random.Random(0)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.reservoir = []
+
+    def observe(self, value: float) -> None:
+        """Records value (reservoir sampling: the n-th value replaces a random one with probability size / n)."""
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.reservoir) < self._reservoir_size:
+            self.reservoir.append(value)
+        else:
+            index = self._rng.randrange(self.count)
+            if index < self._reservoir_size:
+                self.reservoir[index] = value
+
+    def merge(self, state: dict) -> None:
+        """Adds histogram exported by export_state. The reservoirs are merged into a sample in which each of their
+        values is weighted by the number of values it stands for."""
+        if not state['count']:
+            return
+        weights = ([self.count / len(self.reservoir)] * len(self.reservoir) if self.reservoir else []) \
+            + [state['count'] / len(state['reservoir'])] * len(state['reservoir'])
+        values = self.reservoir + list(state['reservoir'])
+        if len(values) > self._reservoir_size:
+            indices = np.random.default_rng(self._rng.getrandbits(32)).choice(
+                len(values), self._reservoir_size, replace=False, p=np.array(weights) / sum(weights))
+            values = [values[index] for index in indices]
+        self.reservoir = values
+        self.count += state['count']
+        self.sum += state['sum']
+        self.min = min(self.min, state['min'])
+        self.max = max(self.max, state['max'])
+
+    def export_state(self) -> dict:
+        """Returns the summary as dict of plain values (e.g. to send it from a worker process)."""
+        return {'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+                'reservoir': list(self.reservoir)}
+
+    def summary(self) -> dict:
+        """Returns the number, sum, minimum, maximum, mean and percentiles of the values."""
+        summary = {'count': self.count, 'sum': float(self.sum), 'min': float(self.min), 'max': float(self.max),
+                   'mean': float(self.sum / self.count)}
+        for q, percentile in zip(HISTOGRAM_PERCENTILES, np.percentile(self.reservoir, HISTOGRAM_PERCENTILES)):
+            summary[f'p{q}'] = float(percentile)
+        return summary
+
+
+class MetricsRegistry(Metrics):
+    """Metrics collected in memory. snapshot returns counters and summaries of histograms.
+    Each histogram takes bounded memory (see Histogram with reservoir_size), so the registry can be used by
+    long-running processes such as the recognition server.
+    If callback is given, it is called with (kind, name, value) for every recorded value ('counter' or
+    'histogram'), e.g. to forward the values to a monitoring system. It can be used from many threads."""
+    enabled = True
+
+    def __init__(self, callback: Optional[Callable[[str, str, float], None]] = None,
+                 reservoir_size: int = RESERVOIR_SIZE) -> None:
+        self._callback = callback
+        self._reservoir_size = reservoir_size
+        self._counters = {}
+        self._histograms = {}
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        if self._callback is not None:
+            self._callback('counter', name, value)
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self._get_histogram(name).observe(value)
+        if self._callback is not None:
+            self._callback('histogram', name, value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> float:
+        """Returns value of counter name (0 if it was never incremented)."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def values(self, name: str) -> list[float]:
+        """Returns values kept in histogram name: all of them until reservoir_size values are recorded,
+        then a uniform random sample of them (see Histogram)."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            return list(histogram.reservoir) if histogram is not None else []
+
+    def snapshot(self) -> dict:
+        """Returns counters and, for each histogram, the number, sum, minimum, maximum, mean and percentiles
+        of its values."""
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+        return {'counters': dict(sorted(counters.items())), 'histograms': summaries}
+
+    def export_state(self) -> dict:
+        """Returns counters and histograms (see Histogram.export_state), e.g. to send them from a worker process
+        to be merged."""
+        with self._lock:
+            return {'counters': dict(self._counters),
+                    'histograms': {name: histogram.export_state() for name, histogram in self._histograms.items()}}
+
+    def merge(self, state: dict) -> None:
+        """Adds values exported by export_state of another registry."""
+        with self._lock:
+            for name, value in state['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            for name, histogram_state in state['histograms'].items():
+                self._get_histogram(name).merge(histogram_state)
+
+    def _get_histogram(self, name: str) -> Histogram:
+        """Returns histogram name, creating it if it does not exist yet."""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram(self._reservoir_size, self._rng)
+        return histogram
+
+    def print_summary(self) -> None:
+        """Prints counters and summaries of histograms."""
+        snapshot = self.snapshot()
+        for name, value in snapshot['counters'].items():
+            print(f'{name}: {value}')
+        for name, summary in snapshot['histograms'].items():
+            print(f'{name}: count {summary["count"]}, sum {summary["sum"]:.3f}, mean {summary["mean"]:.4f}, '
+                  f'p50 {summary["p50"]:.4f}, p99 {summary["p99"]:.4f}, max {summary["max"]:.4f}')
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Returns metrics that are currently used (by default Metrics, which ignores everything)."""
+    return _metrics
+
+
+def set_metrics(metrics: Optional[Metrics]) -> Metrics:
+    """Sets metrics used by instrumented code (None restores the default). Returns the previous metrics."""
+    global _metrics
+    previous = _metrics
+    _metrics = metrics if metrics is not None else Metrics()
+    return previous
+
+
+@contextmanager
+def use_metrics(metrics: Optional[Metrics]) -> Iterator[Optional[Metrics]]:
+    """Context manager using metrics within its block."""
+    previous = set_metrics(metrics)
+    try:
+        yield metrics
+    finally:
+        set_metrics(previous)
+
+
+def call_with_metrics(func: Callable, item) -> tuple:
+    """Calls func(item) collecting metrics in a new MetricsRegistry and returns the result with exported values
+    of the registry. It is used to collect metrics from a pool of processes."""
+    registry = MetricsRegistry()
+    with use_metrics(registry):
+        result = func(item)
+    return result, registry.export_state()
+
+
+def timed(name: str) -> Callable:
+    """Decorator recording duration of each call of the function in histogram name of the current metrics."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,27 +1,57 @@
 import numpy as np
 from numpy.typing import NDArray
 from sklearn.model_selection import StratifiedKFold, GridSearchCV, train_test_split
+from sklearn.base import clone
 from sklearn.linear_model import LogisticRegression
+from joblib import Parallel, delayed, parallel_config
+from threadpoolctl import threadpool_limits
 import pickle
 import os
 import math
-from typing import Union
+import time
+from typing import Union, Optional
+from .mapped_dataset import MappedDataset
+from .metrics import get_metrics, timed
+from .evaluation import EvaluationAccumulator
 
 
+def load_dataset(path: Union[str, os.PathLike]) -> tuple[NDArray, NDArray]:
+    """Loads dataset from .npz file or from directory of uncompressed dataset (see MappedDataset).
+    The uncompressed dataset is memory-mapped read-only instead of being read into memory.
+    Returns X - feature matrix and y - target variables (class labels) vector."""
+    if not os.path.isdir(path):
+        return load_data_from_npz(path)
+    dataset = MappedDataset(path)
+    X, y = dataset.X, dataset.y
+    print('Dataset size:', X.shape, y.shape)
+    return X, y
+
+
+@timed('load_dataset.seconds')
 def load_data_from_npz(file_path: Union[str, os.PathLike]) -> tuple[NDArray, NDArray]:
     """Loads data from .npz file.
     Returns X - feature matrix and y - target variables (class labels) vector."""
     data = np.load(file_path)
     X = data['X']
     y = data['y']
+    if get_metrics().enabled:
+        get_metrics().increment('load_dataset.bytes_read', os.path.getsize(file_path))
     print('Dataset size:', X.shape, y.shape)
     return X, y
 
 
+@timed('nested_cross_validation.seconds')
 def nested_cross_validation(X: NDArray, y: NDArray, clf: LogisticRegression, param_grid: dict,
-                            n_inner_splits: int, n_outer_splits: int) -> tuple[list, list]:
+                            n_inner_splits: int, n_outer_splits: int, n_jobs: int = 1, search: str = 'grid',
+                            patience: Optional[int] = None, min_improvement: float = 0.0) -> tuple[list, list]:
     """Makes nested cross validation on dataset X with labels y using classifier clf.
-    Parameters of clf given in param_grid are compared using grid search method.
+    Parameters of clf given in param_grid are compared using grid search method (search = 'grid')
+    or, if param_grid contains only C, using warm-started regularization path (search = 'path',
+    see regularization_path_search, which takes patience and min_improvement).
+    n_jobs is the number of processes used (-1 means all CPUs): iterations of outer loop are run in parallel
+    and the remaining processes are used by grid search in each of them (see split_jobs). X and y are shared
+    by the processes as memory-mapped files instead of being copied to each of them and BLAS threads are limited
+    so that the CPUs are not oversubscribed. The results are the same as with n_jobs = 1.
     Returns
     inner_scores - detailed results from inner loop,
     outer_scores - scores of the best classifier in each iteration of outer loop
@@ -29,19 +59,95 @@ def nested_cross_validation(X: NDArray, y: NDArray, clf: LogisticRegression, par
     inner_cv = StratifiedKFold(n_splits=n_inner_splits, shuffle=True, random_state=0)
     outer_cv = StratifiedKFold(n_splits=n_outer_splits, shuffle=True, random_state=0)
 
-    best_params_list = []
-    inner_scores = []
+    outer_jobs, inner_jobs, blas_threads = split_jobs(n_jobs, n_outer_splits)
+    with parallel_config(backend='loky', inner_max_num_threads=blas_threads):
+        results = Parallel(n_jobs=outer_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(_fit_grid_search)(X, y, train_idx, clf, param_grid, inner_cv, inner_jobs, blas_threads, search,
+                                      patience, min_improvement)
+            for train_idx, _ in outer_cv.split(X, y))
 
-    for train_idx, test_idx in outer_cv.split(X, y):
-        X_train, X_test, = X[train_idx], X[test_idx]
-        y_train, y_test = y[train_idx], y[test_idx]
+    inner_scores = [cv_results for cv_results, _ in results]
+    best_params_list = [best_params for _, best_params in results]
+    return inner_scores, best_params_list
 
-        grid_search = GridSearchCV(estimator=clf, param_grid=param_grid, cv=inner_cv)
-        grid_search.fit(X_train, y_train)
 
-        inner_scores.append(grid_search.cv_results_)
-        best_params_list.append(grid_search.best_params_)
-    return inner_scores, best_params_list
+def split_jobs(n_jobs: int, n_outer_splits: int) -> tuple[int, int, int]:
+    """Splits budget of n_jobs processes (-1 means all CPUs) of nested cross validation.
+    Returns the number of iterations of outer loop run in parallel, the number of processes of grid search
+    in each of them and the number of BLAS threads per process, so that their product does not exceed
+    the number of CPUs (or n_jobs if it is larger)."""
+    n_cpus = os.cpu_count() or 1
+    if n_jobs < 0:
+        n_jobs = max(1, n_cpus + 1 + n_jobs)
+    outer_jobs = max(1, min(n_jobs, n_outer_splits))
+    inner_jobs = max(1, n_jobs // outer_jobs)
+    blas_threads = max(1, n_cpus // (outer_jobs * inner_jobs))
+    return outer_jobs, inner_jobs, blas_threads
+
+
+def _fit_grid_search(X: NDArray, y: NDArray, train_idx: NDArray, clf: LogisticRegression, param_grid: dict,
+                     inner_cv: StratifiedKFold, n_jobs: int, blas_threads: int, search: str = 'grid',
+                     patience: Optional[int] = None, min_improvement: float = 0.0) -> tuple[dict, dict]:
+    """Makes grid search on training part (given by train_idx) of one iteration of outer loop of nested cross
+    validation with n_jobs processes, each using at most blas_threads BLAS threads.
+    With search = 'path', regularization_path_search is made instead (in a single process).
+    Returns detailed results and the best set of grid parameters."""
+    if search == 'path':
+        if set(param_grid) != {'C'}:
+            raise ValueError('Regularization path search supports only param_grid with C.')
+        with threadpool_limits(limits=blas_threads):
+            return regularization_path_search(X[train_idx], y[train_idx], clf, param_grid['C'], inner_cv, patience,
+                                              min_improvement)
+    if search != 'grid':
+        raise ValueError(f'Unknown search {search}. Available searches: grid, path.')
+    grid_search = GridSearchCV(estimator=clf, param_grid=param_grid, cv=inner_cv, n_jobs=n_jobs)
+    with threadpool_limits(limits=blas_threads), parallel_config(backend='loky', inner_max_num_threads=blas_threads):
+        grid_search.fit(X[train_idx], y[train_idx])
+    return grid_search.cv_results_, grid_search.best_params_
+
+
+def regularization_path_search(X: NDArray, y: NDArray, clf: LogisticRegression, Cs: list, cv: StratifiedKFold,
+                               patience: Optional[int] = None, min_improvement: float = 0.0) -> tuple[dict, dict]:
+    """Compares values Cs of regularization hyperparameter of clf by cross validation cv on dataset X with labels y,
+    visiting them in increasing order and starting each fit from the coefficients fitted for the previous C
+    (warm start) in the same fold, which is much faster than fitting from scratch for large C.
+    If patience is given, the search stops when mean validation accuracy has not improved by more than
+    min_improvement for patience consecutive values of C.
+    Returns results in the format of cv_results_ of GridSearchCV (params in increasing order of C, with mean
+    and per fold test scores and fit times; values of C that were not visited have nan scores and fit times)
+    and the best set of parameters."""
+    Cs = sorted(Cs)
+    splits = list(cv.split(X, y))
+    classifiers = [clone(clf).set_params(warm_start=True) for _ in splits]
+    test_scores = np.full((len(splits), len(Cs)), np.nan)
+    fit_times = np.full((len(splits), len(Cs)), np.nan)
+
+    best_score = -np.inf
+    n_without_improvement = 0
+    for i, C in enumerate(Cs):
+        for j, (classifier, (train_idx, test_idx)) in enumerate(zip(classifiers, splits)):
+            start = time.perf_counter()
+            classifier.set_params(C=C).fit(X[train_idx], y[train_idx])
+            fit_times[j, i] = time.perf_counter() - start
+            get_metrics().observe('regularization_path_search.fit.seconds', fit_times[j, i])
+            test_scores[j, i] = classifier.score(X[test_idx], y[test_idx])
+
+        mean_score = test_scores[:, i].mean()
+        if mean_score > best_score + min_improvement:
+            n_without_improvement = 0
+        else:
+            n_without_improvement += 1
+        best_score = max(best_score, mean_score)
+        if patience is not None and n_without_improvement >= patience:
+            break
+
+    cv_results = {'params': [{'C': C} for C in Cs], 'param_C': np.array(Cs),
+                  'mean_fit_time': fit_times.mean(axis=0), 'std_fit_time': fit_times.std(axis=0),
+                  'mean_test_score': test_scores.mean(axis=0), 'std_test_score': test_scores.std(axis=0)}
+    for j in range(len(splits)):
+        cv_results[f'split{j}_test_score'] = test_scores[j]
+    best_index = int(np.nanargmax(cv_results['mean_test_score']))
+    return cv_results, cv_results['params'][best_index]
 
 
 def process_cross_validation_results(inner_scores: list) -> tuple[list, NDArray, NDArray]:
@@ -50,7 +156,8 @@ def process_cross_validation_results(inner_scores: list) -> tuple[list, NDArray,
     Returns
     params_list - list of combinations of parameters checked in grid search,
     params_scores - mean score for each position from params list
-    fit_times - mean times of fitting for each position from params list"""
+    fit_times - mean times of fitting for each position from params list
+    (parameters not checked in some iterations, see regularization_path_search, are averaged over the others)"""
     params_scores = []
     fit_times = []
     params_list = []
@@ -65,8 +172,8 @@ def process_cross_validation_results(inner_scores: list) -> tuple[list, NDArray,
 
     params_scores = np.array(params_scores)
     fit_times = np.array(fit_times)
-    params_scores = params_scores.mean(axis=0)
-    fit_times = fit_times.mean(axis=0)
+    params_scores = np.nanmean(params_scores, axis=0)
+    fit_times = np.nanmean(fit_times, axis=0)
     return params_list, params_scores, fit_times
 
 
@@ -84,6 +191,7 @@ def print_cross_validation_results(params_list: list, params_scores: NDArray, fi
     print(best_params_list)
 
 
+@timed('simple_cross_validation.seconds')
 def simple_cross_validation(X: NDArray, y: NDArray, clf: LogisticRegression, n_splits: int) -> NDArray:
     """Makes simple (non-nested) cross validation to estimate the performance of clf.
     It works on dataset X with labels y using classifier clf. """
@@ -91,7 +199,8 @@ def simple_cross_validation(X: NDArray, y: NDArray, clf: LogisticRegression, n_s
     scores = []
 
     for train_idx, test_idx in cv_fold.split(X, y):
-        clf.fit(X[train_idx], y[train_idx])
+        with get_metrics().timer('simple_cross_validation.fit.seconds'):
+            clf.fit(X[train_idx], y[train_idx])
         score = clf.score(X[test_idx], y[test_idx])
         scores.append(score)
     return np.array(scores)
@@ -107,44 +216,49 @@ def save_trained_model(clf: LogisticRegression, file_path: Union[str, os.PathLik
     print("Saving the trained classifier...")
     try:
         pickle.dump(clf, open(file_path, 'wb'), protocol=4)
+        if get_metrics().enabled:
+            get_metrics().increment('save_trained_model.bytes_written', os.path.getsize(file_path))
     except Exception as e:
         print(f"Error: {e}")
+        get_metrics().error('save_trained_model', e)
 
 
+@timed('model_performance_per_class.seconds')
 def model_performance_per_class(X: NDArray, y: NDArray, clf: LogisticRegression, test_part: float = 0.2) -> dict:
     """Calculates model performance per each class.
     To do this, the dataset is divided into training and test sample. The classifier clf is trained and then it predicts
     the classes for test dataset.
-    The performance is assessed by true positive rate (TPR) for each class.
+    The performance is assessed by true positive rate (TPR) for each class, computed from the confusion matrix
+    (see EvaluationAccumulator).
     It is checked for which classes TPR = 100% and for which not."""
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_part, random_state=0)
 
     clf.fit(X_train, y_train)
     y_pred = clf.predict(X_test)
 
-    labels = np.unique(y_test)
-
-    class_accuracies = {}
-    for label in labels:
-        indices_lab = np.where(y_test == label)
-        class_accuracies[label] = np.sum(y_test[indices_lab] == y_pred[indices_lab]) / len(y_test[indices_lab])
+    accumulator = EvaluationAccumulator(np.union1d(clf.classes_, y_test), top_k=())
+    accumulator.update(y_test, y_pred)
+    report = accumulator.report()
+    tested = report['support'] > 0
+    labels = report['classes'][tested]
+    class_accuracies = dict(zip(labels, report['tpr'][tested]))
 
     print('Number of all classes:', len(labels))
     print('Labels with 100% accuracy:')
-    great_accuracy_labels = []
-    for label in class_accuracies:
-        if math.isclose(class_accuracies[label], 1.0, abs_tol=1e-3):
-            great_accuracy_labels.append(label)
+    great_accuracy_labels = [label for label in labels if math.isclose(class_accuracies[label], 1.0, abs_tol=1e-3)]
     print('Number: ', len(great_accuracy_labels), '. Labels:', great_accuracy_labels)
 
     print('Labels with accuracy < 100%:')
-    mistake_labels = []
-    for label in class_accuracies:
-        if class_accuracies[label] < 0.999:
-            mistake_labels.append(label)
-            print(label, ':', class_accuracies[label])
-
+    mistake_labels = [label for label in labels if class_accuracies[label] < 0.999]
     for label in mistake_labels:
-        print(f'Label {label} was identified as', y_pred[np.where(y_test == label)])
+        print(label, ':', class_accuracies[label])
+
+    # rows of the confusion matrix give the predictions of each class without scanning y_test again
+    mistake_labels = set(mistake_labels)
+    for label, row in zip(accumulator.classes, accumulator.confusion_matrix):
+        if label in mistake_labels:
+            predicted = np.flatnonzero(row)
+            print(f'Label {label} was identified as',
+                  dict(zip(accumulator.classes[predicted].tolist(), row[predicted].tolist())))
 
     return class_accuracies
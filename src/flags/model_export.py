@@ -0,0 +1,100 @@
+import numpy as np
+from numpy.typing import NDArray
+import pickle
+import os
+from typing import Union, Optional
+from .image_preprocessor import get_pixels_positions, get_pixels_indices, PixelsIndices
+
+FORMAT_VERSION = 1
+
+
+def export_model(clf, file_path: Union[str, os.PathLike], width: int = 32, height: int = 20,
+                 pixels_positions: Optional[tuple] = None) -> None:
+    """Exports linear classifier clf (LogisticRegression or SGDClassifier with log loss) to .npz file file_path
+    without pickling it: only its coefficients, intercepts and classes are saved, together with dimensions of images
+    and pixels positions (by default given by get_pixels_positions) used to create its features.
+    The exported model can be loaded by NumpyPredictor.load (or load_model) without scikit-learn."""
+    if pixels_positions is None:
+        pixels_positions, _, _ = get_pixels_positions(width=width, height=height)
+    pixels_rows, pixels_cols = get_pixels_indices(pixels_positions)
+    np.savez(file_path, format_version=FORMAT_VERSION, coef=clf.coef_, intercept=clf.intercept_,
+             classes=clf.classes_, probability=_get_probability_type(clf), width=width, height=height,
+             pixels_rows=pixels_rows, pixels_cols=pixels_cols)
+
+
+def _get_probability_type(clf) -> str:
+    """Returns 'softmax' if clf computes probabilities as multinomial logistic regression does
+    or 'ovr' if it normalizes probabilities of one-vs-rest binary classifiers."""
+    multi_class = getattr(clf, 'multi_class', None)
+    if multi_class is None:
+        return 'ovr'
+    if multi_class == 'multinomial':
+        return 'softmax'
+    if multi_class == 'ovr':
+        return 'ovr'
+    return 'softmax' if len(clf.classes_) > 2 and getattr(clf, 'solver', None) != 'liblinear' else 'ovr'
+
+
+class NumpyPredictor:
+    """Linear classifier exported by export_model, making predictions with numpy only.
+    It gives the same predictions and probabilities as the exported classifier."""
+    def __init__(self, coef: NDArray, intercept: NDArray, classes: NDArray, probability: str = 'softmax',
+                 width: int = 32, height: int = 20, pixels_indices: Optional[PixelsIndices] = None) -> None:
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+        self.probability = probability
+        self.width = width
+        self.height = height
+        self.pixels_indices = pixels_indices
+
+    @classmethod
+    def load(cls, file_path: Union[str, os.PathLike]) -> 'NumpyPredictor':
+        """Loads model exported by export_model."""
+        with np.load(file_path) as data:
+            if int(data['format_version']) > FORMAT_VERSION:
+                raise ValueError(f'Unsupported model format version {int(data["format_version"])}.')
+            return cls(data['coef'], data['intercept'], data['classes'], str(data['probability']),
+                       int(data['width']), int(data['height']),
+                       PixelsIndices(data['pixels_rows'], data['pixels_cols']))
+
+    def decision_function(self, X: NDArray) -> NDArray:
+        """Returns scores of each class for each sample of X (of shape (n_samples, n_features))."""
+        scores = np.asarray(X, dtype=np.float64) @ self.coef_.T + self.intercept_
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict_proba(self, X: NDArray) -> NDArray:
+        """Returns probabilities of each class for each sample of X (of shape (n_samples, n_features))."""
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            if self.probability == 'softmax':
+                scores = np.column_stack((-scores, scores))
+            else:
+                positive = _sigmoid(scores)
+                return np.column_stack((1 - positive, positive))
+        if self.probability == 'softmax':
+            exp_scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+            return exp_scores / exp_scores.sum(axis=1, keepdims=True)
+        probabilities = _sigmoid(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, X: NDArray) -> NDArray:
+        """Returns predicted class for each sample of X (of shape (n_samples, n_features))."""
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            return self.classes_[(scores > 0).astype(int)]
+        return self.classes_[np.argmax(scores, axis=1)]
+
+
+def _sigmoid(x: NDArray) -> NDArray:
+    """Logistic function."""
+    return 0.5 * (1 + np.tanh(0.5 * x))
+
+
+def load_model(file_path: Union[str, os.PathLike]):
+    """Loads classifier from file_path: model exported by export_model if it is .npz file,
+    otherwise classifier serialized by save_trained_model (which requires scikit-learn)."""
+    if os.fspath(file_path).lower().endswith('.npz'):
+        return NumpyPredictor.load(file_path)
+    with open(file_path, 'rb') as file:
+        return pickle.load(file)
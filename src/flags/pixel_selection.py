@@ -0,0 +1,86 @@
+import numpy as np
+from numpy.typing import NDArray
+from sklearn.feature_selection import mutual_info_classif
+from sklearn.linear_model import LogisticRegression
+from typing import Optional
+from .image_preprocessor import get_pixels_indices
+from .ml_operations import simple_cross_validation
+from .pixels_layout import get_all_pixels_positions
+
+SCORING_METHODS = ('mutual_information', 'l1')
+
+
+def get_pixels_columns(pixels_positions: tuple, width: int) -> NDArray:
+    """Returns indices of columns of a full raster dataset (with features of get_all_pixels_positions) with (R,G,B)
+    of pixels_positions, in the order of features created from pixels_positions by create_data_sample_from_array."""
+    rows, cols = get_pixels_indices(pixels_positions)
+    return (3 * (rows * width + cols)[:, np.newaxis] + np.arange(3)).reshape(-1)
+
+
+def score_pixels(X_full: NDArray, y: NDArray, width: int, height: int, method: str = 'mutual_information',
+                 max_samples: Optional[int] = 20000, random_state: int = 0) -> NDArray:
+    """Scores how informative each pixel of full raster dataset X_full (with labels y) is for recognizing flags.
+    method is 'mutual_information' (mutual information of each feature with the class, see mutual_info_classif)
+    or 'l1' (absolute weights of L1-regularized logistic regression). Scores of R, G, B of a pixel are summed.
+    At most max_samples randomly chosen samples are used.
+    Returns scores of shape (height, width)."""
+    if method not in SCORING_METHODS:
+        raise ValueError(f'Unknown scoring method {method}. Available methods: {", ".join(SCORING_METHODS)}.')
+    rng = np.random.default_rng(random_state)
+    if max_samples is not None and len(y) > max_samples:
+        rows = np.sort(rng.choice(len(y), max_samples, replace=False))
+        X_full, y = X_full[rows], y[rows]
+    X_full = np.asarray(X_full, dtype=np.float32)
+    if method == 'mutual_information':
+        feature_scores = mutual_info_classif(X_full, y, random_state=random_state)
+    else:
+        clf = LogisticRegression(penalty='l1', solver='saga', C=1, max_iter=200, random_state=random_state)
+        clf.fit(X_full, y)
+        feature_scores = np.abs(clf.coef_).sum(axis=0)
+    return feature_scores.reshape(height, width, 3).sum(axis=2)
+
+
+def rank_pixels(scores: NDArray, min_distance: int = 2) -> list[list[int]]:
+    """Returns positions [row, column] of pixels ordered from the best scored one. Pixels closer (in both
+    directions) than min_distance to a better scored pixel are placed after all the others, since neighbouring
+    pixels of a flag usually carry the same information."""
+    order = np.argsort(-scores, axis=None, kind='stable')
+    positions = [list(map(int, np.unravel_index(index, scores.shape))) for index in order]
+    chosen, postponed = [], []
+    for row, col in positions:
+        if any(abs(row - other_row) < min_distance and abs(col - other_col) < min_distance
+               for other_row, other_col in chosen):
+            postponed.append([row, col])
+        else:
+            chosen.append([row, col])
+    return chosen + postponed
+
+
+def select_pixels(X_full: NDArray, y: NDArray, width: int, height: int, target_accuracy: float = 0.99,
+                  scores: Optional[NDArray] = None, method: str = 'mutual_information',
+                  candidate_sizes: tuple[int, ...] = (2, 3, 4, 5, 6, 8, 10, 12, 16, 24, 32), min_distance: int = 2,
+                  clf: Optional[LogisticRegression] = None, n_splits: int = 3) -> tuple[tuple, list[dict]]:
+    """Chooses the smallest set of pixels (of candidate_sizes) whose features give cross-validated accuracy of clf
+    (by default LogisticRegression as in ml_training_best_model.py) at least target_accuracy.
+    Pixels are taken in the order of rank_pixels of scores (computed by score_pixels with method if not given).
+    X_full is full raster dataset (see get_all_pixels_positions) with labels y, it can be memory-mapped.
+    Returns positions of chosen pixels (the largest candidate set, if none reaches target_accuracy)
+    and accuracy (mean and std) of each checked size."""
+    if scores is None:
+        scores = score_pixels(X_full, y, width, height, method)
+    ranking = rank_pixels(scores, min_distance)
+    if clf is None:
+        clf = LogisticRegression(C=100, max_iter=500, random_state=0)
+
+    results = []
+    pixels_positions = ()
+    for n_pixels in candidate_sizes:
+        pixels_positions = tuple(ranking[:n_pixels])
+        X = np.asarray(X_full[:, get_pixels_columns(pixels_positions, width)])
+        accuracies = simple_cross_validation(X, y, clf, n_splits)
+        results.append({'n_pixels': n_pixels, 'accuracy': float(accuracies.mean()),
+                        'accuracy_std': float(accuracies.std())})
+        print(f'{n_pixels} pixels: accuracy {accuracies.mean():.4f} +- {accuracies.std():.4f}')
+        if accuracies.mean() >= target_accuracy:
+            break
+    return pixels_positions, results
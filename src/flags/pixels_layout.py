@@ -0,0 +1,45 @@
+import numpy as np
+import json
+import os
+from typing import Union, Optional
+from .image_preprocessor import get_pixels_indices, PixelsIndices
+
+LAYOUT_FORMAT_VERSION = 1
+
+
+def get_all_pixels_positions(width: int, height: int) -> tuple:
+    """Returns positions [row, column] of all the pixels of image of dimensions (width, height), row by row.
+    A dataset created with them (see DatasetCreator) contains the full raster, from which select_pixels chooses."""
+    return tuple([row, col] for row in range(height) for col in range(width))
+
+
+def save_pixels_layout(file_path: Union[str, os.PathLike], pixels_positions: tuple, width: int, height: int,
+                       results: Optional[list[dict]] = None) -> None:
+    """Saves layout of pixels used as features (with dimensions of images and optionally results of select_pixels)
+    as JSON, together with the precomputed indices of rows and columns of the pixels."""
+    rows, cols = get_pixels_indices(pixels_positions)
+    layout = {'format_version': LAYOUT_FORMAT_VERSION, 'width': width, 'height': height,
+              'pixels_positions': [[int(row), int(col)] for row, col in pixels_positions],
+              'pixels_rows': rows.tolist(), 'pixels_cols': cols.tolist(), 'results': results or []}
+    with open(file_path, 'w') as file:
+        json.dump(layout, file, indent=2)
+
+
+def load_pixels_layout(file_path: Union[str, os.PathLike]) -> dict:
+    """Loads layout saved by save_pixels_layout. Returns dict with width, height, pixels_positions
+    (tuple of [row, column]) and pixels_indices (PixelsIndices)."""
+    with open(file_path) as file:
+        layout = json.load(file)
+    if layout['format_version'] > LAYOUT_FORMAT_VERSION:
+        raise ValueError(f'Unsupported pixels layout format version {layout["format_version"]}.')
+    return {'width': layout['width'], 'height': layout['height'],
+            'pixels_positions': tuple(layout['pixels_positions']),
+            'pixels_indices': PixelsIndices(np.array(layout['pixels_rows'], dtype=np.intp),
+                                            np.array(layout['pixels_cols'], dtype=np.intp)),
+            'results': layout['results']}
+
+
+def get_model_layout_path(file_path_clf: Union[str, os.PathLike]) -> str:
+    """Returns path of the layout saved next to classifier serialized in file_path_clf (e.g. models/clf_layout.json
+    for models/clf.pkl), so that the pickled classifier is used with the pixels it was trained on."""
+    return os.path.splitext(os.fspath(file_path_clf))[0] + '_layout.json'
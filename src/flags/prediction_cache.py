@@ -0,0 +1,195 @@
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+from collections import OrderedDict
+import base64
+import hashlib
+import json
+import os
+import threading
+from typing import Union, Optional
+
+FORMAT_VERSION = 2
+
+
+class PredictionCache:
+    """Cache of recognition results put in front of the classifier.
+    Results are kept together with the preprocessed image (thumbnail of the size the classifier was trained on)
+    under the digest of its values, so the same flag uploaded again with different bytes is recognized without
+    calling the classifier. An image matches a cached one if Hamming distance between their perceptual hashes
+    (imagehash.phash, 64 bits) is at most tolerance and mean absolute difference of their thumbnails (from 0 to 255)
+    is at most max_difference (the closest one is taken). The perceptual hash is computed from the grayscale image,
+    so many flags (e.g. France, Ireland and Chad) share it; it only narrows down the candidates, while the thumbnails,
+    which keep colors, decide, so the same flag of a different size matches, but a flag of a different color does not.
+    Additionally, the exact digests of raw bytes of images are mapped to their thumbnails, so an image uploaded
+    again with identical bytes is recognized without even reading (or rasterizing) it.
+    At most max_size results (and max_size digests) are kept, the least recently used ones are evicted.
+    If path is given, the cache is loaded from this file (if it exists) and save writes it there, so the entries
+    survive restarts. The cache has to be cleared (or its file removed) when the classifier changes.
+    The cache can be used from many threads."""
+    def __init__(self, max_size: int = 1024, tolerance: int = 0, max_difference: float = 2.0,
+                 path: Optional[Union[str, os.PathLike]] = None) -> None:
+        self._max_size = max_size
+        self._tolerance = tolerance
+        self._max_difference = max_difference
+        self._path = path
+        self._results = OrderedDict()
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @property
+    def path(self) -> Optional[Union[str, os.PathLike]]:
+        """File the cache is saved to (None if it is not persistent)."""
+        return self._path
+
+    @property
+    def hits(self) -> int:
+        """Number of lookups that found a result (by the exact digest or by a similar thumbnail)."""
+        return self.exact_hits + self.similar_hits
+
+    @property
+    def stats(self) -> dict:
+        """Counters of hits and misses and the number of cached results."""
+        return {'size': len(self), 'hits': self.hits, 'exact_hits': self.exact_hits,
+                'similar_hits': self.similar_hits, 'misses': self.misses}
+
+    @staticmethod
+    def make_digest(img_data: bytes) -> str:
+        """Returns digest of raw bytes of image."""
+        return hashlib.sha256(img_data).hexdigest()
+
+    @staticmethod
+    def perceptual_hash(img: NDArray) -> int:
+        """Returns perceptual hash of preprocessed image img (np.array of shape (height, width, 3)) as int."""
+        import imagehash
+        return int(str(imagehash.phash(Image.fromarray(img))), 16)
+
+    @staticmethod
+    def make_key(img: NDArray) -> str:
+        """Returns digest of values of preprocessed image img (np.array of shape (height, width, 3))."""
+        return hashlib.sha256(np.ascontiguousarray(img, dtype=np.uint8).tobytes()).hexdigest()
+
+    @classmethod
+    def fingerprint(cls, img: NDArray) -> tuple[str, int]:
+        """Returns key (see make_key) and perceptual hash of preprocessed image img. They can be computed once
+        and given to get_similar and put for the same image."""
+        return cls.make_key(img), cls.perceptual_hash(img)
+
+    def get_exact(self, digest: str) -> Optional[dict]:
+        """Returns result cached for image with raw bytes of digest or None. Only hits are counted,
+        since a miss is followed by get_similar."""
+        with self._lock:
+            key = self._digests.get(digest)
+            if key is None or key not in self._results:
+                return None
+            self._digests.move_to_end(digest)
+            self._results.move_to_end(key)
+            self.exact_hits += 1
+            return dict(self._results[key][2])
+
+    def get_similar(self, img: NDArray, fingerprint: Optional[tuple[str, int]] = None) -> Optional[dict]:
+        """Returns result cached for the preprocessed image closest to img (see PredictionCache) or None.
+        fingerprint of img (see fingerprint) is computed if it is not given."""
+        img_key, img_hash = fingerprint if fingerprint is not None else self.fingerprint(img)
+        with self._lock:
+            key = self._find(img, img_key, img_hash)
+            if key is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.similar_hits += 1
+            return dict(self._results[key][2])
+
+    def put(self, img: NDArray, result: Optional[dict] = None, digest: Optional[str] = None,
+            fingerprint: Optional[tuple[str, int]] = None) -> None:
+        """Caches result for preprocessed image img and maps digest of its raw bytes (if given) to it.
+        Without result, only digest is mapped to the result already cached for img (or the closest image).
+        fingerprint of img (see fingerprint) is computed if it is not given."""
+        img_key, img_hash = fingerprint if fingerprint is not None else self.fingerprint(img)
+        thumbnail = np.array(img, dtype=np.uint8)
+        with self._lock:
+            if result is not None:
+                key = img_key
+                self._results[key] = (img_hash, thumbnail, dict(result))
+                self._results.move_to_end(key)
+                _trim(self._results, self._max_size)
+            else:
+                key = self._find(img, img_key, img_hash)
+                if key is None:
+                    return
+            if digest is not None:
+                self._digests[digest] = key
+                self._digests.move_to_end(digest)
+                _trim(self._digests, self._max_size)
+
+    def clear(self) -> None:
+        """Removes all the entries and resets counters."""
+        with self._lock:
+            self._results.clear()
+            self._digests.clear()
+            self.exact_hits = self.similar_hits = self.misses = 0
+
+    def save(self, path: Optional[Union[str, os.PathLike]] = None) -> None:
+        """Saves entries (in the order of their use) to file path (by default the one given to constructor)."""
+        path = self._path if path is None else path
+        with self._lock:
+            content = {'format_version': FORMAT_VERSION,
+                       'results': [[key, f'{img_hash:016x}', list(img.shape), base64.b64encode(img.tobytes()).decode(),
+                                    result] for key, (img_hash, img, result) in self._results.items()],
+                       'digests': [[digest, key] for digest, key in self._digests.items()]}
+        tmp_path = f'{os.fspath(path)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(content, file)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Union[str, os.PathLike]) -> None:
+        """Loads entries saved by save, keeping at most max_size most recently used ones.
+        Entries of older formats (without thumbnails, which cannot be verified) are left out."""
+        with open(path) as file:
+            content = json.load(file)
+        if content['format_version'] > FORMAT_VERSION:
+            raise ValueError(f'Unsupported prediction cache format version {content["format_version"]}.')
+        if content['format_version'] < FORMAT_VERSION:
+            return
+        with self._lock:
+            for key, img_hash, shape, img_data, result in content['results']:
+                img = np.frombuffer(base64.b64decode(img_data), dtype=np.uint8).reshape(shape)
+                self._results[key] = (int(img_hash, 16), img, result)
+            for digest, key in content['digests']:
+                self._digests[digest] = key
+            _trim(self._results, self._max_size)
+            _trim(self._digests, self._max_size)
+
+    def _find(self, img: NDArray, img_key: str, img_hash: int) -> Optional[str]:
+        """Returns key of cached image closest to img (with key img_key and perceptual hash img_hash) if it matches it
+        (see PredictionCache), otherwise None."""
+        if img_key in self._results:
+            return img_key
+        if not self._results:
+            return None
+        keys = list(self._results.keys())
+        cached_hashes = np.fromiter((self._results[key][0] for key in keys), dtype=np.uint64, count=len(keys))
+        distances = np.unpackbits((cached_hashes ^ np.uint64(img_hash)).view(np.uint8)).reshape(-1, 64).sum(axis=1)
+        candidates = np.flatnonzero(distances <= self._tolerance)
+        if not len(candidates):
+            return None
+        img = img.astype(np.float32)
+        thumbnails = [self._results[keys[index]][1] for index in candidates]
+        differences = [np.abs(thumbnail - img).mean() if thumbnail.shape == img.shape else np.inf
+                       for thumbnail in thumbnails]
+        closest = int(np.argmin(differences))
+        return keys[candidates[closest]] if differences[closest] <= self._max_difference else None
+
+
+def _trim(entries: OrderedDict, max_size: int) -> None:
+    """Removes the least recently used entries so that at most max_size remain."""
+    while len(entries) > max_size:
+        entries.popitem(last=False)
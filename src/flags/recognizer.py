@@ -0,0 +1,157 @@
+import numpy as np
+from numpy.typing import NDArray
+import os
+from typing import Union, Optional, Callable
+from .image_preprocessor import (ImageSource, preprocess_image_to_array, create_data_sample_from_array,
+                                 get_pixels_positions, get_pixels_indices, PixelsIndices)
+from .utils import load_countries_names
+from .model_export import load_model
+from .pixels_layout import load_pixels_layout, get_model_layout_path
+from .prediction_cache import PredictionCache
+from .metrics import get_metrics
+
+
+class Recognizer:
+    """Recognizes flags using trained classifier clf, which is loaded once and reused for many images.
+    countries_names are names of the countries in the order of class labels,
+    width and height are dimensions of images the classifier was trained on.
+    pixels_positions are positions of pixels used as features (by default given by get_pixels_positions).
+    If clf was exported by export_model, dimensions of images and pixels positions saved with it are used instead.
+    If clf knows the number of its features (n_features_in_) and it does not match the pixels, ValueError is raised.
+    If cache is given, recognize looks results up in it before classifying images."""
+    def __init__(self, clf, countries_names: list[str], width: int = 32, height: int = 20,
+                 cache: Optional[PredictionCache] = None, pixels_positions: Optional[tuple] = None) -> None:
+        self._clf = clf
+        self._cache = cache
+        self._countries_names = countries_names
+        self._width = getattr(clf, 'width', width)
+        self._height = getattr(clf, 'height', height)
+        pixels_indices = getattr(clf, 'pixels_indices', None)
+        if pixels_indices is not None:
+            self._pixels_indices = PixelsIndices(*pixels_indices)
+        else:
+            if pixels_positions is None:
+                pixels_positions, _, _ = get_pixels_positions(width=self._width, height=self._height)
+            self._pixels_indices = get_pixels_indices(pixels_positions)
+        n_features = getattr(clf, 'n_features_in_', None)
+        if n_features is not None and n_features != 3 * len(self._pixels_indices[0]):
+            raise ValueError(f'Classifier expects {n_features} features, but {len(self._pixels_indices[0])} pixels '
+                             f'give {3 * len(self._pixels_indices[0])}. Save the layout of pixels it was trained on '
+                             f'next to it (see get_model_layout_path).')
+
+    @classmethod
+    def from_files(cls, file_path_clf: Union[str, os.PathLike], file_path_countries_list: Union[str, os.PathLike],
+                   width: int = 32, height: int = 20, cache: Optional[PredictionCache] = None) -> 'Recognizer':
+        """Creates Recognizer with classifier exported by export_model (.npz) or serialized by save_trained_model,
+        and list of countries names saved by DatasetCreator. If a layout of pixels is saved next to the serialized
+        classifier (see get_model_layout_path), its dimensions and pixels are used."""
+        pixels_positions = None
+        layout_path = get_model_layout_path(file_path_clf)
+        if os.path.exists(layout_path):
+            layout = load_pixels_layout(layout_path)
+            width, height, pixels_positions = layout['width'], layout['height'], layout['pixels_positions']
+        return cls(load_model(file_path_clf), load_countries_names(file_path_countries_list), width, height, cache,
+                   pixels_positions)
+
+    @property
+    def countries_names(self) -> list[str]:
+        """Names of the countries in the order of class labels."""
+        return self._countries_names
+
+    @property
+    def classes(self) -> NDArray:
+        """Class labels in the order of probabilities returned by predict_proba."""
+        return self._clf.classes_
+
+    @property
+    def width(self) -> int:
+        """Width of images the classifier was trained on."""
+        return self._width
+
+    @property
+    def height(self) -> int:
+        """Height of images the classifier was trained on."""
+        return self._height
+
+    @property
+    def cache(self) -> Optional[PredictionCache]:
+        """Cache of results used by recognize (None if there is no cache)."""
+        return self._cache
+
+    @property
+    def pixels_indices(self) -> PixelsIndices:
+        """Indices of pixels used as features (see get_pixels_indices)."""
+        return self._pixels_indices
+
+    def create_data_sample(self, source: ImageSource) -> NDArray:
+        """Preprocesses image (given as file path, raw bytes or PIL image) in memory and creates data sample
+        of shape (n_features, ) from it. Errors of reading the image are raised."""
+        with get_metrics().timer('recognizer.create_data_sample.seconds'):
+            img = preprocess_image_to_array(source, self._width, self._height)
+            return create_data_sample_from_array(img, self._pixels_indices)
+
+    def predict_proba(self, img_samples: NDArray) -> NDArray:
+        """Returns probabilities of each class (in the order of class labels of the classifier) for each row of
+        img_samples of shape (n_samples, n_features)."""
+        metrics = get_metrics()
+        metrics.observe('recognizer.batch_size', len(img_samples))
+        with metrics.timer('recognizer.predict.seconds'):
+            return self._clf.predict_proba(img_samples)
+
+    def predict(self, img_samples: NDArray) -> list[dict]:
+        """Recognizes flags from data samples img_samples of shape (n_samples, n_features) with a single call of
+        the classifier. Returns for each sample dict with class label, country name and probability."""
+        probabilities = self.predict_proba(img_samples)
+        best = np.argmax(probabilities, axis=1)
+        labels = self._clf.classes_[best]
+        return [self._make_result(label, probability)
+                for label, probability in zip(labels, probabilities[np.arange(len(best)), best])]
+
+    def predict_top_k(self, img_samples: NDArray, k: int) -> list[list[dict]]:
+        """Recognizes flags from data samples img_samples of shape (n_samples, n_features) with a single call of
+        the classifier. Returns for each sample list of k most probable results (as returned by predict),
+        starting from the most probable one."""
+        probabilities = self.predict_proba(img_samples)
+        k = min(k, probabilities.shape[1])
+        best = np.argsort(-probabilities, axis=1, kind='stable')[:, :k]
+        best_probabilities = np.take_along_axis(probabilities, best, axis=1)
+        return [[self._make_result(label, probability) for label, probability in zip(labels, sample_probabilities)]
+                for labels, sample_probabilities in zip(self._clf.classes_[best], best_probabilities)]
+
+    def recognize(self, source: ImageSource) -> dict:
+        """Recognizes flag in a single image. Returns dict with class label, country name and probability."""
+        return self.recognize_with(source, lambda img_sample: self.predict(img_sample.reshape(1, -1))[0])
+
+    def recognize_with(self, source: ImageSource, predict_sample: Callable[[NDArray], dict]) -> dict:
+        """Recognizes flag in a single image, classifying its data sample with predict_sample (e.g. in a batch
+        with other samples). If there is cache, the result is looked up first by digest of raw bytes of the image
+        (then the image is not even read) and then by the preprocessed image (then the classifier is not called,
+        see PredictionCache). New results are put into the cache."""
+        if self._cache is None:
+            return predict_sample(self.create_data_sample(source))
+
+        digest = None
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                source = file.read()
+        if isinstance(source, bytes):
+            digest = self._cache.make_digest(source)
+            result = self._cache.get_exact(digest)
+            if result is not None:
+                return result
+
+        img = preprocess_image_to_array(source, self._width, self._height)
+        fingerprint = self._cache.fingerprint(img)
+        result = self._cache.get_similar(img, fingerprint)
+        if result is not None:
+            self._cache.put(img, digest=digest, fingerprint=fingerprint)
+            return result
+        result = predict_sample(create_data_sample_from_array(img, self._pixels_indices))
+        self._cache.put(img, result, digest, fingerprint)
+        return result
+
+    def _make_result(self, label: int, probability: float) -> dict:
+        """Creates result of recognition of one image."""
+        label = int(label)
+        country = self._countries_names[label] if label < len(self._countries_names) else str(label)
+        return {'label': label, 'country': country, 'probability': float(probability)}
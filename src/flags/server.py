@@ -0,0 +1,166 @@
+import numpy as np
+from numpy.typing import NDArray
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import Future
+import json
+import queue
+import threading
+import time
+from typing import Callable
+from .recognizer import Recognizer
+
+
+class MicroBatcher:
+    """Groups data samples submitted concurrently from many threads into batches processed by a single call
+    of predict_batch (which takes np.array of shape (n_samples, n_features) and returns list of results).
+    A batch is processed when it has max_batch_size samples or max_wait seconds passed since its first sample
+    was submitted."""
+    def __init__(self, predict_batch: Callable[[NDArray], list], max_batch_size: int = 64,
+                 max_wait: float = 0.005) -> None:
+        self._predict_batch = predict_batch
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, img_sample: NDArray) -> Future:
+        """Submits data sample of shape (n_features, ) and returns Future of its result."""
+        future = Future()
+        self._queue.put((img_sample, future))
+        return future
+
+    def close(self) -> None:
+        """Stops processing after the already submitted samples."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """Collects batches and processes them until close is called."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self._max_wait
+            closing = False
+            while len(batch) < self._max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if closing:
+                return
+
+    def _process(self, batch: list) -> None:
+        """Processes one batch and sets results (or the error) of its futures."""
+        batch = [(img_sample, future) for img_sample, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        futures = [future for _, future in batch]
+        try:
+            results = self._predict_batch(np.stack([img_sample for img_sample, _ in batch]))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+
+class RecognitionServer:
+    """HTTP server recognizing flags with recognizer that is loaded once.
+    POST /recognize with raw bytes of image (PNG, SVG, ...) as the body responds with JSON with class label,
+    country name and probability. Images are preprocessed in request threads and concurrent requests are
+    classified together by MicroBatcher.
+    Requests without valid Content-Length are answered with status 400 and requests with body longer than
+    max_body_size bytes with status 413 (their bodies are not read).
+    GET /health responds with {"status": "ok"} and, if recognizer has cache, GET /stats responds with its counters.
+    The cache is saved at shutdown if it is persistent."""
+    def __init__(self, recognizer: Recognizer, host: str = '127.0.0.1', port: int = 8000,
+                 max_batch_size: int = 64, max_wait: float = 0.005, max_body_size: int = 10 * 2 ** 20) -> None:
+        self._recognizer = recognizer
+        self._max_body_size = max_body_size
+        self._batcher = MicroBatcher(recognizer.predict, max_batch_size=max_batch_size, max_wait=max_wait)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Url of the server ending with '/'."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def serve_forever(self) -> None:
+        """Handles requests until shutdown is called."""
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stops the server."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._batcher.close()
+        if self._recognizer.cache is not None and self._recognizer.cache.path is not None:
+            self._recognizer.cache.save()
+
+    def _recognize(self, img_data: bytes) -> dict:
+        """Recognizes flag in image img_data."""
+        return self._recognizer.recognize_with(img_data,
+                                               lambda img_sample: self._batcher.submit(img_sample).result())
+
+    def _make_handler(self) -> type:
+        recognition_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path == '/health':
+                    self._send_json(200, {'status': 'ok'})
+                elif self.path == '/stats' and recognition_server._recognizer.cache is not None:
+                    self._send_json(200, {'cache': recognition_server._recognizer.cache.stats})
+                else:
+                    self._send_json(404, {'error': f'Unknown path {self.path}'})
+
+            def do_POST(self) -> None:
+                if self.path != '/recognize':
+                    self._send_json(404, {'error': f'Unknown path {self.path}'})
+                    return
+                try:
+                    length = int(self.headers['Content-Length'])
+                except (TypeError, ValueError):
+                    length = -1
+                if length < 0:
+                    self.close_connection = True
+                    self._send_json(400, {'error': 'Missing or invalid Content-Length'})
+                    return
+                if length > recognition_server._max_body_size:
+                    self.close_connection = True
+                    self._send_json(413, {'error': f'Body is longer than {recognition_server._max_body_size} bytes'})
+                    return
+                img_data = self.rfile.read(length)
+                try:
+                    result = recognition_server._recognize(img_data)
+                except Exception as e:
+                    self._send_json(400, {'error': f'Impossible to recognize flag because of error. Error: {e}'})
+                    return
+                self._send_json(200, result)
+
+            def _send_json(self, status: int, content: dict) -> None:
+                body = json.dumps(content).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
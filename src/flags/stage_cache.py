@@ -0,0 +1,114 @@
+import numpy as np
+from numpy.typing import NDArray
+import hashlib
+import json
+import os
+import time
+from typing import Union, Optional
+
+CACHE_VERSION = 1
+
+
+class StageCache:
+    """Content-addressed cache of outputs of stages of dataset creation.
+    Each entry is a file <path>/<stage>/<key><extension>, where key is made by make_key from everything the output
+    depends on (input data and parameters), so an entry never has to be invalidated: when inputs change, their key
+    changes too. Entries that are no longer used can be removed by evict.
+    Modification time of an entry is the time it was written and access time is the time it was last used."""
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self._path = path
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Creates key from parts, which can be bytes, np.arrays or JSON-serializable values."""
+        digest = hashlib.sha256(str(CACHE_VERSION).encode())
+        for part in parts:
+            if isinstance(part, (bytes, bytearray, memoryview)):
+                data = bytes(part)
+            elif isinstance(part, np.ndarray):
+                data = repr((part.dtype.str, part.shape)).encode() + np.ascontiguousarray(part).tobytes()
+            else:
+                data = json.dumps(part, sort_keys=True, default=str).encode()
+            digest.update(len(data).to_bytes(8, 'little'))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get_bytes(self, stage: str, key: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        """Returns bytes saved for key in stage or None if there is no such entry or it was written more than
+        max_age seconds ago."""
+        file_path = self._get_fresh_entry(stage, key, '.bin', max_age)
+        if file_path is None:
+            return None
+        with open(file_path, 'rb') as file:
+            return file.read()
+
+    def put_bytes(self, stage: str, key: str, data: bytes) -> None:
+        """Saves bytes data for key in stage."""
+        self._write(stage, key, '.bin', lambda file: file.write(data))
+
+    def get_array(self, stage: str, key: str, max_age: Optional[float] = None) -> Optional[NDArray]:
+        """Returns np.array saved for key in stage or None if there is no such entry or it was written more than
+        max_age seconds ago."""
+        file_path = self._get_fresh_entry(stage, key, '.npy', max_age)
+        if file_path is None:
+            return None
+        return np.load(file_path)
+
+    def put_array(self, stage: str, key: str, array: NDArray) -> None:
+        """Saves np.array array for key in stage."""
+        self._write(stage, key, '.npy', lambda file: np.save(file, array))
+
+    def evict(self, unused_since: Optional[float] = None, max_bytes: Optional[int] = None) -> int:
+        """Removes stale entries: the ones not used since unused_since (a timestamp as returned by time.time())
+        and then the least recently used ones until all the entries take at most max_bytes.
+        Returns the number of removed entries."""
+        entries = []
+        for stage in self._list_stages():
+            stage_path = os.path.join(self._path, stage)
+            for file_name in os.listdir(stage_path):
+                file_path = os.path.join(stage_path, file_name)
+                stat = os.stat(file_path)
+                entries.append((stat.st_atime, stat.st_size, file_path))
+        entries.sort()
+
+        removed = 0
+        total_bytes = sum(size for _, size, _ in entries)
+        for last_used, size, file_path in entries:
+            too_old = unused_since is not None and last_used < unused_since
+            too_big = max_bytes is not None and total_bytes > max_bytes
+            if not too_old and not too_big:
+                continue
+            os.remove(file_path)
+            total_bytes -= size
+            removed += 1
+        return removed
+
+    def _list_stages(self) -> list[str]:
+        """Returns names of stages that have any entries."""
+        if not os.path.isdir(self._path):
+            return []
+        return [name for name in os.listdir(self._path) if os.path.isdir(os.path.join(self._path, name))]
+
+    def _get_fresh_entry(self, stage: str, key: str, extension: str, max_age: Optional[float]) -> Optional[str]:
+        """Returns path of the entry if it exists and is fresh enough, marking it as used."""
+        file_path = os.path.join(self._path, stage, key + extension)
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        if max_age is not None and now - stat.st_mtime > max_age:
+            return None
+        os.utime(file_path, (now, stat.st_mtime))
+        return file_path
+
+    def _write(self, stage: str, key: str, extension: str, write) -> None:
+        """Writes the entry to a temporary file which is then renamed, so that concurrent readers (e.g. other
+        processes building dataset) never see a partially written entry."""
+        stage_path = os.path.join(self._path, stage)
+        os.makedirs(stage_path, exist_ok=True)
+        file_path = os.path.join(stage_path, key + extension)
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            write(file)
+        os.replace(tmp_path, file_path)
@@ -0,0 +1,79 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Union, Optional
+
+HEAVY_MODULES = ('cairosvg', 'cairocffi', 'matplotlib', 'sklearn', 'scipy', 'requests', 'bs4')
+
+_STARTUP_CODE = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src_path!r})
+from flags.recognizer import Recognizer
+imported = time.perf_counter()
+recognizer = Recognizer.from_files({model_path!r}, {countries_path!r})
+loaded = time.perf_counter()
+result = recognizer.recognize({image_path!r})
+predicted = time.perf_counter()
+print(json.dumps({{'import_ms': 1000 * (imported - start), 'load_ms': 1000 * (loaded - imported),
+                  'first_prediction_ms': 1000 * (predicted - loaded),
+                  'label': result['label'],
+                  'heavy_modules': sorted(name for name in {heavy_modules!r} if name in sys.modules)}}))
+'''
+
+
+def measure_startup(model_path: Union[str, os.PathLike], countries_path: Union[str, os.PathLike],
+                    image_path: Union[str, os.PathLike], repeats: int = 3) -> dict:
+    """Measures startup of the inference path in repeats fresh Python processes: time of importing it, loading
+    the model and making the first prediction for image_path, and total time until the first prediction
+    (including interpreter startup). Reports medians (in ms), heavy modules that were imported and the slowest
+    imports reported by python -X importtime."""
+    src_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = _STARTUP_CODE.format(src_path=src_path, model_path=os.path.abspath(model_path),
+                                countries_path=os.path.abspath(countries_path),
+                                image_path=os.path.abspath(image_path), heavy_modules=HEAVY_MODULES)
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                                 check=True)
+        run = json.loads(process.stdout.strip().splitlines()[-1])
+        run['total_ms'] = 1000 * (time.perf_counter() - start)
+        run['slowest_imports'] = _parse_importtime(process.stderr)
+        runs.append(run)
+
+    report = {key: statistics.median(run[key] for run in runs)
+              for key in ('import_ms', 'load_ms', 'first_prediction_ms', 'total_ms')}
+    report['heavy_modules'] = sorted(set(name for run in runs for name in run['heavy_modules']))
+    report['slowest_imports'] = runs[-1]['slowest_imports']
+    return report
+
+
+def _parse_importtime(stderr: str, n: int = 10) -> list[tuple[str, float]]:
+    """Returns n top-level imports with the largest cumulative time (in ms) from output of python -X importtime."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            imports.append((name.strip(), int(cumulative_us) / 1000))
+    return sorted(imports, key=lambda item: -item[1])[:n]
+
+
+def check_startup(report: dict, total_budget_ms: Optional[float] = None,
+                  first_prediction_budget_ms: Optional[float] = None) -> list[str]:
+    """Checks report of measure_startup against the budgets. Returns list of problems (empty if there are none):
+    budgets exceeded and heavy modules imported."""
+    problems = []
+    if total_budget_ms is not None and report['total_ms'] > total_budget_ms:
+        problems.append(f'Time to first prediction {report["total_ms"]:.0f} ms exceeds budget {total_budget_ms} ms.')
+    if first_prediction_budget_ms is not None and report['first_prediction_ms'] > first_prediction_budget_ms:
+        problems.append(f'First prediction took {report["first_prediction_ms"]:.0f} ms, '
+                        f'budget is {first_prediction_budget_ms} ms.')
+    if report['heavy_modules']:
+        problems.append(f'Heavy modules imported: {", ".join(report["heavy_modules"])}.')
+    return problems
@@ -0,0 +1,125 @@
+import numpy as np
+from numpy.typing import NDArray
+import os
+from typing import Union, Optional
+from .image_preprocessor import ImageSource, preprocess_image_to_array, scale_to_unit_interval
+from .utils import load_countries_names
+
+METRICS = ('mse', 'cosine')
+
+
+class TemplateMatcher:
+    """Recognizes flags without training by comparing images with a template image of each country
+    and choosing the most similar one (the idea of flagpy). Unlike the classifier, all the pixels are used.
+    templates is np.array of shape (n_templates, height, width, 3) with preprocessed images (uint8 or scaled
+    to [0, 1]), labels are their class labels and countries_names are names of the countries in the order of labels.
+    metric is 'mse' (mean square difference of pixels values) or 'cosine' (cosine distance between images as
+    vectors). The templates are kept as a single matrix of shape (n_templates, height * width * 3), so a batch
+    of images is compared with all of them by one matrix multiplication."""
+    def __init__(self, templates: NDArray, labels: NDArray, countries_names: list[str], metric: str = 'mse') -> None:
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric}. Available metrics: {", ".join(METRICS)}.')
+        self._height, self._width = templates.shape[1:3]
+        self._labels = np.asarray(labels)
+        self._countries_names = countries_names
+        self._metric = metric
+        self._templates = self._as_matrix(templates)
+        self._templates_squared_norms = np.einsum('ij,ij->i', self._templates, self._templates)
+        self._normalized_templates = self._templates / np.maximum(np.sqrt(self._templates_squared_norms),
+                                                                  np.finfo(np.float32).tiny)[:, None]
+
+    @classmethod
+    def from_directory(cls, path_data: Union[str, os.PathLike], countries_names: list[str], width: int = 32,
+                       height: int = 20, metric: str = 'mse') -> 'TemplateMatcher':
+        """Creates TemplateMatcher with templates <country_number>_0.png (preprocessed images created by
+        DatasetCreator) from path_data. Countries without the image are skipped."""
+        labels = [country_number for country_number in range(len(countries_names))
+                  if os.path.exists(os.path.join(path_data, f'{country_number}_0.png'))]
+        templates = np.empty((len(labels), height, width, 3), dtype=np.uint8)
+        for i, country_number in enumerate(labels):
+            templates[i] = preprocess_image_to_array(os.path.join(path_data, f'{country_number}_0.png'), width, height)
+        return cls(templates, np.array(labels), countries_names, metric)
+
+    @classmethod
+    def from_files(cls, path_data: Union[str, os.PathLike], file_path_countries_list: Union[str, os.PathLike],
+                   width: int = 32, height: int = 20, metric: str = 'mse') -> 'TemplateMatcher':
+        """Creates TemplateMatcher with templates from path_data and list of countries names saved by
+        DatasetCreator."""
+        return cls.from_directory(path_data, load_countries_names(file_path_countries_list), width, height, metric)
+
+    @property
+    def width(self) -> int:
+        """Width of the templates."""
+        return self._width
+
+    @property
+    def height(self) -> int:
+        """Height of the templates."""
+        return self._height
+
+    @property
+    def metric(self) -> str:
+        """Metric used to compare images with the templates."""
+        return self._metric
+
+    @property
+    def countries_names(self) -> list[str]:
+        """Names of the countries in the order of class labels."""
+        return self._countries_names
+
+    def create_data_sample(self, source: ImageSource) -> NDArray:
+        """Preprocesses image (given as file path, raw bytes or PIL image) in memory and creates data sample
+        of shape (height * width * 3, ) from all its pixels. Errors of reading the image are raised."""
+        img = preprocess_image_to_array(source, self._width, self._height)
+        return scale_to_unit_interval(img).reshape(-1)
+
+    def distances(self, img_samples: NDArray) -> NDArray:
+        """Returns distances of shape (n_samples, n_templates) between each row of img_samples
+        (of shape (n_samples, height * width * 3), e.g. made by create_data_sample) and each template.
+        Mean square difference is computed as (|x|^2 - 2 x.t + |t|^2) / n_features, so that the only
+        operation on all the pixels is the product of img_samples with the templates matrix."""
+        img_samples = np.asarray(img_samples, dtype=np.float32)
+        if self._metric == 'cosine':
+            norms = np.maximum(np.linalg.norm(img_samples, axis=1), np.finfo(np.float32).tiny)
+            return 1 - (img_samples @ self._normalized_templates.T) / norms[:, None]
+        squared_norms = np.einsum('ij,ij->i', img_samples, img_samples)
+        distances = img_samples @ self._templates.T
+        distances *= -2
+        distances += squared_norms[:, None]
+        distances += self._templates_squared_norms
+        np.maximum(distances, 0, out=distances)
+        return distances / img_samples.shape[1]
+
+    def predict(self, img_samples: NDArray) -> list[dict]:
+        """Recognizes flags from data samples img_samples of shape (n_samples, height * width * 3).
+        Returns for each sample dict with class label, country name and distance to the closest template."""
+        return [results[0] for results in self.predict_top_k(img_samples, 1)]
+
+    def predict_top_k(self, img_samples: NDArray, k: int) -> list[list[dict]]:
+        """Recognizes flags from data samples img_samples of shape (n_samples, height * width * 3).
+        Returns for each sample list of k closest templates (as returned by predict), starting from the closest."""
+        distances = self.distances(img_samples)
+        k = min(k, distances.shape[1])
+        closest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        closest_distances = np.take_along_axis(distances, closest, axis=1)
+        order = np.argsort(closest_distances, axis=1, kind='stable')
+        closest = np.take_along_axis(closest, order, axis=1)
+        closest_distances = np.take_along_axis(closest_distances, order, axis=1)
+        return [[self._make_result(label, distance) for label, distance in zip(labels, sample_distances)]
+                for labels, sample_distances in zip(self._labels[closest], closest_distances)]
+
+    def recognize(self, source: ImageSource, k: Optional[int] = None) -> Union[dict, list[dict]]:
+        """Recognizes flag in a single image. Returns dict with class label, country name and distance,
+        or list of k such dicts if k is given."""
+        results = self.predict_top_k(self.create_data_sample(source).reshape(1, -1), k or 1)[0]
+        return results if k is not None else results[0]
+
+    def _as_matrix(self, templates: NDArray) -> NDArray:
+        """Returns templates as float32 matrix of shape (n_templates, height * width * 3) with values in [0, 1]."""
+        return np.ascontiguousarray(scale_to_unit_interval(templates), dtype=np.float32).reshape(len(templates), -1)
+
+    def _make_result(self, label: int, distance: float) -> dict:
+        """Creates result of recognition of one image."""
+        label = int(label)
+        country = self._countries_names[label] if label < len(self._countries_names) else str(label)
+        return {'label': label, 'country': country, 'distance': float(distance)}
@@ -0,0 +1,116 @@
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+import os
+from typing import Union, Iterable, Iterator, Optional
+from .image_preprocessor import scale_to_unit_interval
+from .metrics import get_metrics
+from .recognizer import Recognizer
+
+FrameSource = Union[str, os.PathLike, Iterable[NDArray]]
+
+
+def iter_frames(source: FrameSource) -> Iterator[NDArray]:
+    """Yields frames (np.arrays of shape (height, width, channels) and dtype uint8) of video file source read
+    by imageio one by one (e.g. GIF, or MP4 with imageio's pyav or ffmpeg plugin installed), or of iterable
+    of frames as they are (e.g. from a camera). imageio is imported only when a file is read."""
+    if isinstance(source, (str, os.PathLike)):
+        import imageio.v3 as iio
+        yield from iio.imiter(source)
+    else:
+        yield from source
+
+
+def make_thumbnail(frame: NDArray, size: tuple[int, int] = (16, 10)) -> NDArray:
+    """Returns thumbnail of frame of size (width, height) as np.array of float32 from [0, 1] and shape
+    (height, width, 3). The frame is first subsampled by strides to at most 4 times the size, so the cost does not
+    grow with the resolution of the video."""
+    frame = np.asarray(frame)
+    if frame.ndim == 2:
+        frame = frame[:, :, np.newaxis]
+    frame = frame[:, :, :3] if frame.shape[2] >= 3 else np.repeat(frame[:, :, :1], 3, axis=2)
+    step_y = max(1, frame.shape[0] // (4 * size[1]))
+    step_x = max(1, frame.shape[1] // (4 * size[0]))
+    small = np.ascontiguousarray(frame[::step_y, ::step_x])
+    return scale_to_unit_interval(np.asarray(Image.fromarray(small).resize(size, Image.BOX)))
+
+
+class StreamRecognizer:
+    """Recognizes flags in consecutive frames of a video or a camera stream with recognizer.
+    A frame is classified only if mean absolute difference of its thumbnail (see make_thumbnail of thumbnail_size)
+    and the thumbnail of the last classified frame exceeds change_threshold (fraction of the full range of colors),
+    other frames keep the previous prediction.
+    Probabilities of classified frames are smoothed by exponential moving average with weight smoothing of the newest
+    frame (1 disables smoothing), so that single misclassified frames do not change the label."""
+    def __init__(self, recognizer: Recognizer, change_threshold: float = 0.02,
+                 thumbnail_size: tuple[int, int] = (16, 10), smoothing: float = 0.5) -> None:
+        if not 0 < smoothing <= 1:
+            raise ValueError(f'smoothing has to be from (0, 1], got {smoothing}.')
+        self._recognizer = recognizer
+        self._change_threshold = change_threshold
+        self._thumbnail_size = thumbnail_size
+        self._smoothing = smoothing
+        self.reset()
+
+    @property
+    def frames(self) -> int:
+        """Number of frames processed since the last reset."""
+        return self._frames
+
+    @property
+    def classified_frames(self) -> int:
+        """Number of frames classified since the last reset (the other frames were skipped as unchanged)."""
+        return self._classified_frames
+
+    def reset(self) -> None:
+        """Forgets previous frames, e.g. before a new video."""
+        self._frames = 0
+        self._classified_frames = 0
+        self._last_thumbnail = None
+        self._probabilities = None
+
+    def update(self, frame: NDArray) -> dict:
+        """Processes the next frame. Returns dict with index of the frame, whether it was classified, and class label,
+        country name and (smoothed) probability of the current prediction."""
+        metrics = get_metrics()
+        thumbnail = make_thumbnail(frame, self._thumbnail_size)
+        changed = (self._last_thumbnail is None
+                   or float(np.abs(thumbnail - self._last_thumbnail).mean()) > self._change_threshold)
+        if changed:
+            with metrics.timer('stream_recognizer.classify.seconds'):
+                img_sample = self._recognizer.create_data_sample(Image.fromarray(np.asarray(frame)))
+                probabilities = self._recognizer.predict_proba(img_sample.reshape(1, -1))[0]
+            if self._probabilities is None:
+                self._probabilities = probabilities
+            else:
+                self._probabilities = self._smoothing * probabilities + (1 - self._smoothing) * self._probabilities
+            self._last_thumbnail = thumbnail
+            self._classified_frames += 1
+        metrics.increment('stream_recognizer.frames')
+        metrics.increment('stream_recognizer.classified_frames', int(changed))
+        result = {'frame': self._frames, 'classified': changed, **self._make_result()}
+        self._frames += 1
+        return result
+
+    def recognize_frames(self, source: FrameSource) -> Iterator[dict]:
+        """Yields result of update for each frame of source (see iter_frames)."""
+        for frame in iter_frames(source):
+            yield self.update(frame)
+
+    def label_changes(self, source: FrameSource, min_probability: float = 0.0) -> Iterator[dict]:
+        """Yields result of update for the frames of source where the recognized flag changes, including the first
+        one, extended with previous_label. Predictions with (smoothed) probability below min_probability are not
+        reported as changes."""
+        previous_label: Optional[int] = None
+        for result in self.recognize_frames(source):
+            if result['label'] != previous_label and result['probability'] >= min_probability:
+                yield {**result, 'previous_label': previous_label}
+                previous_label = result['label']
+
+    def _make_result(self) -> dict:
+        """Creates label, country name and probability of the current smoothed prediction."""
+        best = int(np.argmax(self._probabilities))
+        label = int(self._recognizer.classes[best])
+        countries_names = self._recognizer.countries_names
+        country = countries_names[label] if label < len(countries_names) else str(label)
+        return {'label': label, 'country': country, 'probability': float(self._probabilities[best])}
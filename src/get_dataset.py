@@ -1,5 +1,9 @@
+import argparse
 import os
+import json
 from flags.dataset_creator import DatasetCreator
+from flags.metrics import MetricsRegistry, set_metrics
+from flags.pixels_layout import get_all_pixels_positions, load_pixels_layout
 
 
 if __name__ == '__main__':
@@ -8,10 +12,49 @@ if __name__ == '__main__':
     DIRNAME = os.path.dirname(__file__)
     PATH_DATA = os.path.join(DIRNAME, 'data')
     DATASET_COMPRESSED_FILENAME = 'np_from_selected_compressed.npz'
+    DATASET_DIRNAME = 'np_from_selected'
 
-    set_creator = DatasetCreator(page_url=PAGE_URL, img_url_start=IMG_URL_START, path_data=PATH_DATA)
+    parser = argparse.ArgumentParser(description='Downloads flags and creates dataset.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes used to preprocess images and create new samples')
+    parser.add_argument('--cache-dir', default=None,
+                        help='directory of cache of stages outputs; only stages whose inputs changed are rerun')
+    parser.add_argument('--pixels-layout', default=None,
+                        help='file with layout of pixels used as features saved by select_pixels.py '
+                             '(by default get_pixels_positions is used)')
+    parser.add_argument('--full-raster', action='store_true',
+                        help='uses all the pixels as features and saves the dataset as np_full_raster '
+                             '(input of select_pixels.py)')
+    parser.add_argument('--metrics', default=None,
+                        help='collects durations, latencies, bytes read and written and errors of the stages, '
+                             'prints their summary and saves it as JSON to the given file')
+    args = parser.parse_args()
+    WIDTH = 32
+    HEIGHT = 20
+    registry = MetricsRegistry() if args.metrics is not None else None
+    set_metrics(registry)
+
+    pixels_positions = None
+    if args.full_raster:
+        pixels_positions = get_all_pixels_positions(width=WIDTH, height=HEIGHT)
+        DATASET_COMPRESSED_FILENAME = 'np_full_raster_compressed.npz'
+        DATASET_DIRNAME = 'np_full_raster'
+    elif args.pixels_layout is not None:
+        # the layout was selected on images of its own dimensions, so the dataset is created with them
+        layout = load_pixels_layout(args.pixels_layout)
+        WIDTH, HEIGHT, pixels_positions = layout['width'], layout['height'], layout['pixels_positions']
+
+    set_creator = DatasetCreator(page_url=PAGE_URL, img_url_start=IMG_URL_START, path_data=PATH_DATA,
+                                 width=WIDTH, height=HEIGHT, workers=args.workers, cache_dir=args.cache_dir,
+                                 pixels_positions=pixels_positions)
     set_creator.download_dataset()
     set_creator.preprocess_initial_images()
-    set_creator.create_new_samples()
-    set_creator.create_np_dataset_from_selected_pixels()
+    set_creator.create_np_dataset_from_selected_pixels(dir_name=DATASET_DIRNAME)
+    set_creator.save_uncompressed_dataset(DATASET_DIRNAME)
     set_creator.save_compressed_dataset(DATASET_COMPRESSED_FILENAME)
+    set_creator.evict_stale_cache()
+
+    if registry is not None:
+        registry.print_summary()
+        with open(args.metrics, 'w') as file:
+            json.dump(registry.snapshot(), file, indent=2)
@@ -1,17 +1,21 @@
 from sklearn.linear_model import LogisticRegression
 import os
-from flags.ml_operations import (load_data_from_npz, simple_cross_validation, print_simple_cross_validation_score,
+from flags.ml_operations import (load_dataset, simple_cross_validation, print_simple_cross_validation_score,
                                  save_trained_model, model_performance_per_class)
+from flags.model_export import export_model
+from flags.mapped_dataset import MappedDataset
+from flags.pixels_layout import save_pixels_layout, get_model_layout_path
 
 if __name__ == '__main__':
     DIRNAME = os.path.dirname(__file__)
     PATH_DATA = os.path.join(DIRNAME, 'data')
-    DATA_FILE_NAME = 'np_from_selected_compressed.npz'
+    DATA_FILE_NAME = 'np_from_selected'
     PATH_MODEL = os.path.join(DIRNAME, 'models')
     MODEL_FILE_NAME = 'clf.pkl'
+    EXPORTED_MODEL_FILE_NAME = 'clf.npz'
 
     print("Loading dataset...")
-    X, y = load_data_from_npz(os.path.join(PATH_DATA, DATA_FILE_NAME))
+    X, y = load_dataset(os.path.join(PATH_DATA, DATA_FILE_NAME))
 
     lr = LogisticRegression(C=100, max_iter=500, random_state=0)
 
@@ -29,3 +33,12 @@ if __name__ == '__main__':
     final_clf.fit(X, y)
 
     save_trained_model(final_clf, os.path.join(PATH_MODEL, MODEL_FILE_NAME))
+    # both models keep the layout of pixels the dataset was created with, so inference uses the same one
+    metadata = MappedDataset(os.path.join(PATH_DATA, DATA_FILE_NAME)).metadata
+    width, height, pixels_positions = metadata.get('width', 32), metadata.get('height', 20), \
+        metadata.get('pixels_positions')
+    if pixels_positions is not None:
+        save_pixels_layout(get_model_layout_path(os.path.join(PATH_MODEL, MODEL_FILE_NAME)), pixels_positions,
+                           width, height)
+    export_model(final_clf, os.path.join(PATH_MODEL, EXPORTED_MODEL_FILE_NAME), width=width, height=height,
+                 pixels_positions=pixels_positions)
@@ -1,23 +1,35 @@
 from sklearn.linear_model import LogisticRegression
+import argparse
 import os
-from flags.ml_operations import (load_data_from_npz, nested_cross_validation, process_cross_validation_results,
+from flags.ml_operations import (load_dataset, nested_cross_validation, process_cross_validation_results,
                                  print_cross_validation_results)
 
 
 if __name__ == '__main__':
     DIRNAME = os.path.dirname(__file__)
     PATH_DATA = os.path.join(DIRNAME, 'data')
-    DATA_FILE_NAME = 'np_from_selected_compressed.npz'
+    DATA_FILE_NAME = 'np_from_selected'
+
+    parser = argparse.ArgumentParser(description='Compares values of C by nested cross validation.')
+    parser.add_argument('--n-jobs', type=int, default=1,
+                        help='number of processes shared by outer and inner loops (-1 means all CPUs)')
+    parser.add_argument('--search', choices=['grid', 'path'], default='grid',
+                        help='grid: fit each C from scratch, path: visit C in increasing order with warm start')
+    parser.add_argument('--patience', type=int, default=None,
+                        help='path search stops after this number of values of C without improvement of accuracy')
+    args = parser.parse_args()
 
     print("Loading dataset...")
-    X, y = load_data_from_npz(os.path.join(PATH_DATA, DATA_FILE_NAME))
+    X, y = load_dataset(os.path.join(PATH_DATA, DATA_FILE_NAME))
 
     print("Training model using cross validation...")
     lr = LogisticRegression(max_iter=500, random_state=0)
     param_grid = {"C": [0.01, 0.1, 1, 10, 100, 1000]}
 
     inner_scores, best_params_list = nested_cross_validation(X, y, clf=lr, param_grid=param_grid,
-                                                             n_inner_splits=4, n_outer_splits=4)
+                                                             n_inner_splits=4, n_outer_splits=4,
+                                                             n_jobs=args.n_jobs, search=args.search,
+                                                             patience=args.patience)
 
     params_list, params_scores, fit_times = process_cross_validation_results(inner_scores)
     print_cross_validation_results(params_list, params_scores, fit_times, best_params_list)
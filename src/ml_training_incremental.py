@@ -0,0 +1,66 @@
+import argparse
+import os
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from flags.image_preprocessor import get_pixels_positions
+from flags.incremental_training import (train_incremental, iterate_dataset_batches, iterate_augmented_batches,
+                                        load_base_images)
+from flags.mapped_dataset import MappedDataset
+from flags.ml_operations import save_trained_model
+from flags.model_export import export_model
+from flags.pixels_layout import save_pixels_layout, get_model_layout_path
+
+if __name__ == '__main__':
+    WIDTH = 32
+    HEIGHT = 20
+    DIRNAME = os.path.dirname(__file__)
+    PATH_DATA = os.path.join(DIRNAME, 'data')
+    DATA_FILE_NAME = 'np_from_selected'
+    PATH_MODEL = os.path.join(DIRNAME, 'models')
+    MODEL_FILE_NAME = 'clf.pkl'
+    EXPORTED_MODEL_FILE_NAME = 'clf.npz'
+
+    parser = argparse.ArgumentParser(description='Trains SGDClassifier with log loss incrementally on batches read '
+                                                 'from the dataset or created by augmentation on the fly.')
+    parser.add_argument('--source', choices=('dataset', 'augmentation'), default='dataset',
+                        help="'dataset' reads batches of np_from_selected from disk, 'augmentation' creates new "
+                             "samples of preprocessed images <country_number>_0.png in each epoch")
+    parser.add_argument('--variants-per-class', type=int, default=200,
+                        help='number of new samples of each country created in each epoch (with augmentation)')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--buffer-size', type=int, default=16384, help='number of rows of the shuffling buffer')
+    parser.add_argument('--alpha', type=float, default=1e-5, help='regularization strength of SGDClassifier')
+    parser.add_argument('--checkpoint', default=None,
+                        help='file where the classifier is saved after each epoch; training resumes from it')
+    args = parser.parse_args()
+
+    if args.source == 'dataset':
+        dataset = MappedDataset(os.path.join(PATH_DATA, DATA_FILE_NAME))
+        classes = np.array(dataset.classes)
+        WIDTH, HEIGHT = dataset.metadata.get('width', WIDTH), dataset.metadata.get('height', HEIGHT)
+        pixels_positions = dataset.metadata.get('pixels_positions')
+        if pixels_positions is None:
+            pixels_positions, _, _ = get_pixels_positions(width=WIDTH, height=HEIGHT)
+
+        def make_batches(epoch):
+            return iterate_dataset_batches(dataset, args.batch_size, np.random.default_rng(epoch))
+    else:
+        pixels_positions, _, _ = get_pixels_positions(width=WIDTH, height=HEIGHT)
+        images = load_base_images(PATH_DATA, range(206))
+        classes = np.array(list(images))
+
+        def make_batches(epoch):
+            return iterate_augmented_batches(images, pixels_positions, args.variants_per_class,
+                                             np.random.default_rng(epoch))
+
+    print("Training model incrementally...")
+    clf = SGDClassifier(loss='log_loss', alpha=args.alpha, random_state=0)
+    clf = train_incremental(make_batches, classes, clf, epochs=args.epochs, batch_size=args.batch_size,
+                            buffer_size=args.buffer_size, checkpoint_path=args.checkpoint)
+
+    save_trained_model(clf, os.path.join(PATH_MODEL, MODEL_FILE_NAME))
+    save_pixels_layout(get_model_layout_path(os.path.join(PATH_MODEL, MODEL_FILE_NAME)), pixels_positions, WIDTH,
+                       HEIGHT)
+    export_model(clf, os.path.join(PATH_MODEL, EXPORTED_MODEL_FILE_NAME), width=WIDTH, height=HEIGHT,
+                 pixels_positions=pixels_positions)
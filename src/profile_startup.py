@@ -0,0 +1,32 @@
+import argparse
+import os
+import sys
+from flags.startup_profile import measure_startup, check_startup
+
+
+if __name__ == '__main__':
+    DIRNAME = os.path.dirname(__file__)
+    file_path_clf = os.path.join(DIRNAME, 'models', 'clf.npz')
+    file_path_countries_list = os.path.join(DIRNAME, 'data', 'countries.txt')
+    file_path_image = os.path.join(DIRNAME, '..', 'tests', 'data_for_tests', '116.png')
+
+    parser = argparse.ArgumentParser(description='Measures time to the first prediction of the inference path '
+                                                 'in fresh processes and fails if it exceeds the budget.')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--total-budget-ms', type=float, default=1500,
+                        help='budget of time from starting Python to the first prediction')
+    parser.add_argument('--first-prediction-budget-ms', type=float, default=100,
+                        help='budget of time of the first prediction after the model is loaded')
+    parser.add_argument('--image', default=file_path_image)
+    args = parser.parse_args()
+
+    report = measure_startup(file_path_clf, file_path_countries_list, args.image, repeats=args.repeats)
+    print(f"Import: {report['import_ms']:.1f} ms, loading model: {report['load_ms']:.1f} ms, "
+          f"first prediction: {report['first_prediction_ms']:.1f} ms, total: {report['total_ms']:.1f} ms")
+    print('Slowest imports (cumulative ms):')
+    for name, time_ms in report['slowest_imports']:
+        print(f'  {name}: {time_ms:.1f}')
+    problems = check_startup(report, args.total_budget_ms, args.first_prediction_budget_ms)
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
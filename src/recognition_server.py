@@ -0,0 +1,46 @@
+import argparse
+import os
+from flags.recognizer import Recognizer
+from flags.server import RecognitionServer
+from flags.prediction_cache import PredictionCache
+
+
+if __name__ == '__main__':
+    WIDTH = 32
+    HEIGHT = 20
+    DIRNAME = os.path.dirname(__file__)
+    file_path_clf = os.path.join(DIRNAME, 'models', 'clf.npz')
+    file_path_countries_list = os.path.join(DIRNAME, 'data', 'countries.txt')
+
+    parser = argparse.ArgumentParser(description='Runs HTTP server recognizing flags. '
+                                                 'POST raw bytes of an image to /recognize.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=64,
+                        help='maximal number of concurrent requests classified together')
+    parser.add_argument('--max-wait', type=float, default=0.005,
+                        help='maximal time (in seconds) a request waits for other requests to be classified with')
+    parser.add_argument('--max-body-size', type=int, default=10 * 2 ** 20,
+                        help='maximal size (in bytes) of an uploaded image; larger uploads are rejected with 413')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='maximal number of cached results (0 means no cache)')
+    parser.add_argument('--cache-tolerance', type=int, default=0,
+                        help='maximal Hamming distance between perceptual hashes of images sharing cached result')
+    parser.add_argument('--cache-max-difference', type=float, default=2.0,
+                        help='maximal mean absolute difference (0-255) of preprocessed images sharing cached result')
+    parser.add_argument('--cache-path', default=None, help='file the cache is loaded from and saved to at shutdown')
+    args = parser.parse_args()
+
+    print("Preparing environment...")
+    cache = None
+    if args.cache_size > 0:
+        cache = PredictionCache(max_size=args.cache_size, tolerance=args.cache_tolerance,
+                               max_difference=args.cache_max_difference, path=args.cache_path)
+    recognizer = Recognizer.from_files(file_path_clf, file_path_countries_list, WIDTH, HEIGHT, cache)
+    server = RecognitionServer(recognizer, host=args.host, port=args.port, max_batch_size=args.max_batch_size,
+                               max_wait=args.max_wait, max_body_size=args.max_body_size)
+    print(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
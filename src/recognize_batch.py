@@ -0,0 +1,31 @@
+import argparse
+import json
+import os
+import sys
+from flags.recognizer import Recognizer
+from flags.batch_inference import collect_paths, recognize_files
+
+
+if __name__ == '__main__':
+    WIDTH = 32
+    HEIGHT = 20
+    DIRNAME = os.path.dirname(__file__)
+    file_path_clf = os.path.join(DIRNAME, 'models', 'clf.npz')
+    file_path_countries_list = os.path.join(DIRNAME, 'data', 'countries.txt')
+
+    parser = argparse.ArgumentParser(description='Recognizes flags in many images and writes one JSON line '
+                                                 'per image to stdout.')
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help='directories, glob patterns or files; "-" (default) reads paths from stdin')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of processes reading and preprocessing images')
+    parser.add_argument('--batch-size', type=int, default=256, help='number of images classified together')
+    parser.add_argument('--top-k', type=int, default=3, help='number of most probable countries reported')
+    args = parser.parse_args()
+
+    recognizer = Recognizer.from_files(file_path_clf, file_path_countries_list, WIDTH, HEIGHT)
+    paths = collect_paths(args.inputs, stdin=sys.stdin)
+    for result in recognize_files(recognizer, paths, workers=args.workers, batch_size=args.batch_size,
+                                  top_k=args.top_k):
+        sys.stdout.write(json.dumps(result) + '\n')
+        sys.stdout.flush()
@@ -0,0 +1,30 @@
+import argparse
+import os
+from flags.template_matching import TemplateMatcher, METRICS
+
+
+if __name__ == '__main__':
+    WIDTH = 32
+    HEIGHT = 20
+    DIRNAME = os.path.dirname(__file__)
+    path_data = os.path.join(DIRNAME, 'data')
+    file_path_countries_list = os.path.join(DIRNAME, 'data', 'countries.txt')
+
+    parser = argparse.ArgumentParser(description='Recognizes flag by comparing it with template flags '
+                                                 '(preprocessed images created by get_dataset.py).')
+    parser.add_argument('--metric', choices=METRICS, default='mse')
+    parser.add_argument('--top-k', type=int, default=3, help='number of closest countries reported')
+    args = parser.parse_args()
+
+    print("Preparing environment...")
+    try:
+        matcher = TemplateMatcher.from_files(path_data, file_path_countries_list, WIDTH, HEIGHT, args.metric)
+
+        file_path_in = input('Provide path to picture of a flag: ')
+        print("Converting your picture...")
+        results = matcher.recognize(file_path_in, k=args.top_k)
+        print(f"This is a flag of {results[0]['country']}.")
+        for result in results:
+            print(f"{result['country']}: distance {result['distance']:.4f}")
+    except Exception as e:
+        print(f'Impossible to recognize flag because of error. Error: {e}')
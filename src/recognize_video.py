@@ -0,0 +1,38 @@
+import argparse
+import json
+import os
+import sys
+from flags.recognizer import Recognizer
+from flags.video_recognition import StreamRecognizer
+
+
+if __name__ == '__main__':
+    WIDTH = 32
+    HEIGHT = 20
+    DIRNAME = os.path.dirname(__file__)
+    file_path_clf = os.path.join(DIRNAME, 'models', 'clf.npz')
+    file_path_countries_list = os.path.join(DIRNAME, 'data', 'countries.txt')
+
+    parser = argparse.ArgumentParser(description='Recognizes flags in a video and writes one JSON line to stdout '
+                                                 'each time the recognized flag changes.')
+    parser.add_argument('video', help='video file readable by imageio (e.g. GIF, or MP4 with pyav installed)')
+    parser.add_argument('--change-threshold', type=float, default=0.02,
+                        help='minimal mean difference of thumbnails (from 0 to 1) for a frame to be classified')
+    parser.add_argument('--smoothing', type=float, default=0.5,
+                        help='weight of the newest frame in the moving average of probabilities (1 disables it)')
+    parser.add_argument('--min-probability', type=float, default=0.0,
+                        help='minimal probability of a flag to be reported')
+    parser.add_argument('--all-frames', action='store_true', help='writes a line for each frame instead')
+    args = parser.parse_args()
+
+    recognizer = Recognizer.from_files(file_path_clf, file_path_countries_list, WIDTH, HEIGHT)
+    stream_recognizer = StreamRecognizer(recognizer, change_threshold=args.change_threshold,
+                                         smoothing=args.smoothing)
+    if args.all_frames:
+        results = stream_recognizer.recognize_frames(args.video)
+    else:
+        results = stream_recognizer.label_changes(args.video, min_probability=args.min_probability)
+    for result in results:
+        sys.stdout.write(json.dumps(result) + '\n')
+        sys.stdout.flush()
+    print(f'Classified {stream_recognizer.classified_frames} of {stream_recognizer.frames} frames.', file=sys.stderr)
@@ -0,0 +1,32 @@
+import argparse
+import os
+from flags.mapped_dataset import MappedDataset
+from flags.pixel_selection import select_pixels, SCORING_METHODS
+from flags.pixels_layout import save_pixels_layout
+
+
+if __name__ == '__main__':
+    DIRNAME = os.path.dirname(__file__)
+    PATH_DATA = os.path.join(DIRNAME, 'data')
+    DATA_FILE_NAME = 'np_full_raster'
+    file_path_layout = os.path.join(DIRNAME, 'models', 'pixels_layout.json')
+
+    parser = argparse.ArgumentParser(description='Chooses the smallest set of pixels giving the target accuracy '
+                                                 'from full raster dataset created by get_dataset.py --full-raster.')
+    parser.add_argument('--target-accuracy', type=float, default=0.99)
+    parser.add_argument('--method', choices=SCORING_METHODS, default='mutual_information',
+                        help='how informative pixels are scored')
+    parser.add_argument('--output', default=file_path_layout)
+    args = parser.parse_args()
+
+    print("Loading dataset...")
+    dataset = MappedDataset(os.path.join(PATH_DATA, DATA_FILE_NAME))
+    width, height = dataset.metadata['width'], dataset.metadata['height']
+
+    print("Selecting pixels...")
+    pixels_positions, results = select_pixels(dataset.X, dataset.y, width, height,
+                                              target_accuracy=args.target_accuracy, method=args.method)
+    save_pixels_layout(args.output, pixels_positions, width, height, results)
+    print(f'Chosen {len(pixels_positions)} pixels: {list(pixels_positions)}')
+    print(f'Layout saved to {args.output}. Create dataset with it by: python get_dataset.py --pixels-layout '
+          f'{args.output}')
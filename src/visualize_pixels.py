@@ -1,12 +1,25 @@
+import argparse
 from matplotlib.patches import Rectangle
 import matplotlib.pyplot as plt
 from flags.image_preprocessor import get_pixels_positions
+from flags.pixels_layout import load_pixels_layout
 
 if __name__ == '__main__':
     X_MAX = 32
     Y_MAX = 20
 
+    parser = argparse.ArgumentParser(description='Plots pixels used as features.')
+    parser.add_argument('--layout', default=None,
+                        help='layout saved by select_pixels.py (by default get_pixels_positions is plotted)')
+    args = parser.parse_args()
+
     pixels_positions, width_limits, height_limits = get_pixels_positions(width=X_MAX, height=Y_MAX)
+    file_name = 'img/pixels'
+    if args.layout is not None:
+        layout = load_pixels_layout(args.layout)
+        X_MAX, Y_MAX = layout['width'], layout['height']
+        pixels_positions, width_limits, height_limits = layout['pixels_positions'], [], []
+        file_name = 'img/pixels_layout'
 
     current_axis = plt.gca()
     for pixel_position in pixels_positions:
@@ -18,6 +31,6 @@ if __name__ == '__main__':
         plt.axhline(y_lim)
     for x_lim in width_limits:
         plt.axvline(x_lim)
-    plt.savefig('img/pixels.pdf', bbox_inches='tight')
-    plt.savefig('img/pixels.png', bbox_inches='tight', dpi=80)
+    plt.savefig(f'{file_name}.pdf', bbox_inches='tight')
+    plt.savefig(f'{file_name}.png', bbox_inches='tight', dpi=80)
     plt.show()
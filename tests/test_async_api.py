@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+import pytest
+from src.flags.async_api import AsyncRecognizer
+from src.flags.metrics import MetricsRegistry, use_metrics
+from src.flags.recognizer import Recognizer
+
+
+@pytest.fixture()
+def recognizer():
+    return Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                 os.path.join('tests', 'data_for_tests', 'countries.txt'))
+
+
+def read_image(file_name):
+    with open(os.path.join('tests', 'data_for_tests', file_name), 'rb') as file:
+        return file.read()
+
+
+def test_concurrent_calls_are_recognized_in_batches(recognizer):
+    sources = [read_image(file_name) for file_name in ['116.png', '140_3.png', '116_5.png'] * 4]
+
+    async def main():
+        async with AsyncRecognizer(recognizer, max_workers=4, max_batch_size=16, max_wait=0.2) as async_recognizer:
+            return await asyncio.gather(*(async_recognizer.recognize(source) for source in sources))
+
+    with use_metrics(MetricsRegistry()) as registry:
+        results = asyncio.run(main())
+    assert [result['label'] for result in results] == [116, 140, 116] * 4
+    assert results[0] == recognizer.recognize(sources[0])
+    assert registry.snapshot()['histograms']['recognizer.batch_size']['count'] < len(sources)
+
+
+def test_timed_out_call_raises_and_event_loop_stays_responsive(recognizer):
+    async def main():
+        async with AsyncRecognizer(recognizer, max_wait=0.5) as async_recognizer:
+            start = time.monotonic()
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.get_running_loop().create_task(tick())
+            with pytest.raises(TimeoutError):
+                await async_recognizer.recognize(read_image('116.png'), timeout=0.1)
+            elapsed = time.monotonic() - start
+            ticker.cancel()
+            result = await async_recognizer.recognize(read_image('116.png'), timeout=5)
+            return elapsed, ticks, result
+
+    elapsed, ticks, result = asyncio.run(main())
+    assert elapsed < 0.4
+    assert ticks > 3
+    assert result['label'] == 116
+
+
+def test_cancelled_call_is_not_classified(recognizer):
+    async def main():
+        async with AsyncRecognizer(recognizer, max_wait=0.2) as async_recognizer:
+            task = asyncio.get_running_loop().create_task(async_recognizer.recognize(read_image('116.png')))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.3)
+
+    with use_metrics(MetricsRegistry()) as registry:
+        asyncio.run(main())
+    assert 'recognizer.batch_size' not in registry.snapshot()['histograms']
+
+
+def test_errors_of_reading_image_are_returned_by_recognize_many(recognizer):
+    async def main():
+        async with AsyncRecognizer(recognizer) as async_recognizer:
+            return await async_recognizer.recognize_many([read_image('116.png'), read_image('countries.txt')])
+
+    result, error = asyncio.run(main())
+    assert result['label'] == 116
+    assert isinstance(error, Exception)
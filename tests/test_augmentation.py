@@ -0,0 +1,38 @@
+import numpy as np
+from PIL import Image, ImageEnhance
+import pytest
+import os
+from src.flags.augmentation import (AugmentationGrid, brightness_variants, contrast_variants, hue_shift_variants,
+                                    blur_variants, jpeg_noise_variants)
+from src.flags.image_preprocessor import preprocess_image_to_array
+
+
+@pytest.fixture()
+def img():
+    return preprocess_image_to_array(os.path.join('tests', 'data_for_tests', '116.png'), 32, 20)
+
+
+def test_brightness_variants_are_the_same_as_from_pil(img):
+    factors = np.arange(0.8, 1.2, 0.02)
+    variants = brightness_variants(img, factors)
+    for factor, variant in zip(factors, variants):
+        assert np.array_equal(variant, np.asarray(ImageEnhance.Brightness(Image.fromarray(img)).enhance(factor)))
+
+
+def test_contrast_variants_are_the_same_as_from_pil(img):
+    factors = np.arange(0.8, 1.2, 0.02)
+    variants = contrast_variants(img, factors)
+    for factor, variant in zip(factors, variants):
+        assert np.array_equal(variant, np.asarray(ImageEnhance.Contrast(Image.fromarray(img)).enhance(factor)))
+
+
+def test_default_grid_creates_40_variants(img):
+    variants = AugmentationGrid().apply(img)
+    assert variants.shape == (40, 20, 32, 3)
+    assert variants.dtype == np.uint8
+
+
+def test_neutral_transformations_keep_image(img):
+    assert np.array_equal(hue_shift_variants(img, [0, 360])[1], img)
+    assert np.array_equal(blur_variants(img, [1e-3])[0], img)
+    assert np.abs(jpeg_noise_variants(img, [100])[0].astype(int) - img).mean() < 20
@@ -0,0 +1,32 @@
+import io
+import os
+import pytest
+from src.flags.batch_inference import collect_paths, recognize_files
+from src.flags.recognizer import Recognizer
+
+
+@pytest.fixture()
+def recognizer():
+    return Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                 os.path.join('tests', 'data_for_tests', 'countries.txt'))
+
+
+def test_collect_paths_from_glob_and_stdin():
+    stdin = io.StringIO('a.png\n\nb.svg\n')
+    paths = list(collect_paths([os.path.join('tests', 'data_for_tests', '116*.png'), '-'], stdin=stdin))
+    assert paths == [os.path.join('tests', 'data_for_tests', '116.png'),
+                     os.path.join('tests', 'data_for_tests', '116_5.png'), 'a.png', 'b.svg']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_results_are_in_order_with_errors_inline(recognizer, workers):
+    paths = [os.path.join('tests', 'data_for_tests', file_name)
+             for file_name in ['116.png', 'missing.png', '140_3.png', 'countries.txt', '116_5.png']]
+    results = list(recognize_files(recognizer, paths, workers=workers, batch_size=2, top_k=3))
+    assert [result['path'] for result in results] == paths
+    assert [result.get('label') for result in results] == [116, None, 140, None, 116]
+    assert 'Missing file' in results[1]['error']
+    assert 'Unexpected error' in results[3]['error']
+    assert len(results[0]['top_k']) == 3
+    assert results[0]['top_k'][0]['label'] == 116
+    assert results[0]['top_k'][0]['probability'] >= results[0]['top_k'][1]['probability']
@@ -0,0 +1,31 @@
+from benchmarks.run_benchmarks import compare_with_baseline
+
+
+def make_results(time_s, peak_rss_mb):
+    return {'stages': {'preprocess': {'time_s': time_s, 'peak_rss_mb': peak_rss_mb}}}
+
+
+def test_results_within_thresholds_are_not_regressions():
+    baseline = make_results(1.0, 100.0)
+    assert compare_with_baseline(make_results(1.2, 110.0), baseline) == []
+    assert compare_with_baseline(make_results(0.5, 50.0), baseline) == []
+
+
+def test_slower_stage_is_regression():
+    regressions = compare_with_baseline(make_results(1.5, 100.0), make_results(1.0, 100.0))
+    assert len(regressions) == 1
+    assert regressions[0].startswith('preprocess: time')
+
+
+def test_short_stage_noise_is_not_regression():
+    assert compare_with_baseline(make_results(0.03, 100.0), make_results(0.01, 100.0)) == []
+
+
+def test_larger_peak_rss_is_regression():
+    regressions = compare_with_baseline(make_results(1.0, 130.0), make_results(1.0, 100.0))
+    assert len(regressions) == 1
+    assert regressions[0].startswith('preprocess: peak RSS')
+
+
+def test_stages_missing_from_baseline_are_skipped():
+    assert compare_with_baseline(make_results(10.0, 1000.0), {'stages': {}}) == []
@@ -0,0 +1,128 @@
+import numpy as np
+import os
+import shutil
+from PIL import Image
+from src.flags.augmentation import AugmentationGrid
+from src.flags.dataset_creator import DatasetCreator
+from src.flags.metrics import MetricsRegistry, use_metrics
+from src.flags.image_preprocessor import get_pixels_positions, get_pixels_indices, create_data_samples_from_images
+
+FLAGS_COLOURS = (('#dc143c', '#fff'), ('#ffce00', '#000'), ('#002395', '#ed2939'))
+
+
+def save_svg_flags(path_data, flags_colours=FLAGS_COLOURS):
+    """Saves flags with two horizontal stripes as <country_number>.svg."""
+    for country_number, (bottom, top) in enumerate(flags_colours):
+        with open(os.path.join(path_data, f'{country_number}.svg'), 'w') as file:
+            file.write('<svg xmlns="http://www.w3.org/2000/svg" width="640" height="400" viewBox="0 0 8 5">'
+                       f'<rect width="8" height="5" fill="{bottom}"/><rect width="8" height="2.5" fill="{top}"/></svg>')
+
+
+def copy_preprocessed_images(path_data):
+    """Copies images from tests/data_for_tests as preprocessed images of countries 0, 1 and 2."""
+    for country_number, file_name in enumerate(('116.png', '31.png', '140_3.png')):
+        shutil.copy(os.path.join('tests', 'data_for_tests', file_name),
+                    os.path.join(path_data, f'{country_number}_0.png'))
+
+
+def make_creator(path_data, workers=1, countries_numbers=(0, 1, 2), **kwargs):
+    set_creator = DatasetCreator('', '', path_data, augmentation=AugmentationGrid((0.8, 1.2), (0.9, )),
+                                 workers=workers, **kwargs)
+    set_creator._countries_numbers = list(countries_numbers)
+    return set_creator
+
+
+def test_preprocessing_in_processes_gives_the_same_images(tmp_path):
+    preprocessed = []
+    for workers in (1, 2):
+        path_data = tmp_path / str(workers)
+        path_data.mkdir()
+        save_svg_flags(path_data)
+        make_creator(path_data, workers).preprocess_initial_images()
+        preprocessed.append([np.asarray(Image.open(path_data / f'{country_number}_0.png'))
+                             for country_number in range(len(FLAGS_COLOURS))])
+    for serial, parallel in zip(*preprocessed):
+        assert np.array_equal(serial, parallel)
+
+
+def test_new_samples_created_in_processes_are_the_same_and_in_the_same_order(tmp_path):
+    copy_preprocessed_images(tmp_path)
+    serial = make_creator(tmp_path, workers=1)
+    serial.create_new_samples()
+    parallel = make_creator(tmp_path, workers=2)
+    parallel.create_new_samples()
+    assert list(parallel._samples) == list(serial._samples) == [0, 1, 2]
+    for country_number in serial._samples:
+        assert np.array_equal(parallel._samples[country_number], serial._samples[country_number])
+
+    serial.create_np_dataset_from_selected_pixels()
+    parallel.create_np_dataset_from_selected_pixels()
+    assert np.array_equal(parallel._X, serial._X)
+    assert np.array_equal(parallel._y, serial._y)
+
+
+def test_preallocated_dataset_is_the_same_as_concatenated_features(tmp_path):
+    copy_preprocessed_images(tmp_path)
+    set_creator = make_creator(tmp_path)
+    set_creator.create_new_samples()
+    set_creator.create_np_dataset_from_selected_pixels()
+
+    pixels_indices = get_pixels_indices(get_pixels_positions(32, 20)[0])
+    expected_X = np.concatenate([create_data_samples_from_images(samples, pixels_indices)
+                                 for samples in set_creator._samples.values()])
+    expected_y = np.concatenate([np.full(len(samples), country_number)
+                                 for country_number, samples in set_creator._samples.items()])
+    assert np.array_equal(set_creator._X, expected_X)
+    assert np.array_equal(set_creator._y, expected_y)
+
+
+def test_memory_mapped_dataset_is_the_same_as_in_memory(tmp_path):
+    copy_preprocessed_images(tmp_path)
+    in_memory = make_creator(tmp_path)
+    in_memory.create_np_dataset_from_selected_pixels()
+    mapped = make_creator(tmp_path)
+    mapped.create_np_dataset_from_selected_pixels(dir_name='dataset')
+    assert isinstance(mapped._X, np.memmap)
+    assert np.array_equal(np.load(tmp_path / 'dataset' / 'X.npy'), in_memory._X)
+    assert np.array_equal(np.load(tmp_path / 'dataset' / 'y.npy'), in_memory._y)
+
+
+def test_dataset_is_truncated_to_rows_of_countries_with_samples(tmp_path):
+    copy_preprocessed_images(tmp_path)
+    with open(tmp_path / '1_0.png', 'w') as file:
+        file.write('not an image')
+    in_memory = make_creator(tmp_path)
+    in_memory.create_np_dataset_from_selected_pixels()
+    mapped = make_creator(tmp_path)
+    mapped.create_np_dataset_from_selected_pixels(dir_name='dataset')
+
+    files_per_country = 1 + in_memory._augmentation.n_variants
+    assert in_memory._X.shape[0] == 2 * files_per_country
+    assert in_memory._y.tolist() == [0] * files_per_country + [2] * files_per_country
+    X, y = np.load(tmp_path / 'dataset' / 'X.npy'), np.load(tmp_path / 'dataset' / 'y.npy')
+    assert np.array_equal(X, in_memory._X)
+    assert np.array_equal(y, in_memory._y)
+    assert np.array_equal(mapped._X, in_memory._X)
+
+
+def test_only_stages_of_changed_country_are_rerun_with_cache(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    registries = []
+    for flags_colours in (FLAGS_COLOURS, FLAGS_COLOURS[:2] + (('#009246', '#ce2b37'), )):
+        path_data = tmp_path / str(len(registries))
+        path_data.mkdir()
+        save_svg_flags(path_data, flags_colours)
+        set_creator = make_creator(path_data, cache_dir=cache_dir)
+        with use_metrics(MetricsRegistry()) as registry:
+            set_creator.preprocess_initial_images()
+            set_creator.create_new_samples()
+            set_creator.create_np_dataset_from_selected_pixels()
+        registries.append(registry)
+
+    first, second = registries
+    for stage in ('preprocess', 'augment', 'features'):
+        assert first.counter(f'{stage}.cache_hits') == 0
+        assert second.counter(f'{stage}.cache_hits') == 2
+    # the changed country is the only miss of the second build, so each stage has one more entry
+    for stage in ('rasterize', 'augment', 'features'):
+        assert len(os.listdir(cache_dir / stage)) == len(FLAGS_COLOURS) + 1
@@ -0,0 +1,75 @@
+import numpy as np
+from PIL import Image
+import pytest
+import os
+from src.flags.detection import FlagDetector, image_pyramid, window_features, non_max_suppression
+from src.flags.image_preprocessor import create_data_sample_from_array
+from src.flags.recognizer import Recognizer
+
+
+@pytest.fixture()
+def recognizer():
+    return Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                 os.path.join('tests', 'data_for_tests', 'countries.txt'))
+
+
+def make_photo(file_name, box):
+    """Flag from file_name pasted at box (x0, y0, x1, y1) into an image of noise."""
+    rng = np.random.default_rng(0)
+    photo = Image.fromarray(rng.integers(60, 200, (300, 450, 3), dtype=np.uint8))
+    with Image.open(os.path.join('tests', 'data_for_tests', file_name)) as flag:
+        photo.paste(flag.convert('RGB').resize((box[2] - box[0], box[3] - box[1])), box[:2])
+    return photo
+
+
+def test_window_samples_are_the_same_as_from_each_window(recognizer):
+    level = np.random.default_rng(0).integers(0, 256, (30, 45, 3), dtype=np.uint8)
+    samples, positions, non_uniformity, edge_contrasts = window_features(level, 32, 20, recognizer.pixels_indices,
+                                                                         stride=3)
+    assert len(samples) == len(positions) == len(non_uniformity) == len(edge_contrasts) == 4 * 5
+    for sample, (x, y) in zip(samples, positions):
+        assert np.array_equal(sample, create_data_sample_from_array(level[y:y + 20, x:x + 32],
+                                                                    recognizer.pixels_indices))
+    # sides on the border of the level are left out
+    assert np.isnan(edge_contrasts[0, [0, 2]]).all() and not np.isnan(edge_contrasts[0, [1, 3]]).any()
+
+
+def test_pyramid_starts_with_whole_image_and_skips_too_wide_windows():
+    img = Image.new('RGB', (300, 200))
+    levels = list(image_pyramid(img, 32, 20, scales=(1.0, 0.5), aspect_ratios=(1.5, 2.0)))
+    assert [level.shape for level, _, _ in levels] == [(20, 32, 3), (20, 32, 3), (40, 64, 3), (40, 48, 3)]
+
+
+def test_non_max_suppression_leaves_out_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [0, 0, 9, 10]], dtype=float)
+    scores = np.array([0.9, 0.95, 0.5, 0.1])
+    assert non_max_suppression(boxes, scores, iou_threshold=0.3).tolist() == [1, 2]
+    assert non_max_suppression(boxes, scores, iou_threshold=0.3, max_boxes=1).tolist() == [1]
+
+
+def test_flag_is_found_inside_photo(recognizer):
+    box = (220, 130, 380, 230)
+    detections = FlagDetector(recognizer).detect(make_photo('140_3.png', box))
+    assert detections[0]['label'] == 140
+    assert detections[0]['country'] == 'Poland'
+    assert np.abs(np.array(detections[0]['box']) - box).max() < 15
+
+
+def test_whole_image_flag_is_detected_as_recognized(recognizer):
+    file_path = os.path.join('tests', 'data_for_tests', '116.png')
+    detections = FlagDetector(recognizer).detect(file_path)
+    with Image.open(file_path) as img:
+        assert detections[0]['box'] == [0, 0, img.width, img.height]
+    assert detections[0]['label'] == recognizer.recognize(file_path)['label']
+
+
+def test_flag_is_found_inside_4k_photo(recognizer):
+    # speed of detection in large images is tracked by the detection benchmark stage
+    rng = np.random.default_rng(0)
+    photo = Image.fromarray(rng.integers(60, 200, (2160, 3840, 3), dtype=np.uint8))
+    box = (1600, 900, 2560, 1500)
+    with Image.open(os.path.join('tests', 'data_for_tests', '140_3.png')) as flag:
+        photo.paste(flag.convert('RGB').resize((box[2] - box[0], box[3] - box[1])), box[:2])
+    detections = FlagDetector(recognizer).detect(photo)
+    assert detections[0]['country'] == 'Poland'
+    assert np.abs(np.array(detections[0]['box']) - box).max() < 90
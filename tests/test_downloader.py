@@ -0,0 +1,57 @@
+import pytest
+import os
+from src.flags.dataset_creator import DatasetCreator
+from src.flags.downloader import Downloader
+from src.flags.utils import load_countries_names
+from benchmarks.fixtures import GalleryServer, make_fixture_gallery
+
+
+@pytest.fixture()
+def gallery():
+    return make_fixture_gallery(5)
+
+
+def download(server, path_data):
+    set_creator = DatasetCreator(page_url=server.url + 'gallery.html', img_url_start=server.url,
+                                 path_data=path_data, downloader=Downloader(max_workers=4, backoff_factor=0))
+    set_creator.download_dataset()
+    return set_creator
+
+
+def test_all_images_are_downloaded(gallery, tmp_path):
+    files, names = gallery
+    with GalleryServer(files) as server:
+        set_creator = download(server, tmp_path)
+    assert set_creator._countries_numbers == [0, 1, 2, 3, 4]
+    assert load_countries_names(os.path.join(tmp_path, 'countries.txt')) == names
+    with open(os.path.join(tmp_path, '3.svg'), 'rb') as file:
+        assert file.read() == files['/3/3/Flag_of_Country_3.svg']
+
+
+def test_failed_image_keeps_countries_order(gallery, tmp_path, capsys):
+    files, names = gallery
+    del files['/2/2/Flag_of_Country_2.svg']
+    with GalleryServer(files) as server:
+        set_creator = download(server, tmp_path)
+    out, err = capsys.readouterr()
+    assert 'Failed to download 1 of 5 images' in out
+    assert out.count('Country 2') == 1
+    assert 'image 2 (Country 2): status 404' in out
+    assert set_creator._countries_numbers == [0, 1, 3, 4]
+    assert load_countries_names(os.path.join(tmp_path, 'countries.txt')) == names
+    assert not os.path.exists(os.path.join(tmp_path, '2.svg'))
+
+
+def test_transient_failure_is_retried(gallery, tmp_path):
+    files, names = gallery
+    with GalleryServer(files, transient_failures={'/1/1/Flag_of_Country_1.svg': 2}) as server:
+        set_creator = download(server, tmp_path)
+        assert server.requests_count['/1/1/Flag_of_Country_1.svg'] == 3
+    assert set_creator._countries_numbers == [0, 1, 2, 3, 4]
+
+
+def test_missing_page_prints_message(tmp_path, capsys):
+    with GalleryServer({}) as server:
+        download(server, tmp_path)
+    out, err = capsys.readouterr()
+    assert 'No connection to' in out
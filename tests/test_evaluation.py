@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from src.flags.evaluation import EvaluationAccumulator, evaluate
+from src.flags.mapped_dataset import save_mapped_dataset, MappedDataset
+
+
+class FixedProbabilitiesClassifier:
+    """Classifier giving probabilities stored in the first columns of X."""
+    def __init__(self, classes):
+        self.classes_ = np.array(classes)
+
+    def predict_proba(self, X):
+        return X[:, :len(self.classes_)]
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def test_confusion_matrix_and_per_class_rates():
+    accumulator = EvaluationAccumulator(np.array([3, 1, 2]))
+    accumulator.update(np.array([1, 1, 2, 3, 3, 3]), np.array([1, 2, 2, 3, 3, 2]))
+    report = accumulator.report()
+    np.testing.assert_array_equal(report['classes'], [1, 2, 3])
+    np.testing.assert_array_equal(report['confusion_matrix'], [[1, 1, 0], [0, 1, 0], [0, 1, 2]])
+    np.testing.assert_allclose(report['tpr'], [0.5, 1, 2 / 3])
+    np.testing.assert_allclose(report['precision'], [1, 1 / 3, 1])
+    assert report['accuracy'] == pytest.approx(4 / 6)
+    assert report['confused_pairs'] == [{'true': 1, 'predicted': 2, 'count': 1},
+                                        {'true': 3, 'predicted': 2, 'count': 1}]
+
+
+def test_chunks_give_the_same_report_as_whole_set():
+    rng = np.random.default_rng(0)
+    y_true, y_pred = rng.integers(0, 5, 1000), rng.integers(0, 5, 1000)
+    whole = EvaluationAccumulator(np.arange(5))
+    whole.update(y_true, y_pred)
+    chunked = EvaluationAccumulator(np.arange(5))
+    for start in range(0, 1000, 300):
+        chunked.update(y_true[start:start + 300], y_pred[start:start + 300])
+    np.testing.assert_array_equal(chunked.confusion_matrix, whole.confusion_matrix)
+
+
+def test_unknown_label_raises_error():
+    accumulator = EvaluationAccumulator(np.array([0, 1]))
+    with pytest.raises(ValueError):
+        accumulator.update(np.array([0, 7]), np.array([0, 1]))
+
+
+def test_evaluate_memory_mapped_test_set_with_top_k_accuracy(tmp_path):
+    probabilities = np.array([[0.7, 0.2, 0.1], [0.5, 0.4, 0.1], [0.1, 0.3, 0.6], [0.2, 0.3, 0.5]], dtype=np.float32)
+    y = np.array([10, 20, 30, 10])
+    save_mapped_dataset(tmp_path / 'test_set', probabilities, y)
+    dataset = MappedDataset(tmp_path / 'test_set')
+    report = evaluate(FixedProbabilitiesClassifier([10, 20, 30]), dataset.X, dataset.y, chunk_size=3, top_k=(1, 2))
+    assert report['n_samples'] == 4
+    assert report['accuracy'] == pytest.approx(0.5)
+    assert report['top_k_accuracy'] == {1: 0.5, 2: 0.75}
+
+
+def test_evaluate_without_top_k_uses_predict():
+    probabilities = np.array([[0.7, 0.2, 0.1], [0.5, 0.4, 0.1], [0.1, 0.3, 0.6]])
+    report = evaluate(FixedProbabilitiesClassifier([10, 20, 30]), probabilities, np.array([10, 20, 30]), top_k=())
+    assert report['accuracy'] == pytest.approx(2 / 3)
+    assert 'top_k_accuracy' not in report
@@ -1,8 +1,13 @@
 from matplotlib.image import imread
+import numpy as np
+from PIL import Image
 import pytest
 import os
 from src.flags.image_preprocessor import (resize, convert_to_rgb, create_data_sample_from_image,
-                                          create_data_sample_as_single, get_pixels_positions, is_svg_file, is_rgba)
+                                          create_data_sample_as_single, get_pixels_positions, is_svg_file, is_rgba,
+                                          preprocess_image, preprocess_image_to_array, create_data_sample_from_array,
+                                          is_svg_bytes, create_data_samples_from_images, get_pixels_indices,
+                                          preprocess_image_to_arrays, PixelsIndices)
 from src.flags.utils import remove_file_if_exists
 from tests.test_final_recognize_flag import pixels
 
@@ -75,3 +80,87 @@ def test_rgba_file_is_rgba():
 
 def test_rgb_file_is_not_rgba():
     assert not is_rgba(os.path.join('tests/data_for_tests', '140_3.png'))
+
+
+def test_preprocessed_array_has_correct_shape_and_type():
+    img = preprocess_image_to_array(os.path.join('tests', 'data_for_tests', '31.png'), 32, 20)
+    assert img.shape == (20, 32, 3)
+    assert img.dtype == np.uint8
+
+
+def test_preprocessed_array_is_the_same_for_path_bytes_and_pil_image():
+    file_path_in = os.path.join('tests', 'data_for_tests', '116.png')
+    img_from_path = preprocess_image_to_array(file_path_in, 32, 20)
+    with open(file_path_in, 'rb') as file:
+        img_from_bytes = preprocess_image_to_array(file.read(), 32, 20)
+    with Image.open(file_path_in) as pil_img:
+        img_from_pil = preprocess_image_to_array(pil_img, 32, 20)
+    assert np.array_equal(img_from_path, img_from_bytes)
+    assert np.array_equal(img_from_path, img_from_pil)
+
+
+def test_data_sample_from_array_is_the_same_as_from_preprocessed_file(pixels):
+    file_path_in = os.path.join('tests', 'data_for_tests', '31.png')
+    file_path_out = os.path.join('tests', 'data_for_tests', 'new.png')
+    remove_file_if_exists(file_path_out)
+    preprocess_image(file_path_in, file_path_out, 32, 20)
+    img_sample_from_file = create_data_sample_from_image(file_path_out, pixels)
+    img_sample_from_array = create_data_sample_from_array(preprocess_image_to_array(file_path_in, 32, 20), pixels)
+    assert np.allclose(img_sample_from_file, img_sample_from_array)
+
+
+def test_preprocessed_arrays_of_many_sizes_are_the_same_as_of_single_size():
+    file_path_in = os.path.join('tests', 'data_for_tests', '116.png')
+    sizes = [(32, 20), (16, 10), (64, 40)]
+    imgs = preprocess_image_to_arrays(file_path_in, sizes)
+    for img, (width, height) in zip(imgs, sizes):
+        assert img.shape == (height, width, 3)
+        assert np.array_equal(img, preprocess_image_to_array(file_path_in, width, height))
+
+
+def test_svg_is_rendered_at_many_sizes_from_one_parse():
+    file_path_in = os.path.join('tests', 'data_for_tests', '140.svg')
+    sizes = [(32, 20), (20, 20)]
+    imgs = preprocess_image_to_arrays(file_path_in, sizes)
+    assert [img.shape for img in imgs] == [(20, 32, 3), (20, 20, 3)]
+    # flag of Poland is stretched, not letterboxed: white on the top and red on the bottom of each size
+    for img in imgs:
+        assert np.all(img[0, :] > 200) and img[-1, 0, 0] > 150 and img[-1, 0, 1] < 100
+
+
+def test_svg_bytes_are_svg():
+    with open(os.path.join('tests', 'data_for_tests', '140.svg'), 'rb') as file:
+        assert is_svg_bytes(file.read())
+
+
+def test_png_bytes_are_not_svg():
+    with open(os.path.join('tests', 'data_for_tests', '140_3.png'), 'rb') as file:
+        assert not is_svg_bytes(file.read())
+
+
+def test_data_samples_from_images_are_the_same_as_from_single_images(pixels):
+    imgs = np.stack([preprocess_image_to_array(os.path.join('tests', 'data_for_tests', file_name), 32, 20)
+                     for file_name in ['116.png', '140_3.png', '31.png']])
+    img_samples = create_data_samples_from_images(imgs, get_pixels_indices(pixels))
+    assert img_samples.shape == (3, 24)
+    for img, img_sample in zip(imgs, img_samples):
+        assert np.array_equal(img_sample, create_data_sample_from_array(img, pixels))
+
+
+def test_data_sample_as_single_from_array_is_the_same_as_from_file(pixels):
+    file_path_in = os.path.join('tests', 'data_for_tests', '140_3.png')
+    img_sample_from_file = create_data_sample_as_single(file_path_in, pixels)
+    img_sample_from_array = create_data_sample_as_single(preprocess_image_to_array(file_path_in, 32, 20), pixels)
+    assert img_sample_from_array.shape == (1, 24)
+    assert np.allclose(img_sample_from_file, img_sample_from_array)
+
+
+def test_two_pixels_layout_as_array_is_not_mistaken_for_pixels_indices():
+    img = np.arange(20 * 32 * 3, dtype=np.uint8).reshape(20, 32, 3)
+    positions = np.array([[1, 5], [3, 7]])
+    expected = np.concatenate([img[1, 5], img[3, 7]]) / 255
+    assert np.allclose(create_data_sample_from_array(img, positions), expected)
+    pixels_indices = get_pixels_indices(positions)
+    assert isinstance(pixels_indices, PixelsIndices)
+    assert pixels_indices.rows.tolist() == [1, 3] and pixels_indices.cols.tolist() == [5, 7]
+    assert np.allclose(create_data_sample_from_array(img, pixels_indices), expected)
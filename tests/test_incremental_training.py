@@ -0,0 +1,60 @@
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from src.flags.image_preprocessor import get_pixels_positions, create_data_samples_from_images
+from src.flags.incremental_training import (iterate_dataset_batches, iterate_augmented_batches, shuffle_batches,
+                                            train_incremental, load_checkpoint)
+from src.flags.mapped_dataset import save_mapped_dataset, MappedDataset
+from tests.test_ml_operations import make_dataset
+
+
+def test_shuffled_batches_contain_all_rows_mixed():
+    X, y = make_dataset(n_classes=4, n_per_class=100)
+    batches = [(X[start:start + 50], y[start:start + 50]) for start in range(0, len(y), 50)]
+    shuffled = list(shuffle_batches(batches, buffer_size=200, batch_size=32, rng=np.random.default_rng(0)))
+    assert all(len(y_batch) <= 32 for _, y_batch in shuffled)
+    X_out = np.concatenate([X_batch for X_batch, _ in shuffled])
+    y_out = np.concatenate([y_batch for _, y_batch in shuffled])
+    assert np.array_equal(np.sort(X_out, axis=0), np.sort(X, axis=0))
+    assert np.array_equal(np.sort(y_out), np.sort(y))
+    # batches are not made of a single class, although input batches are
+    assert len(np.unique(shuffled[0][1])) > 1
+
+
+def test_incremental_training_on_mapped_dataset_learns(tmp_path):
+    X, y = make_dataset(n_classes=4, n_per_class=100)
+    save_mapped_dataset(tmp_path / 'dataset', X, y)
+    dataset = MappedDataset(tmp_path / 'dataset')
+    clf = train_incremental(lambda epoch: iterate_dataset_batches(dataset, 64, np.random.default_rng(epoch)),
+                            dataset.classes, epochs=5, batch_size=32, buffer_size=128)
+    assert isinstance(clf, SGDClassifier)
+    assert clf.score(X, y) > 0.9
+
+
+def test_training_resumes_from_checkpoint(tmp_path):
+    X, y = make_dataset()
+    checkpoint_path = tmp_path / 'checkpoint.pkl'
+
+    def make_batches(epoch):
+        return [(X, y)]
+
+    train_incremental(make_batches, y, epochs=2, batch_size=32, buffer_size=64, checkpoint_path=checkpoint_path)
+    _, epoch = load_checkpoint(checkpoint_path)
+    assert epoch == 2
+    resumed = train_incremental(make_batches, y, epochs=3, batch_size=32, buffer_size=64,
+                                checkpoint_path=checkpoint_path)
+    full = train_incremental(make_batches, y, epochs=3, batch_size=32, buffer_size=64)
+    assert np.allclose(resumed.coef_, full.coef_)
+
+
+def test_augmented_batches_have_features_of_base_images():
+    rng = np.random.default_rng(0)
+    images = {label: rng.integers(0, 256, (20, 32, 3), dtype=np.uint8) for label in (3, 7)}
+    pixels_positions, _, _ = get_pixels_positions(32, 20)
+    batches = dict((int(y_batch[0]), (X_batch, y_batch))
+                   for X_batch, y_batch in iterate_augmented_batches(images, pixels_positions, 10, rng))
+    assert set(batches) == {3, 7}
+    for label, (X_batch, y_batch) in batches.items():
+        assert X_batch.shape == (11, 24) and X_batch.dtype == np.float32
+        assert np.all(y_batch == label)
+        assert np.array_equal(X_batch[0], create_data_samples_from_images(images[label][np.newaxis],
+                                                                          pixels_positions)[0])
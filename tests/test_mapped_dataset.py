@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from src.flags.mapped_dataset import save_mapped_dataset, MappedDataset
+from src.flags.ml_operations import load_dataset
+
+
+@pytest.fixture()
+def dataset():
+    X = np.arange(60, dtype=np.float32).reshape(10, 6) / 60
+    y = np.array([0, 0, 0, 4, 4, 7, 7, 7, 7, 9])
+    return X, y
+
+
+def test_shape_and_dtype_are_read_from_manifest(dataset, tmp_path):
+    save_mapped_dataset(tmp_path, *dataset, metadata={'width': 32})
+    mapped = MappedDataset(tmp_path)
+    assert mapped.shape == (10, 6)
+    assert mapped.dtype == np.float32
+    assert mapped.metadata == {'width': 32}
+    assert mapped.classes == [0, 4, 7, 9]
+
+
+def test_class_rows_are_memory_mapped(dataset, tmp_path):
+    save_mapped_dataset(tmp_path, *dataset)
+    X_class, y_class = MappedDataset(tmp_path).class_rows(7)
+    assert isinstance(X_class, np.memmap)
+    assert np.array_equal(X_class, dataset[0][5:9])
+    assert np.all(y_class == 7)
+
+
+def test_not_contiguous_classes_can_be_read(dataset, tmp_path):
+    X, y = dataset
+    save_mapped_dataset(tmp_path, X[::-1], y[::-1] % 2)
+    X_class, y_class = MappedDataset(tmp_path).class_rows(1)
+    assert np.array_equal(X_class, X[::-1][y[::-1] % 2 == 1])
+
+
+def test_load_dataset_gives_the_same_data_from_npz_and_directory(dataset, tmp_path):
+    X, y = dataset
+    np.savez_compressed(tmp_path / 'data.npz', X=X, y=y)
+    save_mapped_dataset(tmp_path / 'data', X, y)
+    X_npz, y_npz = load_dataset(tmp_path / 'data.npz')
+    X_mapped, y_mapped = load_dataset(tmp_path / 'data')
+    assert np.array_equal(X_npz, X_mapped) and np.array_equal(y_npz, y_mapped)
@@ -0,0 +1,78 @@
+import os
+import shutil
+from src.flags.metrics import Metrics, MetricsRegistry, get_metrics, use_metrics
+from src.flags.image_preprocessor import convert_to_png, preprocess_image_to_array
+from src.flags.augmentation import AugmentationGrid
+from src.flags.dataset_creator import DatasetCreator
+
+
+def test_default_metrics_ignore_everything():
+    metrics = get_metrics()
+    assert type(metrics) is Metrics
+    assert not metrics.enabled
+    with metrics.timer('stage.seconds'):
+        metrics.increment('stage.bytes_read', 10)
+
+
+def test_registry_collects_counters_and_histograms():
+    events = []
+    registry = MetricsRegistry(callback=lambda kind, name, value: events.append((kind, name)))
+    registry.increment('stage.bytes_read', 10)
+    registry.increment('stage.bytes_read', 5)
+    registry.error('stage', ValueError())
+    for value in [1.0, 2.0, 3.0]:
+        registry.observe('stage.seconds', value)
+    with registry.timer('other.seconds'):
+        pass
+
+    snapshot = registry.snapshot()
+    assert snapshot['counters'] == {'stage.bytes_read': 15, 'stage.errors.ValueError': 1}
+    assert snapshot['histograms']['stage.seconds']['count'] == 3
+    assert snapshot['histograms']['stage.seconds']['p50'] == 2.0
+    assert snapshot['histograms']['other.seconds']['count'] == 1
+    assert ('histogram', 'other.seconds') in events
+
+
+def test_failed_conversions_are_counted_by_type(tmp_path):
+    with use_metrics(MetricsRegistry()) as registry:
+        convert_to_png(tmp_path / 'missing.png', tmp_path / 'out.png')
+        convert_to_png(os.path.join('tests', 'data_for_tests', 'countries.txt'), tmp_path / 'out.png')
+    assert registry.counter('convert_to_png.errors.FileNotFoundError') == 1
+    assert registry.counter('convert_to_png.errors.UnidentifiedImageError') == 1
+    assert type(get_metrics()) is Metrics
+
+
+def test_preprocessing_records_latency_and_bytes_read():
+    file_path = os.path.join('tests', 'data_for_tests', '116.png')
+    with use_metrics(MetricsRegistry()) as registry:
+        preprocess_image_to_array(file_path, 32, 20)
+    assert registry.counter('load_image.bytes_read') == os.path.getsize(file_path)
+    assert len(registry.values('preprocess_image.seconds')) == 1
+
+
+def test_metrics_from_worker_processes_are_merged(tmp_path):
+    shutil.copy(os.path.join('tests', 'data_for_tests', '116.png'), tmp_path / '0_0.png')
+    shutil.copy(os.path.join('tests', 'data_for_tests', '31.png'), tmp_path / '1_0.png')
+    set_creator = DatasetCreator('', '', tmp_path, augmentation=AugmentationGrid((0.9, 1.1), ()), workers=2)
+    set_creator._countries_numbers = [0, 1, 2]
+    with use_metrics(MetricsRegistry()) as registry:
+        set_creator.create_new_samples()
+    assert len(registry.values('augment.country.seconds')) == 2
+    assert registry.counter('augment.errors.FileNotFoundError') == 1
+    assert len(registry.values('create_new_samples.seconds')) == 1
+
+
+def test_histograms_keep_bounded_sample_of_values_with_exact_totals():
+    registry = MetricsRegistry(reservoir_size=100)
+    for value in range(10000):
+        registry.observe('stage.seconds', float(value))
+    other = MetricsRegistry(reservoir_size=100)
+    other.observe('stage.seconds', 10000.0)
+    registry.merge(other.export_state())
+
+    summary = registry.snapshot()['histograms']['stage.seconds']
+    assert len(registry.values('stage.seconds')) == 100
+    assert summary['count'] == 10001
+    assert summary['sum'] == sum(range(10001))
+    assert summary['min'] == 0.0 and summary['max'] == 10000.0
+    assert 3500 < summary['p50'] < 6500
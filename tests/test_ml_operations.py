@@ -0,0 +1,68 @@
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, GridSearchCV
+from src.flags.ml_operations import (nested_cross_validation, split_jobs, regularization_path_search,
+                                     process_cross_validation_results)
+
+
+def make_dataset(n_classes=4, n_per_class=40, n_features=24):
+    rng = np.random.default_rng(0)
+    centers = rng.random((n_classes, n_features))
+    y = np.repeat(np.arange(n_classes), n_per_class)
+    X = (centers[y] + 0.3 * rng.standard_normal((len(y), n_features))).astype(np.float32)
+    return X, y
+
+
+def test_parallel_nested_cross_validation_gives_the_same_results_as_serial():
+    X, y = make_dataset()
+    clf = LogisticRegression(max_iter=500, random_state=0)
+    param_grid = {'C': [0.01, 0.1, 1, 10]}
+    serial_scores, serial_best_params = nested_cross_validation(X, y, clf, param_grid, n_inner_splits=3,
+                                                                n_outer_splits=3)
+    parallel_scores, parallel_best_params = nested_cross_validation(X, y, clf, param_grid, n_inner_splits=3,
+                                                                    n_outer_splits=3, n_jobs=4)
+    assert parallel_best_params == serial_best_params
+    for serial_run, parallel_run in zip(serial_scores, parallel_scores):
+        assert parallel_run['params'] == serial_run['params']
+        np.testing.assert_array_equal(parallel_run['mean_test_score'], serial_run['mean_test_score'])
+
+
+def test_split_jobs_does_not_exceed_budget():
+    outer_jobs, inner_jobs, blas_threads = split_jobs(8, n_outer_splits=4)
+    assert (outer_jobs, inner_jobs) == (4, 2)
+    assert blas_threads >= 1
+    assert split_jobs(2, n_outer_splits=4)[:2] == (2, 1)
+    assert split_jobs(1, n_outer_splits=4)[:2] == (1, 1)
+
+
+def test_regularization_path_search_gives_results_compatible_with_grid_search():
+    X, y = make_dataset()
+    clf = LogisticRegression(max_iter=500, random_state=0)
+    cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+    cv_results, best_params = regularization_path_search(X, y, clf, [10, 0.01, 1, 0.1], cv)
+    grid_search = GridSearchCV(clf, {'C': [0.01, 0.1, 1, 10]}, cv=cv).fit(X, y)
+    assert cv_results['params'] == grid_search.cv_results_['params']
+    np.testing.assert_allclose(cv_results['mean_test_score'], grid_search.cv_results_['mean_test_score'], atol=0.02)
+    assert best_params in cv_results['params']
+    assert np.all(cv_results['mean_fit_time'] > 0)
+
+
+def test_regularization_path_search_stops_when_accuracy_plateaus():
+    X, y = make_dataset()
+    clf = LogisticRegression(max_iter=500, random_state=0)
+    cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+    cv_results, _ = regularization_path_search(X, y, clf, [0.01, 0.1, 1, 10, 100, 1000], cv, patience=1,
+                                               min_improvement=1.0)
+    assert not np.isnan(cv_results['mean_test_score'][:2]).any()
+    assert np.isnan(cv_results['mean_test_score'][2:]).all()
+
+
+def test_nested_cross_validation_with_path_search_can_be_processed():
+    X, y = make_dataset()
+    clf = LogisticRegression(max_iter=500, random_state=0)
+    inner_scores, best_params_list = nested_cross_validation(X, y, clf, {'C': [0.01, 0.1, 1]}, n_inner_splits=3,
+                                                             n_outer_splits=2, search='path')
+    params_list, params_scores, fit_times = process_cross_validation_results(inner_scores)
+    assert params_list == [{'C': 0.01}, {'C': 0.1}, {'C': 1}]
+    assert params_scores.shape == fit_times.shape == (3, )
+    assert len(best_params_list) == 2
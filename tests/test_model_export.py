@@ -0,0 +1,43 @@
+import numpy as np
+import pickle
+import pytest
+import os
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from src.flags.model_export import export_model, NumpyPredictor, load_model
+
+
+@pytest.fixture()
+def clf():
+    return pickle.load(open(os.path.join('tests', 'data_for_tests', 'clf.pkl'), 'rb'))
+
+
+@pytest.fixture()
+def X():
+    return np.random.default_rng(0).random((50, 24), dtype=np.float32)
+
+
+def test_exported_model_gives_the_same_predictions(clf, X, tmp_path):
+    export_model(clf, tmp_path / 'clf.npz')
+    predictor = load_model(tmp_path / 'clf.npz')
+    assert isinstance(predictor, NumpyPredictor)
+    assert np.array_equal(predictor.predict(X), clf.predict(X))
+    assert np.allclose(predictor.predict_proba(X), clf.predict_proba(X))
+
+
+def test_exported_model_keeps_image_dimensions_and_pixels(clf, tmp_path):
+    export_model(clf, tmp_path / 'clf.npz', width=32, height=20)
+    predictor = NumpyPredictor.load(tmp_path / 'clf.npz')
+    assert (predictor.width, predictor.height) == (32, 20)
+    assert list(zip(*predictor.pixels_indices))[:2] == [(3, 5), (3, 26)]
+
+
+@pytest.mark.parametrize('model', [LogisticRegression(), LogisticRegression(solver='liblinear'),
+                                   SGDClassifier(loss='log_loss', random_state=0)])
+@pytest.mark.parametrize('n_classes', [2, 4])
+def test_exported_model_gives_the_same_probabilities_for_other_models(model, n_classes, X, tmp_path):
+    y = np.arange(len(X)) % n_classes
+    model.fit(X, y)
+    export_model(model, tmp_path / 'model.npz')
+    predictor = NumpyPredictor.load(tmp_path / 'model.npz')
+    assert np.array_equal(predictor.predict(X), model.predict(X))
+    assert np.allclose(predictor.predict_proba(X), model.predict_proba(X))
@@ -0,0 +1,99 @@
+import numpy as np
+import os
+import shutil
+import pickle
+import pytest
+from sklearn.linear_model import LogisticRegression
+from src.flags.pixel_selection import get_pixels_columns, rank_pixels, select_pixels
+from src.flags.pixels_layout import (get_all_pixels_positions, save_pixels_layout, load_pixels_layout,
+                                     get_model_layout_path)
+from src.flags.recognizer import Recognizer
+from src.flags.image_preprocessor import create_data_sample_from_array
+from src.flags.augmentation import AugmentationGrid
+from src.flags.dataset_creator import DatasetCreator
+from src.flags.mapped_dataset import MappedDataset
+
+WIDTH = 8
+HEIGHT = 5
+
+
+def make_full_raster_dataset(n_per_class=30):
+    """Images of 4 classes that differ only by colors of pixels [1, 2] and [3, 6], with noise elsewhere."""
+    rng = np.random.default_rng(0)
+    y = np.repeat(np.arange(4), n_per_class)
+    imgs = rng.integers(0, 256, (len(y), HEIGHT, WIDTH, 3), dtype=np.uint8)
+    imgs[:, 1, 2] = np.where((y % 2 == 0)[:, None], 250, 10)
+    imgs[:, 3, 6] = np.where((y // 2 == 0)[:, None], 250, 10)
+    X_full = np.stack([create_data_sample_from_array(img, get_all_pixels_positions(WIDTH, HEIGHT)) for img in imgs])
+    return imgs, X_full, y
+
+
+def test_pixels_columns_select_the_same_features_as_pixels_positions():
+    imgs, X_full, _ = make_full_raster_dataset(2)
+    pixels_positions = ([1, 2], [4, 7], [0, 0])
+    expected = create_data_sample_from_array(imgs[3], pixels_positions)
+    np.testing.assert_array_equal(X_full[3, get_pixels_columns(pixels_positions, WIDTH)], expected)
+
+
+def test_rank_pixels_postpones_neighbours_of_better_pixels():
+    scores = np.zeros((HEIGHT, WIDTH))
+    scores[1, 2], scores[1, 3], scores[3, 6] = 3, 2, 1
+    assert rank_pixels(scores)[:2] == [[1, 2], [3, 6]]
+    assert rank_pixels(scores, min_distance=1)[:3] == [[1, 2], [1, 3], [3, 6]]
+
+
+def test_select_pixels_finds_the_informative_pixels():
+    _, X_full, y = make_full_raster_dataset()
+    pixels_positions, results = select_pixels(X_full, y, WIDTH, HEIGHT, target_accuracy=0.99,
+                                              candidate_sizes=(1, 2, 4))
+    assert sorted(pixels_positions) == [[1, 2], [3, 6]]
+    assert [result['n_pixels'] for result in results] == [1, 2]
+    assert results[-1]['accuracy'] >= 0.99
+
+
+def test_saved_layout_is_loaded_with_pixels_indices(tmp_path):
+    save_pixels_layout(tmp_path / 'layout.json', ([1, 2], [3, 6]), WIDTH, HEIGHT, [{'n_pixels': 2}])
+    layout = load_pixels_layout(tmp_path / 'layout.json')
+    assert layout['pixels_positions'] == ([1, 2], [3, 6])
+    np.testing.assert_array_equal(layout['pixels_indices'][0], [1, 3])
+    np.testing.assert_array_equal(layout['pixels_indices'][1], [2, 6])
+    assert (layout['width'], layout['height']) == (WIDTH, HEIGHT)
+
+
+def test_dataset_creator_uses_given_pixels_positions(tmp_path):
+    shutil.copy(os.path.join('tests', 'data_for_tests', '116_5.png'), tmp_path / '0_0.png')
+    pixels_positions = ([0, 0], [10, 16], [19, 31])
+    set_creator = DatasetCreator('', '', tmp_path, augmentation=AugmentationGrid((), ()),
+                                 pixels_positions=pixels_positions)
+    set_creator._countries_numbers = [0]
+    set_creator.create_np_dataset_from_selected_pixels(dir_name='dataset')
+    set_creator.save_uncompressed_dataset('dataset')
+    dataset = MappedDataset(tmp_path / 'dataset')
+    assert dataset.X.shape == (1, 9)
+    assert dataset.metadata['pixels_positions'] == [[0, 0], [10, 16], [19, 31]]
+
+
+def train_pickled_classifier(tmp_path, pixels_positions):
+    rng = np.random.default_rng(0)
+    X = rng.random((20, 3 * len(pixels_positions)))
+    clf = LogisticRegression().fit(X, np.arange(20) % 2)
+    file_path_clf = tmp_path / 'clf.pkl'
+    with open(file_path_clf, 'wb') as file:
+        pickle.dump(clf, file)
+    return file_path_clf
+
+
+def test_pickled_classifier_is_used_with_layout_saved_next_to_it(tmp_path):
+    pixels_positions = ([0, 0], [10, 16], [19, 31])
+    file_path_clf = train_pickled_classifier(tmp_path, pixels_positions)
+    save_pixels_layout(get_model_layout_path(file_path_clf), pixels_positions, 32, 20)
+    recognizer = Recognizer.from_files(file_path_clf, os.path.join('tests', 'data_for_tests', 'countries.txt'))
+    np.testing.assert_array_equal(recognizer.pixels_indices[0], [0, 10, 19])
+    np.testing.assert_array_equal(recognizer.pixels_indices[1], [0, 16, 31])
+    assert recognizer.recognize(os.path.join('tests', 'data_for_tests', '116.png'))['label'] in (0, 1)
+
+
+def test_pickled_classifier_with_features_of_other_layout_is_rejected(tmp_path):
+    file_path_clf = train_pickled_classifier(tmp_path, ([0, 0], [10, 16], [19, 31]))
+    with pytest.raises(ValueError):
+        Recognizer.from_files(file_path_clf, os.path.join('tests', 'data_for_tests', 'countries.txt'))
@@ -0,0 +1,115 @@
+import numpy as np
+import os
+from PIL import Image
+from src.flags.prediction_cache import PredictionCache
+from src.flags.recognizer import Recognizer
+
+
+def make_recognizer(cache):
+    return Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                 os.path.join('tests', 'data_for_tests', 'countries.txt'), cache=cache)
+
+
+def read_test_image(file_name):
+    with open(os.path.join('tests', 'data_for_tests', file_name), 'rb') as file:
+        return file.read()
+
+
+def make_uniform_image(value):
+    return np.full((20, 32, 3), value, dtype=np.uint8)
+
+
+def make_tricolour(colours):
+    img = np.zeros((200, 300, 3), dtype=np.uint8)
+    for i, colour in enumerate(colours):
+        img[:, i * 100:(i + 1) * 100] = colour
+    return Image.fromarray(img)
+
+
+def test_least_recently_used_results_are_evicted():
+    cache = PredictionCache(max_size=2)
+    cache.put(make_uniform_image(10), {'label': 1})
+    cache.put(make_uniform_image(100), {'label': 2})
+    assert cache.get_similar(make_uniform_image(10)) == {'label': 1}
+    cache.put(make_uniform_image(200), {'label': 3})
+    assert cache.get_similar(make_uniform_image(100)) is None
+    assert cache.get_similar(make_uniform_image(10)) == {'label': 1}
+    assert cache.get_similar(make_uniform_image(200)) == {'label': 3}
+    assert len(cache) == 2
+
+
+def test_similar_images_share_result_but_images_of_different_colors_do_not():
+    cache = PredictionCache(tolerance=64)
+    cache.put(make_uniform_image(100), {'label': 1})
+    assert cache.get_similar(make_uniform_image(101)) == {'label': 1}
+    assert cache.get_similar(make_uniform_image(150)) is None
+    assert cache.stats == {'size': 1, 'hits': 1, 'exact_hits': 0, 'similar_hits': 1, 'misses': 1}
+
+
+def test_exact_digest_is_mapped_to_result():
+    cache = PredictionCache()
+    digest = cache.make_digest(b'image')
+    assert cache.get_exact(digest) is None
+    cache.put(make_uniform_image(7), {'label': 7}, digest)
+    assert cache.get_exact(digest) == {'label': 7}
+    assert cache.exact_hits == 1
+
+
+def test_persistent_cache_survives_restart(tmp_path):
+    path = tmp_path / 'cache.json'
+    cache = PredictionCache(path=path)
+    cache.put(make_uniform_image(5), {'label': 5, 'country': 'Chad'}, 'digest')
+    cache.save()
+    restarted_cache = PredictionCache(path=path)
+    assert restarted_cache.get_exact('digest') == {'label': 5, 'country': 'Chad'}
+    assert restarted_cache.get_similar(make_uniform_image(5)) == {'label': 5, 'country': 'Chad'}
+
+
+def test_recognizer_with_cache_calls_classifier_once_for_reuploaded_image():
+    cache = PredictionCache(tolerance=4)
+    recognizer = make_recognizer(cache)
+    img_data = read_test_image('116.png')
+    calls = []
+
+    def predict_sample(img_sample):
+        calls.append(img_sample)
+        return recognizer.predict(img_sample.reshape(1, -1))[0]
+
+    result = recognizer.recognize_with(img_data, predict_sample)
+    assert result['country'] == 'Mongolia'
+    assert recognizer.recognize_with(img_data, predict_sample) == result
+
+    img = Image.open(os.path.join('tests', 'data_for_tests', '116.png'))
+    assert recognizer.recognize_with(img.resize((img.width // 2, img.height // 2)), predict_sample) == result
+    assert len(calls) == 1
+    assert cache.stats == {'size': 1, 'hits': 2, 'exact_hits': 1, 'similar_hits': 1, 'misses': 1}
+
+
+def test_recognizer_with_cache_gives_the_same_results_as_without():
+    recognizer = make_recognizer(None)
+    cached_recognizer = make_recognizer(PredictionCache())
+    for file_name in ['116.png', '140_3.png', '31.png', '116.png']:
+        assert cached_recognizer.recognize(os.path.join('tests', 'data_for_tests', file_name)) == \
+               recognizer.recognize(os.path.join('tests', 'data_for_tests', file_name))
+
+
+def test_recognizer_with_cache_tells_apart_tricolours_of_the_same_layout():
+    france = make_tricolour([(0, 85, 164), (255, 255, 255), (239, 65, 53)])
+    ireland = make_tricolour([(22, 155, 98), (255, 255, 255), (255, 136, 62)])
+    for cache in [PredictionCache(), PredictionCache(tolerance=64)]:
+        recognizer = make_recognizer(cache)
+        assert recognizer.recognize(france)['country'] == 'France'
+        assert recognizer.recognize(ireland)['country'] == 'Ireland'
+        assert cache.hits == 0
+
+
+def test_recognizer_with_cache_hashes_image_once_per_lookup(monkeypatch):
+    calls = []
+    perceptual_hash = PredictionCache.perceptual_hash
+    monkeypatch.setattr(PredictionCache, 'perceptual_hash',
+                        staticmethod(lambda img: calls.append(1) or perceptual_hash(img)))
+    recognizer = make_recognizer(PredictionCache())
+    recognizer.recognize(read_test_image('116.png'))
+    recognizer.recognize(read_test_image('116_5.png'))
+    assert len(calls) == 2
+    assert recognizer.cache.misses + recognizer.cache.similar_hits == 2
@@ -0,0 +1,104 @@
+import pytest
+import requests
+import http.client
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from src.flags.recognizer import Recognizer
+from src.flags.server import RecognitionServer
+from src.flags.prediction_cache import PredictionCache
+from src.flags.metrics import MetricsRegistry, use_metrics
+
+
+@pytest.fixture()
+def server():
+    recognizer = Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                       os.path.join('tests', 'data_for_tests', 'countries.txt'))
+    recognition_server = RecognitionServer(recognizer, port=0, max_batch_size=8, max_wait=0.05)
+    thread = threading.Thread(target=recognition_server.serve_forever, daemon=True)
+    thread.start()
+    yield recognition_server
+    recognition_server.shutdown()
+
+
+def post_image(server, file_name):
+    with open(os.path.join('tests', 'data_for_tests', file_name), 'rb') as file:
+        return requests.post(server.url + 'recognize', data=file.read())
+
+
+def test_server_recognizes_flag_of_mongolia(server):
+    response = post_image(server, '116.png')
+    assert response.status_code == 200
+    assert response.json()['label'] == 116
+    assert response.json()['country'] == 'Mongolia'
+    assert 0 < response.json()['probability'] <= 1
+
+
+def test_server_recognizes_concurrent_requests(server):
+    file_names = ['116.png', '140_3.png', '116_5.png'] * 4
+    with use_metrics(MetricsRegistry()) as registry, ThreadPoolExecutor(max_workers=len(file_names)) as executor:
+        responses = list(executor.map(lambda file_name: post_image(server, file_name), file_names))
+    assert [response.json()['label'] for response in responses] == [116, 140, 116] * 4
+    batch_sizes = registry.values('recognizer.batch_size')
+    assert sum(batch_sizes) == len(file_names)
+    assert len(batch_sizes) < len(file_names)
+    assert max(batch_sizes) > 1
+
+
+def test_server_reports_non_image_file(server):
+    response = post_image(server, 'countries.txt')
+    assert response.status_code == 400
+    assert 'Impossible to recognize flag because of error.' in response.json()['error']
+
+
+def test_server_with_cache_reports_hits_of_reuploaded_image():
+    cache = PredictionCache()
+    recognizer = Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                       os.path.join('tests', 'data_for_tests', 'countries.txt'), cache=cache)
+    recognition_server = RecognitionServer(recognizer, port=0)
+    thread = threading.Thread(target=recognition_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        labels = [post_image(recognition_server, '116.png').json()['label'] for _ in range(3)]
+        stats = requests.get(recognition_server.url + 'stats').json()
+    finally:
+        recognition_server.shutdown()
+    assert labels == [116] * 3
+    assert stats['cache']['exact_hits'] == 2
+    assert stats['cache']['misses'] == 1
+
+
+def post_with_content_length(server, content_length):
+    connection = http.client.HTTPConnection(*server.url[len('http://'):-1].split(':'))
+    try:
+        connection.putrequest('POST', '/recognize')
+        if content_length is not None:
+            connection.putheader('Content-Length', content_length)
+        connection.endheaders()
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize('content_length', [None, 'abc', '-1'])
+def test_server_rejects_missing_or_invalid_content_length(server, content_length):
+    status, content = post_with_content_length(server, content_length)
+    assert status == 400
+    assert 'Content-Length' in content['error']
+
+
+def test_server_rejects_too_large_body():
+    recognizer = Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                       os.path.join('tests', 'data_for_tests', 'countries.txt'))
+    recognition_server = RecognitionServer(recognizer, port=0, max_body_size=100)
+    thread = threading.Thread(target=recognition_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        response = post_image(recognition_server, '116.png')
+        status, _ = post_with_content_length(recognition_server, '100000000')
+    finally:
+        recognition_server.shutdown()
+    assert response.status_code == 413
+    assert status == 413
@@ -0,0 +1,37 @@
+import numpy as np
+import time
+from src.flags.stage_cache import StageCache
+
+
+def test_cached_array_is_returned(tmp_path):
+    cache = StageCache(tmp_path)
+    key = StageCache.make_key('augment', np.zeros((2, 3)), {'factors': [0.8, 1.0]})
+    assert cache.get_array('augment', key) is None
+    cache.put_array('augment', key, np.arange(6).reshape(2, 3))
+    assert np.array_equal(cache.get_array('augment', key), np.arange(6).reshape(2, 3))
+
+
+def test_key_depends_on_all_inputs():
+    key = StageCache.make_key('rasterize', b'<svg/>', 32, 20)
+    assert key == StageCache.make_key('rasterize', b'<svg/>', 32, 20)
+    assert key != StageCache.make_key('rasterize', b'<svg />', 32, 20)
+    assert key != StageCache.make_key('rasterize', b'<svg/>', 20, 32)
+
+
+def test_old_entry_is_not_fresh(tmp_path):
+    cache = StageCache(tmp_path)
+    cache.put_bytes('download', 'key', b'data')
+    assert cache.get_bytes('download', 'key', max_age=60) == b'data'
+    assert cache.get_bytes('download', 'key', max_age=-1) is None
+
+
+def test_evict_removes_only_unused_entries(tmp_path):
+    cache = StageCache(tmp_path)
+    cache.put_bytes('download', 'old', b'old')
+    cache.put_bytes('download', 'used', b'used')
+    time.sleep(0.01)
+    since = time.time()
+    cache.get_bytes('download', 'used')
+    assert cache.evict(unused_since=since) == 1
+    assert cache.get_bytes('download', 'old') is None
+    assert cache.get_bytes('download', 'used') == b'used'
@@ -0,0 +1,10 @@
+import os
+from src.flags.startup_profile import measure_startup, check_startup
+
+
+def test_inference_startup_does_not_import_heavy_modules():
+    # time to the first prediction is tracked by the startup benchmark stage and profile_startup.py budgets
+    report = measure_startup(os.path.join('src', 'models', 'clf.npz'),
+                             os.path.join('tests', 'data_for_tests', 'countries.txt'),
+                             os.path.join('tests', 'data_for_tests', '116.png'), repeats=1)
+    assert check_startup(report) == []
@@ -0,0 +1,54 @@
+import numpy as np
+import os
+import pytest
+from PIL import Image
+from src.flags.template_matching import TemplateMatcher
+from src.flags.image_preprocessor import preprocess_image_to_array
+
+
+@pytest.fixture()
+def templates_dir(tmp_path):
+    for country_number, file_name in [(116, '116.png'), (140, '140_3.png'), (31, '31.png')]:
+        img = preprocess_image_to_array(os.path.join('tests', 'data_for_tests', file_name), 32, 20)
+        np.save(tmp_path / f'{country_number}.npy', img)
+        Image.fromarray(img).save(tmp_path / f'{country_number}_0.png')
+    return tmp_path
+
+
+def make_matcher(templates_dir, metric='mse'):
+    return TemplateMatcher.from_files(templates_dir, os.path.join('tests', 'data_for_tests', 'countries.txt'),
+                                      metric=metric)
+
+
+@pytest.mark.parametrize('metric', ['mse', 'cosine'])
+def test_template_matcher_recognizes_flag_of_mongolia(templates_dir, metric):
+    matcher = make_matcher(templates_dir, metric)
+    result = matcher.recognize(os.path.join('tests', 'data_for_tests', '116_5.png'))
+    assert result['label'] == 116
+    assert result['country'] == 'Mongolia'
+
+
+def test_mse_distances_are_equal_to_mean_square_differences(templates_dir):
+    matcher = make_matcher(templates_dir)
+    templates = np.stack([np.load(templates_dir / f'{country_number}.npy') for country_number in [31, 116, 140]])
+    templates = templates.reshape(3, -1) / 255
+    img_samples = np.random.default_rng(0).random((5, templates.shape[1]), dtype=np.float32)
+    expected = ((img_samples[:, None, :] - templates[None, :, :]) ** 2).mean(axis=2)
+    assert np.allclose(matcher.distances(img_samples), expected, atol=1e-5)
+
+
+def test_top_k_results_are_sorted_by_distance(templates_dir):
+    matcher = make_matcher(templates_dir, 'cosine')
+    img_sample = matcher.create_data_sample(os.path.join('tests', 'data_for_tests', '140_3.png'))
+    results = matcher.predict_top_k(np.stack([img_sample] * 4), 3)
+    assert len(results) == 4
+    assert [result['label'] for result in results[0]][0] == 140
+    assert sorted(result['label'] for result in results[0]) == [31, 116, 140]
+    distances = [result['distance'] for result in results[0]]
+    assert distances == sorted(distances)
+    assert distances[0] == pytest.approx(0, abs=1e-5)
+
+
+def test_unknown_metric_raises_error():
+    with pytest.raises(ValueError):
+        TemplateMatcher(np.zeros((1, 20, 32, 3), dtype=np.uint8), np.array([0]), ['A'], metric='manhattan')
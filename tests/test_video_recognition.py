@@ -0,0 +1,59 @@
+import numpy as np
+from PIL import Image
+import imageio.v3 as iio
+import pytest
+import os
+from src.flags.recognizer import Recognizer
+from src.flags.video_recognition import StreamRecognizer, make_thumbnail
+
+
+@pytest.fixture()
+def recognizer():
+    return Recognizer.from_files(os.path.join('tests', 'data_for_tests', 'clf.pkl'),
+                                 os.path.join('tests', 'data_for_tests', 'countries.txt'))
+
+
+def read_frame(file_name, size=(320, 200)):
+    with Image.open(os.path.join('tests', 'data_for_tests', file_name)) as img:
+        return np.asarray(img.convert('RGB').resize(size))
+
+
+def make_video():
+    """Flag of Mongolia for 20 frames and flag of Poland for 20 frames, with small noise in each frame."""
+    rng = np.random.default_rng(0)
+    frames = [read_frame('116.png')] * 20 + [read_frame('140_3.png')] * 20
+    return [np.clip(frame + rng.integers(-2, 3, frame.shape), 0, 255).astype(np.uint8) for frame in frames]
+
+
+def test_only_changed_frames_are_classified(recognizer):
+    stream_recognizer = StreamRecognizer(recognizer)
+    results = list(stream_recognizer.recognize_frames(make_video()))
+    assert [result['frame'] for result in results] == list(range(40))
+    assert stream_recognizer.frames == 40
+    assert stream_recognizer.classified_frames == 2
+    assert results[0]['classified'] and results[20]['classified']
+    assert results[0]['label'] == 116
+
+
+def test_label_changes_are_emitted_once(recognizer):
+    changes = list(StreamRecognizer(recognizer, smoothing=1).label_changes(make_video()))
+    assert [(change['frame'], change['label'], change['previous_label']) for change in changes] == [
+        (0, 116, None), (20, 140, 116)]
+    assert changes[1]['country'] == 'Poland'
+
+
+def test_smoothing_ignores_single_misclassified_frame(recognizer):
+    frames = [read_frame('116.png')] * 5 + [read_frame('140_3.png')] + [read_frame('116.png')] * 5
+    changes = list(StreamRecognizer(recognizer, smoothing=0.3).label_changes(frames))
+    assert [change['label'] for change in changes] == [116]
+
+
+def test_frames_are_read_from_video_file(recognizer, tmp_path):
+    iio.imwrite(tmp_path / 'video.gif', np.stack(make_video()[::4]))
+    changes = list(StreamRecognizer(recognizer, smoothing=1).label_changes(tmp_path / 'video.gif'))
+    assert [change['label'] for change in changes] == [116, 140]
+
+
+def test_thumbnail_of_grayscale_and_rgba_frames_has_three_channels():
+    assert make_thumbnail(np.zeros((100, 160), dtype=np.uint8)).shape == (10, 16, 3)
+    assert make_thumbnail(np.zeros((100, 160, 4), dtype=np.uint8), (8, 5)).shape == (5, 8, 3)